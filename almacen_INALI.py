@@ -0,0 +1,161 @@
+# un solo almacén (SQLite) con todos los datos de INALI, con índices por agrupación, familia y variante
+# así no hace falta abrir y parsear cientos de archivos de JSON chiquitos antes de empezar una búsqueda
+# el árbol de carpetas agrupaciones_de_INALI/ se puede seguir exportando desde aquí
+# uso:
+#   python almacen_INALI.py --desde-carpetas agrupaciones_de_INALI
+#   python almacen_INALI.py --exportar otra_carpeta
+
+import os
+import json
+import sqlite3
+import argparse
+import logging
+
+
+logger = logging.getLogger('almacen_INALI')
+
+archivo_del_almacen = 'agrupaciones_de_INALI.sqlite'
+
+esquema = '''
+CREATE TABLE IF NOT EXISTS variantes (
+    id INTEGER PRIMARY KEY,
+    agrupacion TEXT NOT NULL,
+    familia TEXT NOT NULL,
+    variante TEXT NOT NULL,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS variantes_por_agrupacion ON variantes (agrupacion);
+CREATE INDEX IF NOT EXISTS variantes_por_familia ON variantes (familia);
+CREATE INDEX IF NOT EXISTS variantes_por_variante ON variantes (variante);
+'''
+
+
+def sacar_datos_de_carpetas(carpeta_mas_alta):
+    '''
+    leer todos los archivos de JSON del árbol de carpetas, siempre en el mismo orden (el de las rutas),
+    así que los benchmarks reconstruyen las mismas páginas en cualquier sistema de archivos
+    '''
+    datos_de_json = []
+    for dirpath, dirname, filenames in sorted(os.walk(carpeta_mas_alta)):
+        if not dirname and filenames:
+            for filename in sorted(filenames):
+                filepath = os.path.join(dirpath, filename)
+                with open(filepath, 'r') as fpath:
+                    datos_de_json.append(json.loads(fpath.read()))
+    return datos_de_json
+
+
+def escribir_almacen(datos_de_variantes, archivo=archivo_del_almacen):
+    '''
+    reemplazar el contenido del almacén con estos datos (el mismo modelo que output_variante_json)
+    todo pasa en una transacción, así que un lector nunca ve el almacén a medias
+    '''
+    conexion = sqlite3.connect(archivo)
+    try:
+        with conexion:
+            conexion.executescript(esquema)
+            conexion.execute('DELETE FROM variantes')
+            conexion.executemany(
+                'INSERT INTO variantes (agrupacion, familia, variante, datos) VALUES (?, ?, ?, ?)',
+                ((dato['agrupacion_lingüística'], dato['familia_lingüística'], dato['variante'], json.dumps(dato))
+                 for dato in datos_de_variantes))
+        numero = conexion.execute('SELECT COUNT(*) FROM variantes').fetchone()[0]
+    finally:
+        conexion.close()
+    logger.info('escribimos {} variantes al almacén {}'.format(numero, archivo))
+    return numero
+
+
+class AlmacenINALI:
+    '''
+    leer el almacén sin cargar todo: la conexión se abre con la primera consulta,
+    y cada consulta solamente parsea el JSON de las filas que pide
+    '''
+
+    def __init__(self, archivo=archivo_del_almacen):
+        self.archivo = archivo
+        self._conexion = None
+
+    @property
+    def conexion(self):
+        if self._conexion is None:
+            if not os.path.isfile(self.archivo):
+                raise FileNotFoundError('no existe el almacén de INALI {}'.format(self.archivo))
+            self._conexion = sqlite3.connect('file:{}?mode=ro'.format(self.archivo), uri=True, check_same_thread=False)
+        return self._conexion
+
+    def cerrar(self):
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def _datos(self, consulta, parametros=()):
+        for (datos,) in self.conexion.execute(consulta, parametros):
+            yield json.loads(datos)
+
+    def __len__(self):
+        return self.conexion.execute('SELECT COUNT(*) FROM variantes').fetchone()[0]
+
+    def __iter__(self):
+        '''todos los variantes, uno por uno, en el orden en que los escribimos'''
+        return self._datos('SELECT datos FROM variantes ORDER BY id')
+
+    def agrupaciones(self):
+        return [fila[0] for fila in self.conexion.execute('SELECT DISTINCT agrupacion FROM variantes ORDER BY agrupacion')]
+
+    def familias(self):
+        return [fila[0] for fila in self.conexion.execute('SELECT DISTINCT familia FROM variantes ORDER BY familia')]
+
+    def variantes_de(self, agrupacion):
+        '''los datos de todos los variantes de una agrupación lingüística'''
+        return list(self._datos('SELECT datos FROM variantes WHERE agrupacion = ? ORDER BY id', (agrupacion,)))
+
+    def variantes_de_familia(self, familia):
+        return list(self._datos('SELECT datos FROM variantes WHERE familia = ? ORDER BY id', (familia,)))
+
+    def variante(self, variante):
+        '''los datos de un variante por su nombre, o None si no existe'''
+        return next(self._datos('SELECT datos FROM variantes WHERE variante = ? ORDER BY id LIMIT 1', (variante,)), None)
+
+
+def datos_de_INALI(almacen=archivo_del_almacen, carpeta='agrupaciones_de_INALI'):
+    '''todos los datos de INALI: del almacén si existe (es mucho más rápido), o si no de su árbol de carpetas'''
+    if almacen and os.path.isfile(almacen):
+        logger.info('sacando los datos de INALI del almacén {}...'.format(almacen))
+        with AlmacenINALI(almacen) as abierto:
+            return list(abierto)
+    logger.info('sacando los datos de INALI de sus carpetas...')
+    return sacar_datos_de_carpetas(carpeta)
+
+
+def exportar_carpetas(almacen, carpeta='agrupaciones_de_INALI'):
+    '''escribir el árbol de carpetas de siempre (un JSON por variante) desde el almacén'''
+    from sacar_datos_de_INALI import output_variante_json
+
+    escritos = 0
+    for dato in almacen:
+        escritos += output_variante_json(dato, carpeta=carpeta)
+    logger.info('exportamos {} archivos de JSON a {}'.format(escritos, carpeta))
+    return escritos
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level='INFO', format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='el almacén consolidado de los datos de INALI')
+    parser.add_argument('--almacen', default=archivo_del_almacen)
+    parser.add_argument('--desde-carpetas', metavar='CARPETA', help='construir el almacén desde un árbol de archivos de JSON')
+    parser.add_argument('--exportar', metavar='CARPETA', help='exportar el almacén como árbol de archivos de JSON')
+    args = parser.parse_args()
+
+    if args.desde_carpetas:
+        escribir_almacen(sacar_datos_de_carpetas(args.desde_carpetas), args.almacen)
+    if args.exportar:
+        with AlmacenINALI(args.almacen) as almacen:
+            exportar_carpetas(almacen, args.exportar)
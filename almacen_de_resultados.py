@@ -0,0 +1,169 @@
+# un almacén (SQLite) con los resultados de la búsqueda de INALI en el catálogo, uno por registro MARC
+# la llave es el id del sistema (campo 001); cada registro guarda su 005 (la fecha de su última transacción, o un
+# hash de su contenido si no tiene 005) y la huella del vocabulario de INALI con la que lo comparamos. la próxima vez solamente comparamos los
+# registros nuevos o cambiados, o todos si cambió el vocabulario, y el output se reescribe desde aquí
+# uso:
+#   python almacen_de_resultados.py
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+import logging
+from collections import Counter
+
+
+logger = logging.getLogger('scrape_INALI')
+
+archivo_de_resultados = 'resultados_MARC.sqlite'
+
+# cada cuántos registros hacemos commit mientras guardamos
+registros_por_transaccion = 10000
+
+esquema = '''
+CREATE TABLE IF NOT EXISTS registros (
+    id TEXT PRIMARY KEY,
+    f005 TEXT NOT NULL,
+    huella TEXT NOT NULL,
+    index_del_registro TEXT NOT NULL,
+    orden INTEGER NOT NULL,
+    corrida INTEGER NOT NULL,
+    resultado TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS registros_por_orden ON registros (corrida, orden);
+CREATE TABLE IF NOT EXISTS corridas (
+    numero INTEGER PRIMARY KEY,
+    huella TEXT NOT NULL,
+    hora TEXT NOT NULL
+);
+'''
+
+
+class AlmacenDeResultados:
+    '''
+    @solo_lectura: para los procesos del pool, que solamente preguntan si un registro sigue vigente
+    el almacén usa WAL, así que los procesos pueden leer mientras el proceso principal escribe
+    '''
+
+    def __init__(self, archivo=archivo_de_resultados, solo_lectura=False):
+        self.archivo = archivo
+        self.solo_lectura = solo_lectura
+        self._conexion = None
+
+    @property
+    def conexion(self):
+        if self._conexion is None:
+            if self.solo_lectura:
+                self._conexion = sqlite3.connect('file:{}?mode=ro'.format(self.archivo), uri=True)
+            else:
+                self._conexion = sqlite3.connect(self.archivo)
+                self._conexion.execute('PRAGMA journal_mode=WAL')
+                self._conexion.executescript(esquema)
+        return self._conexion
+
+    def cerrar(self):
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def __len__(self):
+        return self.conexion.execute('SELECT COUNT(*) FROM registros').fetchone()[0]
+
+    def vigente(self, id, f005, huella):
+        '''True si ya comparamos este registro, con este 005 y con este vocabulario'''
+        fila = self.conexion.execute('SELECT f005, huella FROM registros WHERE id = ?', (id,)).fetchone()
+        return fila is not None and fila[0] == f005 and fila[1] == huella
+
+    def ultima_huella(self):
+        '''la huella del vocabulario de la última corrida, o None si es la primera'''
+        fila = self.conexion.execute('SELECT huella FROM corridas ORDER BY numero DESC LIMIT 1').fetchone()
+        return fila[0] if fila else None
+
+    def empezar_corrida(self, huella):
+        with self.conexion:
+            cursor = self.conexion.execute('INSERT INTO corridas (huella, hora) VALUES (?, ?)',
+                                           (huella, time.strftime('%Y-%m-%d %H:%M:%S')))
+        return cursor.lastrowid
+
+    def guardar(self, revisiones, huella, corrida):
+        '''
+        guardar las revisiones de una búsqueda (ver revisar_registros en comparar_registros_MARC.py):
+        un upsert por cada registro comparado, y para los que no cambiaron solamente su posición en el archivo.
+        hacemos commit cada registros_por_transaccion registros, así que una búsqueda interrumpida
+        no pierde lo que ya comparó. regresa cuántos registros fueron comparados, sin_cambios y encontrados
+        '''
+        numeros = Counter()
+        conexion = self.conexion
+        for orden, revision in enumerate(revisiones):
+            if revision.comparado:
+                conexion.execute(
+                    'INSERT INTO registros (id, f005, huella, index_del_registro, orden, corrida, resultado) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (id) DO UPDATE SET f005 = excluded.f005, huella = excluded.huella, '
+                    'index_del_registro = excluded.index_del_registro, orden = excluded.orden, '
+                    'corrida = excluded.corrida, resultado = excluded.resultado',
+                    (revision.id, revision.f005, huella, revision.index, orden, corrida,
+                     json.dumps(revision.resultado) if revision.resultado else None))
+                numeros['comparados'] += 1
+                numeros['encontrados'] += bool(revision.resultado)
+            else:
+                conexion.execute('UPDATE registros SET index_del_registro = ?, orden = ?, corrida = ? WHERE id = ?',
+                                 (revision.index, orden, corrida, revision.id))
+                numeros['sin_cambios'] += 1
+
+            if (orden + 1) % registros_por_transaccion == 0:
+                conexion.commit()
+        conexion.commit()
+        return numeros
+
+    def borrar_ausentes(self, corrida):
+        '''borrar los registros que no aparecieron en esta corrida (p.ej. los que ya no están en el catálogo)'''
+        with self.conexion:
+            cursor = self.conexion.execute('DELETE FROM registros WHERE corrida != ?', (corrida,))
+        return cursor.rowcount
+
+    def resultados(self, corrida=None):
+        '''
+        los resultados de los registros donde encontramos datos de INALI, con el index de su última corrida,
+        en el orden del archivo de la última corrida (y después los que no aparecieron en ella).
+        con una corrida, solamente los registros del archivo de esa corrida: guardar apunta la corrida de cada
+        registro revisado, aunque no haya cambiado, así que los de otros archivos no salen
+        '''
+        if corrida is None:
+            consulta, parametros = ('SELECT index_del_registro, resultado FROM registros WHERE resultado IS NOT NULL '
+                                    'ORDER BY corrida DESC, orden'), ()
+        else:
+            consulta, parametros = ('SELECT index_del_registro, resultado FROM registros '
+                                    'WHERE corrida = ? AND resultado IS NOT NULL ORDER BY orden'), (corrida,)
+        for index, resultado in self.conexion.execute(consulta, parametros):
+            resultado = json.loads(resultado)
+            resultado['index'] = index
+            yield resultado
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level='INFO', format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='el almacén de resultados de la búsqueda de INALI en el catálogo')
+    parser.add_argument('--resultados', default=archivo_de_resultados)
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.resultados):
+        raise SystemExit('no existe el almacén de resultados {}'.format(args.resultados))
+
+    # un resumen: cuántos registros hay, y de qué corrida es la última versión de cada uno
+    with AlmacenDeResultados(args.resultados) as almacen:
+        logger.info('{} registros en {}'.format(len(almacen), args.resultados))
+        consulta = ('SELECT corridas.numero, corridas.hora, corridas.huella, COUNT(registros.id), '
+                    'COUNT(registros.resultado) FROM corridas LEFT JOIN registros ON registros.corrida = corridas.numero '
+                    'GROUP BY corridas.numero ORDER BY corridas.numero')
+        for numero, hora, huella, registros, encontrados in almacen.conexion.execute(consulta):
+            logger.info('corrida {} ({}, vocabulario {}): {} registros, {} con datos de INALI'.format(
+                numero, hora, huella, registros, encontrados))
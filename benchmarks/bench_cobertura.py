@@ -0,0 +1,110 @@
+# el reporte de cobertura de cobertura.py sobre millones de datos encontrados sintéticos (nombres de variantes y
+# agrupaciones de INALI repartidos entre registros al azar): la exportación en columnas, la lectura de Parquet o npz,
+# y los group-bys vectorizados contra el mismo reporte con dicts y sets de python, que tiene que dar lo mismo
+# uso: python -m benchmarks.bench_cobertura --encontrados 2000000
+#      python -m benchmarks.bench_cobertura --encontrados 200000 --formato npz
+
+import os
+import time
+import random
+import argparse
+import tempfile
+from collections import defaultdict
+
+from almacen_INALI import datos_de_INALI
+from exportar_columnas import (exportar, formato_por_defecto, formatos, leer_tablas, tabla_de_encontrados,
+                               tablas_de_INALI)
+from cobertura import cobertura, filas_del_reporte, niveles, todos_los_estados
+
+
+def resultados_sinteticos(datos_de_inali, encontrados, por_registro=3, semilla=0):
+    '''resultados con el modelo de datos_del_registro; uno de cada cinco datos es una agrupación'''
+    aleatorio = random.Random(semilla)
+    variantes = [dato['variante'] for dato in datos_de_inali]
+    agrupaciones = sorted({dato['agrupacion_lingüística'] for dato in datos_de_inali})
+    campos = ['650$a', '546$a', '041$a', '100$a', '650$x']
+    for numero in range(encontrados // por_registro):
+        resultado = {'index': str(numero), 'id': str(1000000 + numero), 'agrupaciones': [], 'campos_de_agrupaciones': [],
+                     'variantes': [], 'campos_de_variantes': []}
+        for _ in range(por_registro):
+            columna, nombres = ('agrupaciones', agrupaciones) if aleatorio.random() < 0.2 else ('variantes', variantes)
+            resultado[columna].append(aleatorio.choice(nombres))
+            resultado['campos_de_' + columna].append(aleatorio.choice(campos))
+        yield resultado
+
+
+def cobertura_en_python(datos_de_inali, resultados, nivel, por_estado):
+    '''el mismo reporte, fila por fila: {(grupo, estado): (variantes, cubiertas, registros)}'''
+    def grupo_de(dato):
+        return dato['variante'] if nivel == 'variante' else dato['agrupacion_lingüística' if nivel == 'agrupacion' else 'familia_lingüística']
+
+    estados_de_variante, variantes_de_agrupacion = {}, defaultdict(list)
+    for dato in datos_de_inali:
+        estados_de_variante[dato['variante']] = ({estado for repr_geo in dato['representación_geográfica'] for estado in repr_geo}
+                                                 if por_estado else {todos_los_estados})
+        variantes_de_agrupacion[dato['agrupacion_lingüística']].append(dato)
+
+    registros_de_variante, registros_de_celda = defaultdict(set), defaultdict(set)
+    for resultado in resultados:
+        for nombre in resultado['variantes']:
+            if nombre in estados_de_variante:
+                registros_de_variante[nombre].add(resultado['id'])
+        if nivel != 'variante':
+            for nombre in resultado['agrupaciones']:
+                for dato in variantes_de_agrupacion.get(nombre, []):
+                    for estado in estados_de_variante[dato['variante']]:
+                        registros_de_celda[(grupo_de(dato), estado)].add(resultado['id'])
+
+    reporte = {}
+    for dato in datos_de_inali:
+        for estado in estados_de_variante[dato['variante']]:
+            celda = (grupo_de(dato), estado)
+            variantes, cubiertas, _ = reporte.get(celda, (0, 0, 0))
+            reporte[celda] = (variantes + 1, cubiertas + bool(registros_de_variante[dato['variante']]), 0)
+            registros_de_celda[celda] |= registros_de_variante[dato['variante']]
+    return {celda: (variantes, cubiertas, len(registros_de_celda[celda])) for celda, (variantes, cubiertas, _) in reporte.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='el reporte de cobertura vectorizado contra el mismo en python')
+    parser.add_argument('--encontrados', type=int, default=2000000)
+    parser.add_argument('--formato', choices=formatos, default=formato_por_defecto())
+    parser.add_argument('--sin-python', action='store_true', help='no correr la versión en python (es lenta)')
+    args = parser.parse_args()
+
+    datos_de_inali = datos_de_INALI()
+    resultados = list(resultados_sinteticos(datos_de_inali, args.encontrados))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inicio = time.perf_counter()
+        variantes, estados = tablas_de_INALI(datos_de_inali)
+        encontrados = tabla_de_encontrados(resultados)
+        segundos = time.perf_counter() - inicio
+        print('codificar {:,} datos encontrados: {:.2f} s ({:,.0f} datos/s)'.format(
+            len(encontrados['puntaje']), segundos, len(encontrados['puntaje']) / segundos))
+
+        inicio = time.perf_counter()
+        archivos = exportar({'variantes': variantes, 'estados': estados, 'encontrados': encontrados}, tmp, args.formato)
+        print('escribir {}: {:.2f} s, {:,.1f} MB'.format(
+            args.formato, time.perf_counter() - inicio, sum(os.path.getsize(archivo) for archivo in archivos) / 1e6))
+        inicio = time.perf_counter()
+        tablas = leer_tablas(tmp)
+        print('leer {}: {:.2f} s'.format(args.formato, time.perf_counter() - inicio))
+
+    for nivel in niveles:
+        for por_estado in (True, False):
+            inicio = time.perf_counter()
+            filas = filas_del_reporte(cobertura(*tablas, nivel=nivel, por_estado=por_estado))
+            vectorizado = time.perf_counter() - inicio
+            linea = '{:<10} {:<12} {:>5} filas  NumPy {:>7.3f} s'.format(nivel, 'por estado' if por_estado else 'sin estados',
+                                                                        len(filas), vectorizado)
+            if not args.sin_python:
+                inicio = time.perf_counter()
+                esperado = cobertura_en_python(datos_de_inali, resultados, nivel, por_estado)
+                en_python = time.perf_counter() - inicio
+                obtenido = {(grupo, estado): (variantes, cubiertas, registros)
+                            for grupo, estado, variantes, cubiertas, _, registros in filas}
+                if obtenido != esperado:
+                    raise SystemExit('{} ({}): el reporte vectorizado no es igual al de python'.format(nivel, por_estado))
+                linea += '  python {:>7.2f} s  {:>6.1f}x  iguales'.format(en_python, en_python / vectorizado)
+            print(linea)
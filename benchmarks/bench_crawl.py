@@ -0,0 +1,75 @@
+# comparar el crawl secuencial con el crawl de N hilos (crawl_con_diario, como en sacar_datos_de_INALI.py)
+# contra un servidor local. asegura que los archivos de JSON salen idénticos, byte por byte
+# uso: python -m benchmarks.bench_crawl --hilos 8 --latencia 0.05
+
+import os
+import time
+import filecmp
+import argparse
+import tempfile
+
+import sacar_datos_de_INALI as scraper
+from cola_de_trabajo import DiarioDelCrawl
+from benchmarks.paginas_de_prueba import generar_paginas, servir
+
+
+def correr_crawl(base_url, carpeta, max_hilos=0, por_segundo=0.0, cache=None, rapido=False):
+    '''
+    un crawl entero con un diario nuevo (en la carpeta de output) que escribe los archivos de JSON a "carpeta"
+    regresa (los datos de los variantes, los números de datos) de resultados_del_diario
+    '''
+    os.makedirs(carpeta, exist_ok=True)
+    diario = DiarioDelCrawl(os.path.join(carpeta, 'diario.jsonl'), base_url=base_url, desde_cero=True)
+    scraper.crawl_con_diario(base_url, diario, os.path.join(carpeta, 'agrupaciones'), max_hilos=max_hilos,
+                             por_segundo=por_segundo, cache=cache, rapido=rapido, intentos=1)
+    resultados = scraper.resultados_del_diario(diario, base_url)
+    diario.terminar()
+    return resultados
+
+
+def comparar_carpetas(a, b):
+    '''regresa la lista de archivos que no son idénticos (o que faltan en uno de los dos lados)'''
+    diferencias = []
+    comparacion = filecmp.dircmp(a, b)
+    pendientes = [('', comparacion)]
+    while pendientes:
+        prefijo, comp = pendientes.pop()
+        diferencias.extend(os.path.join(prefijo, f) for f in comp.left_only + comp.right_only)
+        _, distintos, errores = filecmp.cmpfiles(comp.left, comp.right, comp.common_files, shallow=False)
+        diferencias.extend(os.path.join(prefijo, f) for f in distintos + errores)
+        pendientes.extend((os.path.join(prefijo, nombre), sub) for nombre, sub in comp.subdirs.items())
+    return diferencias
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='crawl secuencial vs N hilos contra páginas guardadas')
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--por-segundo', type=float, default=0.0)
+    parser.add_argument('--latencia', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paginas = os.path.join(tmp, 'paginas')
+        generar_paginas('agrupaciones_de_INALI', paginas)
+        servidor, base_url = servir(paginas, latencia=args.latencia)
+
+        tiempos, resultados = {}, {}
+        for modo, hilos in [('secuencial', 0), ('{} hilos'.format(args.hilos), args.hilos)]:
+            inicio = time.perf_counter()
+            resultados[modo] = correr_crawl(base_url, os.path.join(tmp, str(hilos)), hilos, args.por_segundo)
+            tiempos[modo] = time.perf_counter() - inicio
+
+        servidor.shutdown()
+        diferencias = comparar_carpetas(os.path.join(tmp, '0', 'agrupaciones'),
+                                        os.path.join(tmp, str(args.hilos), 'agrupaciones'))
+
+    (secuencial, (variantes, numeros)), (concurrente, (variantes_concurrentes, _)) = resultados.items()
+    paginas_bajadas = 1 + 2 * numeros['agrupaciones']
+    for modo, segundos in tiempos.items():
+        print('{:<12} {:>8.2f} s  ({:.1f} páginas/s)'.format(modo, segundos, paginas_bajadas / segundos))
+    print('aceleración: {:.1f}x'.format(tiempos[secuencial] / tiempos[concurrente]))
+    if numeros['tareas_fallidas']:
+        raise SystemExit('{} tareas fallaron'.format(numeros['tareas_fallidas']))
+    if diferencias or variantes != variantes_concurrentes:
+        raise SystemExit('los resultados no son idénticos: {}'.format(diferencias))
+    print('las {} agrupaciones ({} variantes) salen idénticas en los dos modos'.format(numeros['agrupaciones'], len(variantes)))
@@ -0,0 +1,75 @@
+# comparar el loop de siempre (value.lower() in una lista) con el Emparejador
+# sobre el ejemplo de Náhuatl repetido hasta un millón de rows
+# uso: python -m benchmarks.bench_emparejador --filas 1000000
+
+import os
+import csv
+import time
+import argparse
+import tempfile
+
+from almacen_INALI import sacar_datos_de_carpetas
+from emparejador_INALI import Emparejador
+from emparejador_difuso import EmparejadorDifuso
+from comparar_registros_MARC import emparejar_valor
+from benchmarks.catalogo_sintetico import escribir_catalogo
+
+
+def loop_de_siempre(archivo, datos_de_inali):
+    '''el loop original de comparar_registros_MARC.py: igualdad exacta contra listas'''
+    agrups_lower = [agrupacion.lower() for agrupacion in {dato['agrupacion_lingüística'] for dato in datos_de_inali}]
+    variantes = [dato['variante'].lower() for dato in datos_de_inali]
+    encontrados = 0
+    with open(archivo, 'r') as marcs:
+        for row in csv.reader(marcs):
+            if row[1] in ('LDR', '001'):
+                continue
+            for value in row:
+                if value.lower() in agrups_lower:
+                    encontrados += 1
+                if value.lower() in variantes:
+                    encontrados += 1
+    return encontrados
+
+
+def loop_con_emparejador(archivo, emparejador):
+    encontrados = 0
+    with open(archivo, 'r') as marcs:
+        for row in csv.reader(marcs):
+            if row[1] in ('LDR', '001'):
+                continue
+            for value in row:
+                encontrados += len(emparejar_valor(emparejador, value))
+    return encontrados
+
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='loop de siempre vs Emparejador')
+    parser.add_argument('--filas', type=int, default=1000000)
+    args = parser.parse_args()
+
+    datos_de_inali = sacar_datos_de_carpetas('agrupaciones_de_INALI')
+    emparejador, construccion = medir(Emparejador, datos_de_inali)
+    print('Emparejador: {} términos construidos en {:.1f} ms'.format(len(emparejador), construccion * 1000))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archivo = os.path.join(tmp, 'catalogo.csv')
+        filas, registros = escribir_catalogo(archivo, filas=args.filas)
+
+        # sin autodenominaciones también, para mostrar que agregarlas no cambia el tiempo por registro
+        sin_autodes = Emparejador([dict(dato, autodenominaciones=[]) for dato in datos_de_inali])
+
+        for nombre, funcion, extra in [
+            ('loop de siempre (exacto, listas)', loop_de_siempre, datos_de_inali),
+            ('Emparejador sin autodenominaciones', loop_con_emparejador, sin_autodes),
+            ('Emparejador (todas las ocurrencias)', loop_con_emparejador, emparejador),
+            ('EmparejadorDifuso (trigramas)', loop_con_emparejador, EmparejadorDifuso(datos_de_inali)),
+        ]:
+            encontrados, segundos = medir(funcion, archivo, extra)
+            print('{:<38} {:>7.2f} s  {:>10,.0f} rows/s  {:>8,} encontrados'.format(nombre, segundos, filas / segundos, encontrados))
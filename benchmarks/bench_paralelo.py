@@ -0,0 +1,43 @@
+# medir cómo escala la búsqueda con el número de procesos, sobre un catálogo sintético
+# asegura que el output en paralelo es idéntico (y en el mismo orden) que con un solo proceso
+# uso: python -m benchmarks.bench_paralelo --registros 100000
+
+import os
+import time
+import argparse
+import tempfile
+
+from almacen_INALI import sacar_datos_de_carpetas
+from emparejador_INALI import Emparejador
+from registros_MARC import leer_registros_csv
+from comparar_registros_MARC import comparar_registros, comparar_en_paralelo
+from benchmarks.catalogo_sintetico import escribir_catalogo
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='escalabilidad de comparar_en_paralelo')
+    parser.add_argument('--registros', type=int, default=100000)
+    parser.add_argument('--procesos', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    emparejador = Emparejador(sacar_datos_de_carpetas('agrupaciones_de_INALI'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archivo = os.path.join(tmp, 'catalogo.csv')
+        escribir_catalogo(archivo, registros=args.registros)
+
+        inicio = time.perf_counter()
+        referencia = list(comparar_registros(leer_registros_csv(archivo), emparejador))
+        base = time.perf_counter() - inicio
+        print('{} núcleos disponibles'.format(os.cpu_count()))
+        print('{:>3} proceso(s): {:>7.2f} s  {:>9,.0f} registros/s'.format('sec', base, args.registros / base))
+
+        for procesos in args.procesos:
+            inicio = time.perf_counter()
+            resultados = list(comparar_en_paralelo(archivo, emparejador, procesos))
+            segundos = time.perf_counter() - inicio
+            if resultados != referencia:
+                raise SystemExit('el output con {} procesos no es idéntico al secuencial'.format(procesos))
+            print('{:>3} proceso(s): {:>7.2f} s  {:>9,.0f} registros/s  aceleración {:.2f}x'.format(
+                procesos, segundos, args.registros / segundos, base / segundos))
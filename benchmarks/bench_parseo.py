@@ -0,0 +1,94 @@
+# comparar el parseo de siempre ('html.parser' con la página entera) con el parseo rápido
+# (solamente las etiquetas que usamos, con lxml si está instalado) sobre páginas guardadas, con el mismo crawl
+# de sacar_datos_de_INALI.py (crawl_con_diario). primero asegura que los dos producen exactamente los mismos datos
+# de variantes, luego mide el parseo de cada uno por página (el cronómetro inali_parseo_segundos de las métricas)
+# uso:
+#   python -m benchmarks.bench_parseo                    (páginas reconstruidas desde agrupaciones_de_INALI)
+#   python -m benchmarks.bench_parseo --cache cache_de_INALI   (las páginas reales que guardó el crawl)
+#   python -m benchmarks.bench_parseo --hilos 4
+
+import os
+import shutil
+import argparse
+import tempfile
+from urllib.parse import urlsplit
+
+import sacar_datos_de_INALI as scraper
+from cache_de_paginas import CacheDePaginas
+from metricas import metricas
+from benchmarks.bench_crawl import correr_crawl
+from benchmarks.paginas_de_prueba import generar_paginas, servir
+
+
+def bajar_de_carpeta(carpeta):
+    '''una función "bajar" que lee las páginas de una carpeta en vez de la red'''
+    def bajar(url):
+        ruta = os.path.join(carpeta, urlsplit(url).path.lstrip('/'))
+        if ruta.endswith('/'):
+            ruta += 'index.html'
+        with open(ruta, 'r', encoding='utf8') as inf:
+            return inf.read()
+    return bajar
+
+
+def segundos_de_parseo():
+    '''(segundos, páginas) de todo el parseo desde el último metricas.reiniciar()'''
+    cronometros = metricas.instantanea()['cronometros']
+    medidos = [valores for (nombre, _), valores in cronometros.items() if nombre == 'inali_parseo_segundos']
+    return sum(suma for suma, _, _, _ in medidos), sum(numero for _, numero, _, _ in medidos)
+
+
+def medir(base_url, carpeta, rapido, repeticiones, hilos=0, cache_original=None):
+    '''
+    regresa los datos de todos los variantes y los segundos de parseo por página (el mejor de las repeticiones)
+    con un cache, cada repetición usa una copia sin los datos ya parseados, para que crawl_con_diario sí parsee
+    '''
+    datos, mejor = None, float('inf')
+    for repeticion in range(repeticiones):
+        salida = os.path.join(carpeta, '{}-{}'.format('rapido' if rapido else 'siempre', repeticion))
+        cache = None
+        if cache_original:
+            shutil.copytree(cache_original, os.path.join(salida, 'cache'), ignore=shutil.ignore_patterns('*.parseado.json'))
+            cache = CacheDePaginas(os.path.join(salida, 'cache'), offline=True)
+
+        metricas.reiniciar()
+        datos, numeros = correr_crawl(base_url, salida, hilos, cache=cache, rapido=rapido)
+        if datos is None or numeros['tareas_fallidas']:
+            raise SystemExit('el crawl de {} no terminó bien ({})'.format(base_url, dict(numeros or {})))
+        segundos, paginas = segundos_de_parseo()
+        mejor = min(mejor, segundos / paginas)
+    return datos, mejor
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='parseo de siempre vs parseo rápido de las páginas de INALI')
+    parser.add_argument('--cache', help='usar las páginas reales guardadas en este cache de páginas')
+    parser.add_argument('--base-url', default='https://www.inali.gob.mx/clin-inali/')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--hilos', type=int, default=0, help='los hilos del crawl (0 = secuencial)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        servidor = None
+        if args.cache:
+            base_url = args.base_url
+        else:
+            generar_paginas('agrupaciones_de_INALI', os.path.join(tmp, 'paginas'))
+            servidor, base_url = servir(os.path.join(tmp, 'paginas'))
+
+        datos_siempre, por_pagina_siempre = medir(base_url, tmp, False, args.repeticiones, args.hilos, args.cache)
+        datos_rapido, por_pagina_rapido = medir(base_url, tmp, True, args.repeticiones, args.hilos, args.cache)
+        if servidor:
+            servidor.shutdown()
+
+    # conformidad: los dos parseos tienen que sacar exactamente los mismos diccionarios de variantes
+    distintos = [a['variante'] for a, b in zip(datos_siempre, datos_rapido) if a != b]
+    if distintos or len(datos_siempre) != len(datos_rapido):
+        raise SystemExit('el parseo rápido no produce los mismos datos en: {}'.format(distintos))
+    print('{} agrupaciones, {} variantes idénticos con los dos parseos'.format(
+        len({dato['agrupacion_lingüística'] for dato in datos_siempre}), len(datos_siempre)))
+
+    print('html.parser (página entera): {:8.2f} ms/página'.format(por_pagina_siempre * 1000))
+    print('{} (solo {}): {:8.2f} ms/página'.format(
+        scraper.parser_rapido, sorted(set(sum(scraper.etiquetas_de_pagina.values(), []))), por_pagina_rapido * 1000))
+    print('aceleración: {:.1f}x'.format(por_pagina_siempre / por_pagina_rapido))
@@ -0,0 +1,85 @@
+# comparar la búsqueda en todos los campos (como antes) con las reglas de campos y subcampos (reglas_de_campos.py)
+# sobre un catálogo sintético: registros por segundo, y qué encuentra cada una que la otra no
+# uso: python -m benchmarks.bench_reglas --registros 100000
+#      python -m benchmarks.bench_reglas --campos "041,1XX$axz,4XX$axz,5XX$axz,65X$axz,546,670$ab"
+
+import os
+import time
+import argparse
+import tempfile
+from collections import Counter
+
+from instantanea_del_emparejador import emparejador_de_INALI
+from reglas_de_campos import ReglasDeCampos, especificacion_por_defecto
+from registros_MARC import leer_registros
+from comparar_registros_MARC import emparejar_registro
+from benchmarks.catalogo_sintetico import escribir_catalogo
+
+
+def buscar(archivo, emparejador, reglas):
+    '''regresa (segundos, registros, Counter de (campo, nombre) encontrados)'''
+    encontrados = Counter()
+    registros = 0
+    inicio = time.perf_counter()
+    for registro in leer_registros(archivo):
+        registros += 1
+        resultado = emparejar_registro(registro, emparejador, reglas)
+        if resultado:
+            for columna in ('agrupaciones', 'variantes'):
+                encontrados.update(zip(resultado['campos_de_' + columna], resultado[columna]))
+    return time.perf_counter() - inicio, registros, encontrados
+
+
+def fuera_de_las_reglas(encontrados, reglas):
+    '''los encontrados en un campo o subcampo que las reglas excluyen; con las reglas tiene que ser nada'''
+    fuera = Counter()
+    for (campo, nombre), numero in encontrados.items():
+        etiqueta, _, codigo = campo.partition('$')
+        subcampos = reglas.subcampos_de(etiqueta)
+        if subcampos is None or codigo not in subcampos:
+            fuera[(campo, nombre)] += numero
+    return fuera
+
+
+def por_campo(encontrados):
+    '''"650$a" y "650" cuentan como el mismo campo, para comparar con la búsqueda en todos los campos'''
+    return Counter({(campo.split('$')[0], nombre): numero for (campo, nombre), numero in encontrados.items()})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='todos los campos vs las reglas de campos y subcampos')
+    parser.add_argument('--registros', type=int, default=100000)
+    parser.add_argument('--campos', default=especificacion_por_defecto)
+    parser.add_argument('--marc', help='un archivo de registros MARC en vez del catálogo sintético')
+    parser.add_argument('--difuso', action='store_true')
+    args = parser.parse_args()
+
+    emparejador, _ = emparejador_de_INALI(difuso=args.difuso)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archivo = args.marc
+        if not archivo:
+            archivo = os.path.join(tmp, 'catalogo.csv')
+            escribir_catalogo(archivo, registros=args.registros)
+
+        resultados = {}
+        for nombre, reglas in [('todos los campos', ReglasDeCampos('todos')), (args.campos, ReglasDeCampos(args.campos))]:
+            segundos, registros, encontrados = buscar(archivo, emparejador, reglas)
+            resultados[nombre] = (segundos, encontrados)
+            print('{:<48} {:>7.2f} s  {:>9,.0f} registros/s  {:>9,} encontrados'.format(
+                nombre, segundos, registros / segundos, sum(encontrados.values())))
+
+    (segundos_todos, todos), (segundos_reglas, con_reglas) = resultados.values()
+    print('aceleración: {:.2f}x'.format(segundos_todos / segundos_reglas))
+
+    perdidos = por_campo(todos) - por_campo(con_reglas)
+    print('{:,} encontrados en campos o subcampos fuera de las reglas:'.format(sum(perdidos.values())))
+    for (campo, nombre), numero in sorted(perdidos.items(), key=lambda x: (-x[1], x[0]))[:20]:
+        print('  {:>4} {:<30} {:>9,}'.format(campo, nombre, numero))
+
+    # un campo excluido (p.ej. las citas del 670) no puede dar nada con las reglas
+    fuera = fuera_de_las_reglas(con_reglas, ReglasDeCampos(args.campos))
+    if fuera:
+        raise SystemExit('{:,} encontrados en campos excluidos por las reglas: {}'.format(
+            sum(fuera.values()), ', '.join('{} {}'.format(campo, nombre) for campo, nombre in sorted(fuera)[:10])))
+    print('nada encontrado en los campos excluidos por las reglas')
@@ -0,0 +1,120 @@
+# medir la latencia y el rendimiento de servicio_INALI.py: un valor por petición contra lotes de registros,
+# con varios clientes a la vez y una recarga a la mitad. asegura que los resultados del servicio son idénticos
+# a los de emparejar_registro y que ninguna petición falla durante la recarga
+# uso: python -m benchmarks.bench_servicio --registros 2000 --lote 200 --clientes 4
+
+import json
+import time
+import argparse
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+from servicio_INALI import ServicioINALI, servir
+from comparar_registros_MARC import emparejar_registro
+from registros_MARC import RegistroMARC
+from benchmarks.catalogo_sintetico import leer_registros_del_ejemplo
+
+
+def registros_de_prueba(numero):
+    ejemplo = leer_registros_del_ejemplo()
+    return [{'index': str(i), 'rows': [[str(i)] + row[1:] for row in ejemplo[i % len(ejemplo)]]} for i in range(numero)]
+
+
+class Cliente:
+    '''una conexión keep-alive al servicio, para un solo hilo'''
+
+    def __init__(self, puerto):
+        self.conexion = http.client.HTTPConnection('127.0.0.1', puerto)
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        datos = json.dumps(cuerpo).encode('utf8') if cuerpo is not None else None
+        self.conexion.request(metodo, ruta, body=datos, headers={'Content-Type': 'application/json'})
+        respuesta = self.conexion.getresponse()
+        contenido = json.loads(respuesta.read())
+        if respuesta.status != 200:
+            raise RuntimeError('{} {}: {} {}'.format(metodo, ruta, respuesta.status, contenido))
+        return contenido
+
+    def codigo(self, metodo, ruta, cuerpo):
+        '''solamente el código de la respuesta, para las peticiones que tienen que fallar'''
+        self.conexion.request(metodo, ruta, body=json.dumps(cuerpo).encode('utf8'), headers={'Content-Type': 'application/json'})
+        respuesta = self.conexion.getresponse()
+        respuesta.read()
+        return respuesta.status
+
+
+# registros mal formados: el servicio tiene que contestar 400, no 500
+registros_malos = [
+    {'index': '1', 'rows': 'no es una lista'},
+    {'index': '1', 'rows': ['no es un row']},
+    {'index': '1', 'rows': [['1', '650', '']]},
+    {'index': '1', 'rows': [['1', '650', ' 0', 'a', 7]]},
+]
+
+
+def medir(nombre, trabajos, clientes, puerto, unidades, unidad):
+    '''correr los trabajos (funciones de un Cliente) en "clientes" hilos; imprime latencia y rendimiento'''
+    locales = threading.local()
+
+    def correr(trabajo):
+        if not hasattr(locales, 'cliente'):
+            locales.cliente = Cliente(puerto)
+        inicio = time.perf_counter()
+        resultado = trabajo(locales.cliente)
+        return time.perf_counter() - inicio, resultado
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(clientes) as pool:
+        medidos = list(pool.map(correr, trabajos))
+    segundos = time.perf_counter() - inicio
+    latencias = sorted(latencia for latencia, _ in medidos)
+    print('{:<28} {:>6} peticiones  {:>9,.0f} {}/s  latencia p50 {:>7.2f} ms  p99 {:>7.2f} ms'.format(
+        nombre, len(trabajos), unidades / segundos, unidad,
+        latencias[len(latencias) // 2] * 1000, latencias[int(len(latencias) * 0.99)] * 1000))
+    return [resultado for _, resultado in medidos]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='latencia y rendimiento del servicio local de INALI')
+    parser.add_argument('--registros', type=int, default=2000)
+    parser.add_argument('--lote', type=int, default=200, help='registros por petición a /lote')
+    parser.add_argument('--clientes', type=int, default=4, help='hilos que piden a la vez')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    servicio = ServicioINALI()
+    print('el servicio cargó el vocabulario en {:.2f} s'.format(time.perf_counter() - inicio))
+    servidor = servir(servicio, puerto=0)
+    puerto = servidor.server_address[1]
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    registros = registros_de_prueba(args.registros)
+    referencia = [emparejar_registro(RegistroMARC(r['index'], r['rows']), servicio.vocabulario.emparejador) for r in registros]
+    valores = [row[4] for registro in registros for row in registro['rows'] if row[1] not in ('LDR', '001')][:args.registros]
+
+    medir('un valor por petición', [lambda c, v=v: c.pedir('POST', '/buscar', {'valor': v}) for v in valores],
+          args.clientes, puerto, len(valores), 'valores')
+    lotes = [registros[i:i + args.lote] for i in range(0, len(registros), args.lote)]
+    respuestas = medir('lotes de registros', [lambda c, l=l: c.pedir('POST', '/lote', {'registros': l}) for l in lotes],
+                       args.clientes, puerto, len(registros), 'registros')
+    resultados = [r['resultado'] for respuesta in respuestas for r in respuesta['registros']]
+    if resultados != referencia:
+        raise SystemExit('los resultados del servicio no son idénticos a los de emparejar_registro')
+
+    # una recarga mientras los clientes siguen pidiendo: ninguna petición puede fallar
+    recarga = threading.Thread(target=lambda: Cliente(puerto).pedir('POST', '/recargar'))
+    recarga.start()
+    medir('lotes durante una recarga', [lambda c, l=l: c.pedir('POST', '/lote', {'registros': l}) for l in lotes],
+          args.clientes, puerto, len(registros), 'registros')
+    recarga.join()
+
+    cliente = Cliente(puerto)
+    for registro in registros_malos:
+        codigo = cliente.codigo('POST', '/lote', {'registros': [registro]})
+        if codigo != 400:
+            raise SystemExit('el registro mal formado {} dio {} en vez de 400'.format(registro, codigo))
+    print('{} registros mal formados dieron 400'.format(len(registros_malos)))
+
+    print(json.dumps(Cliente(puerto).pedir('GET', '/metricas')['rendimiento']))
+    servidor.shutdown()
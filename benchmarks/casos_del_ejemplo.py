@@ -0,0 +1,72 @@
+# casos conocidos del ejemplo documentos/Jonathan_Israel_results_nahuatl.csv: nombres que un registro tiene que dar,
+# y falsos positivos que ya corregimos y no deben volver. revisamos todos los campos (--campos todos), para que los
+# casos prueben el emparejador y no las reglas de campos
+# uso: python -m benchmarks.casos_del_ejemplo
+#      python -m benchmarks.casos_del_ejemplo --ejemplo otro.csv
+
+import argparse
+from collections import namedtuple
+
+from almacen_INALI import datos_de_INALI
+from comparar_registros_MARC import emparejar_registro
+from emparejador_INALI import Emparejador
+from reglas_de_campos import ReglasDeCampos
+from registros_MARC import leer_registros_csv
+
+
+ejemplo = 'documentos/Jonathan_Israel_results_nahuatl.csv'
+
+# @index: el registro del ejemplo
+# @columna: 'agrupaciones' o 'variantes'
+# @nombre: la agrupación o variante
+# @esperado: True si el registro la tiene que dar, False si no
+# @difuso: si el caso es del emparejador difuso (ver emparejador_difuso.py)
+Caso = namedtuple('Caso', ['index', 'columna', 'nombre', 'esperado', 'difuso', 'razon'])
+
+casos = [
+    Caso('3', 'agrupaciones', 'mayo', True, False, '550$a "Mayo (Idioma)"'),
+    Caso('9', 'agrupaciones', 'mayo', True, False, '551$a "Mayo dialect (Piman)"'),
+    Caso('11', 'agrupaciones', 'mayo', True, False, '550$a "Mayo-Yaqui"'),
+    Caso('13', 'agrupaciones', 'mayo', False, False, '670$a "Dicc. de la lengua española, 12 mayo 2008" es el mes'),
+    Caso('13', 'variantes', 'mayo', False, False, '670$a "Dicc. de la lengua española, 12 mayo 2008" es el mes'),
+    Caso('3', 'agrupaciones', 'matlatzinca', True, True, '550$a "Matlatzinga (Idioma)", con otra ortografía'),
+    Caso('9', 'agrupaciones', 'mixteco', True, True, '551$a "Mixtec language", sin la vocal final'),
+    Caso('13', 'variantes', 'náhuatl alto del norte de Puebla', False, True,
+         '670$a "Del nahua náhuatl": "nahua" no es la autodenominación "nahuat"'),
+    Caso('14', 'variantes', 'náhuatl alto del norte de Puebla', False, True,
+         '551$a "Nahua-cuitlateco" y "Yuto-nahua del sur": "nahua" no es la autodenominación "nahuat"'),
+]
+
+
+def revisar_casos(archivo=ejemplo, casos=casos, umbral=0.7):
+    '''los casos que fallan, como (caso, los nombres que encontramos en la columna del caso)'''
+    datos_de_inali = datos_de_INALI()
+    emparejadores = {False: Emparejador(datos_de_inali)}
+    if any(caso.difuso for caso in casos):
+        from emparejador_difuso import EmparejadorDifuso
+        emparejadores[True] = EmparejadorDifuso(datos_de_inali, umbral=umbral)
+
+    reglas = ReglasDeCampos('todos')
+    registros = {registro.index: registro for registro in leer_registros_csv(archivo)}
+    fallas = []
+    for caso in casos:
+        resultado = emparejar_registro(registros[caso.index], emparejadores[caso.difuso], reglas)
+        nombres = resultado[caso.columna] if resultado else []
+        if (caso.nombre in nombres) != caso.esperado:
+            fallas.append((caso, nombres))
+    return fallas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='los casos conocidos del ejemplo')
+    parser.add_argument('--ejemplo', default=ejemplo)
+    parser.add_argument('--umbral', type=float, default=0.7, help='el umbral del emparejador difuso')
+    args = parser.parse_args()
+
+    fallas = revisar_casos(args.ejemplo, umbral=args.umbral)
+    for caso, nombres in fallas:
+        print('FALLA registro {} {} "{}" ({}): {}'.format(
+            caso.index, caso.columna, caso.nombre, caso.razon, 'encontramos ' + ', '.join(nombres) if nombres else 'no lo encontramos'))
+    print('{} de {} casos bien'.format(len(casos) - len(fallas), len(casos)))
+    if fallas:
+        raise SystemExit(1)
@@ -0,0 +1,55 @@
+# catálogos sintéticos grandes, hechos de los registros del ejemplo de Náhuatl repetidos,
+# para medir la búsqueda a la escala de un catálogo entero
+# uso: python -m benchmarks.catalogo_sintetico --filas 1000000 /tmp/catalogo_1M.csv
+
+import os
+import csv
+import argparse
+
+
+MARC_ejemplo = os.path.join('documentos', 'Jonathan_Israel_results_nahuatl.csv')
+
+
+def leer_registros_del_ejemplo(archivo=MARC_ejemplo):
+    '''los registros del ejemplo como listas de rows, en orden'''
+    registros = []
+    with open(archivo, 'r') as marcs:
+        for row in csv.reader(marcs):
+            if not registros or registros[-1][0][0] != row[0]:
+                registros.append([])
+            registros[-1].append(row)
+    return registros
+
+
+def escribir_catalogo(destino, filas=None, registros=None, origen=MARC_ejemplo):
+    '''
+    repetir los registros del ejemplo, con indexes nuevos (1, 2, 3...) e ids del 001 únicos,
+    hasta tener "filas" rows o "registros" registros. regresa (filas, registros) escritos
+    '''
+    ejemplo = leer_registros_del_ejemplo(origen)
+    filas_escritas = 0
+    index = 0
+    with open(destino, 'w', newline='') as outfile:
+        escritor = csv.writer(outfile)
+        while (filas is None or filas_escritas < filas) and (registros is None or index < registros):
+            registro = ejemplo[index % len(ejemplo)]
+            index += 1
+            for row in registro:
+                nuevo = [str(index)] + row[1:]
+                if row[1] == '001':
+                    nuevo[4] = '{}-{}'.format(row[4], index)
+                escritor.writerow(nuevo)
+                filas_escritas += 1
+    return filas_escritas, index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='escribir un catálogo sintético desde el ejemplo de Náhuatl')
+    parser.add_argument('destino')
+    parser.add_argument('--filas', type=int)
+    parser.add_argument('--registros', type=int)
+    args = parser.parse_args()
+    if args.filas is None and args.registros is None:
+        parser.error('hace falta --filas o --registros')
+
+    print('{} filas, {} registros escritos a {}'.format(*escribir_catalogo(args.destino, args.filas, args.registros), args.destino))
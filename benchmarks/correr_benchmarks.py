@@ -0,0 +1,233 @@
+# la suite de benchmarks: los extractores del scraper sobre páginas de INALI guardadas y la búsqueda en
+# catálogos sintéticos de 10k, 100k y 1M registros hechos del ejemplo de Náhuatl. todo corre sin red.
+# cada caso corre en su propio proceso para medir su memoria pico sin contar los casos anteriores.
+# escribe los resultados como JSON (con el commit de git) para comparar dos commits:
+#   python -m benchmarks.correr_benchmarks
+#   python -m benchmarks.correr_benchmarks --tamanos 10000 --output /tmp/antes.json
+#   python -m benchmarks.correr_benchmarks --comparar /tmp/antes.json benchmarks/resultados/<commit>.json
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+from collections import Counter
+
+carpeta_de_datos = os.path.join('benchmarks', 'datos')
+carpeta_de_resultados = os.path.join('benchmarks', 'resultados')
+tamanos_por_defecto = [10000, 100000, 1000000]
+
+
+def memoria_pico_mb():
+    '''la memoria pico (RSS) de este proceso; linux da KB y macOS da bytes'''
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def medir_etapa(tiempos, etapa, funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    tiempos[etapa] += time.perf_counter() - inicio
+    return resultado
+
+
+def caso_scraper(paginas):
+    '''los extractores de sacar_datos_de_INALI.py sobre las páginas guardadas en "paginas", etapa por etapa'''
+    import sacar_datos_de_INALI as scraper
+    from benchmarks.bench_parseo import bajar_de_carpeta
+
+    base_url = 'http://127.0.0.1/clin-inali/'
+    bajar = bajar_de_carpeta(paginas)
+    textos = {}
+    caldo = scraper.hacer_sopa(bajar(base_url), 'base')
+    for agrup_url in scraper.get_agrup_urls(caldo, base_url):
+        textos[agrup_url] = bajar(agrup_url)
+        sopa = scraper.hacer_sopa(textos[agrup_url], 'agrupacion')
+        var_url = ''.join([base_url, 'html/', sopa.find('a').attrs['href']])
+        textos[var_url] = bajar(var_url)
+
+    resultados = {}
+    for rapido in (False, True):
+        tiempos = Counter()
+        variantes = 0
+        inicio = time.perf_counter()
+        for url, texto in textos.items():
+            if '/l_' in url:
+                sopa = medir_etapa(tiempos, 'hacer_sopa', scraper.hacer_sopa, texto, 'agrupacion', rapido)
+                medir_etapa(tiempos, 'sacar_agrup_y_familia', scraper.sacar_agrup_y_familia, sopa)
+                continue
+
+            guisado = medir_etapa(tiempos, 'hacer_sopa', scraper.hacer_sopa, texto, 'variantes', rapido)
+            for tr in guisado.find_all('tr')[1:]:
+                all_tds = tr.find_all('td')
+                medir_etapa(tiempos, 'sacar_autodes', scraper.sacar_autodes, all_tds[0])
+                medir_etapa(tiempos, 'sacar_variante', scraper.sacar_variante, all_tds[0])
+                medir_etapa(tiempos, 'parse_datos_geos', lambda td: [g for g in scraper.parse_datos_geos(td) if g], all_tds[1])
+                variantes += 1
+        segundos = time.perf_counter() - inicio
+
+        resultados['parseo_rapido' if rapido else 'parseo_de_siempre'] = {
+            'paginas': len(textos),
+            'variantes': variantes,
+            'segundos': segundos,
+            'paginas_por_segundo': len(textos) / segundos,
+            'etapas': dict(tiempos)
+        }
+    return resultados
+
+
+def caso_emparejador(archivo, difuso=False):
+    '''la búsqueda entera (leer, emparejar, escribir) sobre un catálogo sintético, etapa por etapa'''
+    import tempfile
+    from almacen_INALI import sacar_datos_de_carpetas
+    from emparejador_INALI import Emparejador
+    from emparejador_difuso import EmparejadorDifuso
+    from registros_MARC import leer_registros_csv
+    from comparar_registros_MARC import emparejar_registro, EscritorDeResultados, campos_del_output
+
+    tiempos = Counter()
+    datos_de_inali = medir_etapa(tiempos, 'cargar_INALI', sacar_datos_de_carpetas, 'agrupaciones_de_INALI')
+    clase = EmparejadorDifuso if difuso else Emparejador
+    emparejador = medir_etapa(tiempos, 'construir_emparejador', clase, datos_de_inali)
+
+    registros = 0
+    encontrados = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        inicio = time.perf_counter()
+        with EscritorDeResultados(os.path.join(tmp, 'resultados.csv'), campos_del_output(difuso)) as escritor:
+            lector = leer_registros_csv(archivo)
+            while True:
+                registro = medir_etapa(tiempos, 'leer', next, lector, None)
+                if registro is None:
+                    break
+                registros += 1
+                resultado = medir_etapa(tiempos, 'emparejar', emparejar_registro, registro, emparejador)
+                if resultado:
+                    encontrados += 1
+                    medir_etapa(tiempos, 'escribir', escritor.escribir, resultado)
+        segundos = time.perf_counter() - inicio
+
+    return {
+        'registros': registros,
+        'registros_con_datos': encontrados,
+        'segundos': segundos,
+        'registros_por_segundo': registros / segundos,
+        'etapas': dict(tiempos)
+    }
+
+
+def correr_caso(argumentos):
+    '''correr un caso en un proceso nuevo y regresar su JSON, con la memoria pico de ese proceso'''
+    salida = subprocess.run([sys.executable, '-m', 'benchmarks.correr_benchmarks', '--caso'] + argumentos,
+                            check=True, capture_output=True, text=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def preparar_datos(tamanos):
+    '''las páginas y los catálogos sintéticos; los guardamos en benchmarks/datos para no regenerarlos cada vez'''
+    from benchmarks.paginas_de_prueba import generar_paginas
+    from benchmarks.catalogo_sintetico import escribir_catalogo
+
+    paginas = os.path.join(carpeta_de_datos, 'paginas')
+    if not os.path.isdir(paginas):
+        generar_paginas('agrupaciones_de_INALI', paginas)
+
+    catalogos = {}
+    for tamano in tamanos:
+        catalogos[tamano] = os.path.join(carpeta_de_datos, 'catalogo_{}.csv'.format(tamano))
+        if not os.path.isfile(catalogos[tamano]):
+            print('generando un catálogo sintético de {:,} registros...'.format(tamano), file=sys.stderr)
+            escribir_catalogo(catalogos[tamano] + '.tmp', registros=tamano)
+            os.replace(catalogos[tamano] + '.tmp', catalogos[tamano])
+    return paginas, catalogos
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def comparar(antes, despues, tolerancia=0.10):
+    '''imprimir la diferencia de cada métrica de rendimiento entre dos archivos de resultados'''
+    with open(antes) as a, open(despues) as d:
+        resultados_antes, resultados_despues = json.load(a), json.load(d)
+
+    regresiones = 0
+    print('{} ({}) -> {} ({})'.format(antes, resultados_antes['commit'], despues, resultados_despues['commit']))
+    for caso, metricas in resultados_despues['casos'].items():
+        anteriores = resultados_antes['casos'].get(caso)
+        if not anteriores:
+            continue
+        for metrica in ('paginas_por_segundo', 'registros_por_segundo', 'memoria_pico_mb'):
+            if metrica not in metricas or metrica not in anteriores:
+                continue
+            cambio = (metricas[metrica] - anteriores[metrica]) / anteriores[metrica]
+            peor = cambio < -tolerancia if metrica.endswith('por_segundo') else cambio > tolerancia
+            regresiones += peor
+            print('{:<40} {:<22} {:>12,.1f} -> {:>12,.1f}  {:+6.1%}{}'.format(
+                caso, metrica, anteriores[metrica], metricas[metrica], cambio, '  REGRESIÓN' if peor else ''))
+    return regresiones
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='la suite de benchmarks del scraper y de la búsqueda')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=tamanos_por_defecto,
+                        help='número de registros de cada catálogo sintético')
+    parser.add_argument('--difuso', action='store_true', help='medir también el emparejador difuso')
+    parser.add_argument('--output', help='dónde escribir los resultados (por defecto benchmarks/resultados/<commit>.json)')
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DESPUES'), help='comparar dos archivos de resultados')
+    parser.add_argument('--caso', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.caso:
+        # estamos en el proceso de un solo caso
+        tipo, argumentos = args.caso[0], args.caso[1:]
+        if tipo == 'scraper':
+            resultado = caso_scraper(*argumentos)
+        else:
+            resultado = caso_emparejador(argumentos[0], difuso=(tipo == 'emparejador_difuso'))
+        resultado['memoria_pico_mb'] = memoria_pico_mb()
+        print(json.dumps(resultado))
+        sys.exit(0)
+
+    if args.comparar:
+        sys.exit(1 if comparar(*args.comparar) else 0)
+
+    paginas, catalogos = preparar_datos(args.tamanos)
+
+    casos = {}
+    scraper = correr_caso(['scraper', paginas])
+    for modo in ('parseo_de_siempre', 'parseo_rapido'):
+        casos['scraper/{}'.format(modo)] = dict(scraper[modo], memoria_pico_mb=scraper['memoria_pico_mb'])
+
+    tipos = ['emparejador'] + (['emparejador_difuso'] if args.difuso else [])
+    for tamano, archivo in catalogos.items():
+        for tipo in tipos:
+            print('{} con {:,} registros...'.format(tipo, tamano), file=sys.stderr)
+            casos['{}/{}'.format(tipo, tamano)] = correr_caso([tipo, archivo])
+
+    resultados = {
+        'commit': commit_actual(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'maquina': platform.platform(),
+        'nucleos': os.cpu_count(),
+        'casos': casos
+    }
+
+    output = args.output or os.path.join(carpeta_de_resultados, '{}.json'.format(resultados['commit']))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as outf:
+        outf.write(json.dumps(resultados, indent=2))
+
+    for caso, metricas in casos.items():
+        velocidad = metricas.get('paginas_por_segundo') or metricas.get('registros_por_segundo')
+        unidad = 'páginas/s' if 'paginas_por_segundo' in metricas else 'registros/s'
+        etapas = ', '.join('{} {:.2f}s'.format(etapa, segundos) for etapa, segundos in metricas['etapas'].items())
+        print('{:<32} {:>10,.0f} {:<12} pico {:>7.1f} MB  ({})'.format(caso, velocidad, unidad, metricas['memoria_pico_mb'], etapas))
+    print('resultados escritos a {}'.format(output))
@@ -0,0 +1,93 @@
+# convertir un CSV del catálogo a MARC binario (ISO 2709) y a MARCXML, para probar los lectores
+# de registros_MARC.py sin depender de un export real del catálogo
+# uso: python -m benchmarks.fixtures_MARC documentos/Jonathan_Israel_results_nahuatl.csv /tmp/nahuatl
+#      (escribe /tmp/nahuatl.mrc y /tmp/nahuatl.xml, y asegura que los tres dan los mismos resultados)
+
+import argparse
+import xml.etree.ElementTree as ET
+
+from registros_MARC import leer_registros, leer_registros_csv
+
+
+def campos_de_registro(registro):
+    '''(leader, [(campo, indicadores, valor_de_control o [(código, valor), ...])]) de un registro del CSV'''
+    leader = ''
+    campos = []
+    for row in registro.rows:
+        campo = row[1]
+        if campo == 'LDR':
+            leader = row[4]
+        elif campo < '010':
+            campos.append((campo, None, row[4]))
+        else:
+            subcampos = [(row[i], row[i + 1]) for i in range(3, len(row) - 1, 2) if row[i] or row[i + 1]]
+            campos.append((campo, row[2].ljust(2)[:2], subcampos))
+    return leader, campos
+
+
+def registro_iso2709(registro):
+    '''los bytes de un registro en ISO 2709, con el leader marcado como UTF-8'''
+    leader, campos = campos_de_registro(registro)
+    directorio = b''
+    datos = b''
+    for campo, indicadores, contenido in campos:
+        if indicadores is None:
+            bytes_del_campo = contenido.encode('utf8') + b'\x1e'
+        else:
+            bytes_del_campo = indicadores.encode('utf8') + b''.join(
+                b'\x1f' + codigo.encode('utf8') + valor.encode('utf8') for codigo, valor in contenido) + b'\x1e'
+        directorio += campo.encode('ascii') + b'%04d%05d' % (len(bytes_del_campo), len(datos))
+        datos += bytes_del_campo
+
+    base = 24 + len(directorio) + 1
+    largo = base + len(datos) + 1
+    leader = leader.ljust(24)[:24]
+    leader = '%05d' % largo + leader[5:9] + 'a' + leader[10:12] + '%05d' % base + leader[17:]
+    return leader.encode('ascii', errors='replace') + directorio + b'\x1e' + datos + b'\x1d'
+
+
+def escribir_iso2709(origen, destino):
+    with open(destino, 'wb') as outf:
+        for registro in leer_registros_csv(origen):
+            outf.write(registro_iso2709(registro))
+
+
+def escribir_marcxml(origen, destino):
+    ns = 'http://www.loc.gov/MARC21/slim'
+    coleccion = ET.Element('collection', xmlns=ns)
+    for registro in leer_registros_csv(origen):
+        leader, campos = campos_de_registro(registro)
+        elemento = ET.SubElement(coleccion, 'record')
+        ET.SubElement(elemento, 'leader').text = leader
+        for campo, indicadores, contenido in campos:
+            if indicadores is None:
+                ET.SubElement(elemento, 'controlfield', tag=campo).text = contenido
+            else:
+                datafield = ET.SubElement(elemento, 'datafield', tag=campo, ind1=indicadores[0], ind2=indicadores[1])
+                for codigo, valor in contenido:
+                    ET.SubElement(datafield, 'subfield', code=codigo).text = valor
+    ET.ElementTree(coleccion).write(destino, encoding='utf-8', xml_declaration=True)
+
+
+if __name__ == '__main__':
+    from almacen_INALI import sacar_datos_de_carpetas
+    from emparejador_INALI import Emparejador
+    from comparar_registros_MARC import comparar_registros
+
+    parser = argparse.ArgumentParser(description='CSV del catálogo -> ISO 2709 y MARCXML')
+    parser.add_argument('origen')
+    parser.add_argument('destino', help='el nombre de los archivos de output, sin extensión')
+    args = parser.parse_args()
+
+    escribir_iso2709(args.origen, args.destino + '.mrc')
+    escribir_marcxml(args.origen, args.destino + '.xml')
+
+    emparejador = Emparejador(sacar_datos_de_carpetas('agrupaciones_de_INALI'))
+    resultados = {archivo: list(comparar_registros(leer_registros(archivo), emparejador))
+                  for archivo in (args.origen, args.destino + '.mrc', args.destino + '.xml')}
+    referencia = resultados[args.origen]
+    for archivo, resultado in resultados.items():
+        estado = 'idéntico' if resultado == referencia else 'DISTINTO'
+        print('{}: {} registros con datos de INALI ({})'.format(archivo, len(resultado), estado))
+    if any(resultado != referencia for resultado in resultados.values()):
+        raise SystemExit(1)
@@ -0,0 +1,130 @@
+# páginas de INALI guardadas y un servidor local que las sirve,
+# para probar el crawl de sacar_datos_de_INALI.py sin tocar a inali.gob.mx
+# uso:
+#   python -m benchmarks.paginas_de_prueba --generar paginas_guardadas
+#   python -m benchmarks.paginas_de_prueba --servir paginas_guardadas --puerto 8000
+#   python sacar_datos_de_INALI.py --base-url http://127.0.0.1:8000/clin-inali/ --hilos 8 --carpeta /tmp/agrups
+
+import os
+import html
+import time
+import argparse
+import threading
+import unicodedata
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from almacen_INALI import sacar_datos_de_carpetas
+
+
+def slug(nombre):
+    '''"náhuatl" -> "nahuatl", como en los vínculos l_nahuatl.html de INALI'''
+    sin_acentos = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode('ascii')
+    return ''.join(c for c in sin_acentos.lower().replace(' ', '_') if c.isalnum() or c == '_')
+
+
+# las páginas reales de INALI tienen mucho más que los datos: estilos, scripts, menús y un pie de página.
+# los agregamos (después de los datos, como en INALI) para que los benchmarks de parseo sean realistas
+cabeza = ('<head><meta charset="utf-8"><title>Catálogo de las Lenguas Indígenas Nacionales</title>'
+          '<style>{}</style><script>{}</script></head>').format(
+    ' '.join('.c{0} {{ margin: {0}px; font-family: Arial; }}'.format(i) for i in range(200)),
+    ' '.join('function f{0}(x) {{ return x + {0}; }}'.format(i) for i in range(200)))
+pie = '<div id="pie">{}</div>'.format(''.join(
+    '<div class="c{0}"><span>Instituto Nacional de Lenguas Indígenas</span><p>Privada de Relox No. {0}</p>'
+    '<img src="img/logo{0}.png" alt="INALI"/></div>'.format(i) for i in range(40)))
+
+
+def html_de_variante(dato):
+    '''una <tr> de la página v_<agrupación>.html con la misma forma que usa INALI'''
+    autodes = ''.join('<p>{}</p><p>{}</p>'.format(html.escape(a), html.escape(b)) for a, b in dato['autodenominaciones'])
+    td_variante = '<td>{}&lt;{}&gt;</td>'.format(autodes, html.escape(dato['variante']))
+
+    estados = []
+    for repr_geo in dato['representación_geográfica']:
+        for estado, municipios in repr_geo.items():
+            partes = ['{}:'.format(html.escape(estado))]
+            for municipio, localidades in municipios.items():
+                partes.append('<b>{}</b>: {}.'.format(html.escape(municipio), html.escape(', '.join(localidades))))
+            estados.append(''.join(partes))
+    td_geo = '<td>{}</td>'.format('<br/>'.join(estados))
+
+    return '<tr>{}{}</tr>'.format(td_variante, td_geo)
+
+
+def generar_paginas(carpeta_INALI, destino):
+    '''
+    reconstruir las páginas de INALI desde el árbol de JSON: la página base,
+    una l_<agrupación>.html por agrupación y una v_<agrupación>.html con sus variantes
+    '''
+    agrupaciones = {}
+    for dato in sacar_datos_de_carpetas(carpeta_INALI):
+        agrupaciones.setdefault(dato['agrupacion_lingüística'], []).append(dato)
+
+    carpeta_html = os.path.join(destino, 'clin-inali', 'html')
+    os.makedirs(carpeta_html, exist_ok=True)
+
+    vinculos = []
+    for agrupacion, datos in agrupaciones.items():
+        nombre = slug(agrupacion)
+        vinculos.append('<tr><td><a href="html/l_{}.html">{}</a></td></tr>'.format(nombre, html.escape(agrupacion)))
+
+        with open(os.path.join(carpeta_html, 'l_{}.html'.format(nombre)), 'w', encoding='utf8') as outf:
+            outf.write('<html>{}<body>'
+                       '<h4>Agrupación lingüística: {}<br/>Familia lingüística: {}</h4>'
+                       '<a href="v_{}.html#1">variantes</a>{}</body></html>'.format(
+                           cabeza, html.escape(agrupacion), html.escape(datos[0]['familia_lingüística']), nombre, pie))
+
+        with open(os.path.join(carpeta_html, 'v_{}.html'.format(nombre)), 'w', encoding='utf8') as outf:
+            outf.write('<html>{}<body><table>'
+                       '<tr><th>Autodenominación</th><th>Referencia geoestadística</th></tr>{}'
+                       '</table>{}</body></html>'.format(cabeza, ''.join(html_de_variante(dato) for dato in datos), pie))
+
+    with open(os.path.join(destino, 'clin-inali', 'index.html'), 'w', encoding='utf8') as outf:
+        outf.write('<html>{}<body><table>{}</table>{}</body></html>'.format(cabeza, ''.join(vinculos), pie))
+
+    return len(agrupaciones)
+
+
+class ManejadorSilencioso(SimpleHTTPRequestHandler):
+    '''SimpleHTTPRequestHandler sin una línea de log por cada petición, y con una latencia opcional como la de INALI'''
+    protocol_version = 'HTTP/1.1'  # para que las conexiones se queden abiertas entre peticiones
+    latencia = 0.0
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, '.html': 'text/html; charset=utf-8'}
+
+    def do_GET(self):
+        if self.latencia:
+            time.sleep(self.latencia)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def servir(carpeta, puerto=0, latencia=0.0):
+    '''
+    empezar un servidor HTTP en un hilo de fondo que sirve "carpeta"
+    regresa el servidor y el base_url que le pasamos al crawl
+    '''
+    manejador = type('Manejador', (ManejadorSilencioso,), {'latencia': latencia})
+    servidor = ThreadingHTTPServer(('127.0.0.1', puerto), partial(manejador, directory=carpeta))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, 'http://127.0.0.1:{}/clin-inali/'.format(servidor.server_address[1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='páginas de INALI guardadas y un servidor local para ellas')
+    parser.add_argument('--generar', metavar='DESTINO', help='reconstruir las páginas desde agrupaciones_de_INALI')
+    parser.add_argument('--servir', metavar='CARPETA', help='servir las páginas guardadas en CARPETA')
+    parser.add_argument('--puerto', type=int, default=8000)
+    parser.add_argument('--latencia', type=float, default=0.0, help='segundos de espera por petición')
+    args = parser.parse_args()
+
+    if args.generar:
+        print('{} agrupaciones escritas a {}'.format(generar_paginas('agrupaciones_de_INALI', args.generar), args.generar))
+    if args.servir:
+        servidor, base_url = servir(args.servir, args.puerto, args.latencia)
+        print('sirviendo {} en {}'.format(args.servir, base_url))
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            servidor.shutdown()
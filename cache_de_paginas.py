@@ -0,0 +1,163 @@
+# un cache en disco para las páginas de INALI, con revalidación condicional (ETag / Last-Modified)
+# el contenido de INALI casi nunca cambia, así que no hace falta bajar todo cada vez que corremos el crawl
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from collections import Counter
+
+from metricas import metricas
+
+
+logger = logging.getLogger('scrape_INALI')
+
+
+@lru_cache(maxsize=None)
+def importar_requests():
+    '''
+    requests (y urllib3) tardan en importarse y solamente hacen falta si de veras bajamos algo,
+    así que los importamos la primera vez que los usamos
+    '''
+    import requests
+    import requests.adapters
+    import urllib3
+
+    # cada vez que hacemos una toca al inali.cob.mx, recibimos una alarma así:
+    # "InsecureRequestWarning: Unverified HTTPS request is being made. Adding certificate verification is strongly advised."
+    # creo q los certificados de INALI se han caducado
+    # por no ver la alarma cada vez que agarramos un vínculo de INALI, la deshabilitamos aquí
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    return requests
+
+
+class PaginaNoEnCache(LookupError):
+    '''en el modo offline pedimos una página que nunca hemos bajado'''
+
+
+class CacheDePaginas:
+    '''
+    guarda cada página bajo su URL con su cuerpo, ETag, Last-Modified y un hash del contenido
+    @carpeta: dónde guardamos los archivos del cache
+    @offline: si es True nunca tocamos la red, solamente leemos del cache
+    '''
+
+    def __init__(self, carpeta='cache_de_INALI', offline=False):
+        self.carpeta = carpeta
+        self.offline = offline
+        self.numeros = Counter()
+        self.lock = threading.Lock()
+        self.huellas = {}  # url -> el sha256 de la versión de la página que regresamos
+        os.makedirs(carpeta, exist_ok=True)
+
+    def _rutas(self, url):
+        llave = hashlib.sha1(url.encode('utf8')).hexdigest()
+        return os.path.join(self.carpeta, llave + '.json'), os.path.join(self.carpeta, llave + '.html')
+
+    def _ruta_parseada(self, clave):
+        return os.path.join(self.carpeta, hashlib.sha1(clave.encode('utf8')).hexdigest() + '.parseado.json')
+
+    def huella(self, url):
+        '''el sha256 de la página que regresó bajar(url), o None si no la hemos bajado'''
+        return self.huellas.get(url)
+
+    def leer_parseado(self, clave, huellas):
+        '''
+        los datos que guardamos con guardar_parseado bajo esta clave, si los sacamos de páginas con estas mismas
+        huellas; si no (o si no hay nada), None. así no volvemos a parsear una página que no cambió
+        '''
+        if any(huella is None for huella in huellas):
+            return None
+        try:
+            with open(self._ruta_parseada(clave), 'r', encoding='utf8') as inf:
+                guardado = json.loads(inf.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        if guardado['huellas'] != list(huellas):
+            return None
+        return guardado['datos']
+
+    def guardar_parseado(self, clave, huellas, datos):
+        '''guardar lo que sacamos de unas páginas, con sus huellas (ver leer_parseado)'''
+        if any(huella is None for huella in huellas):
+            return
+        ruta = self._ruta_parseada(clave)
+        temporal = '{}.{}.tmp'.format(ruta, threading.get_ident())
+        with open(temporal, 'w', encoding='utf8') as outf:
+            outf.write(json.dumps({'clave': clave, 'huellas': list(huellas), 'datos': datos}))
+        os.replace(temporal, ruta)
+
+    def leer(self, url):
+        '''regresa (metadatos, texto) de una página guardada, o (None, None) si no la tenemos'''
+        ruta_meta, ruta_html = self._rutas(url)
+        try:
+            with open(ruta_meta, 'r') as fmeta, open(ruta_html, 'r', encoding='utf8') as fhtml:
+                return json.loads(fmeta.read()), fhtml.read()
+        except FileNotFoundError:
+            return None, None
+
+    def guardar(self, url, texto, etag=None, last_modified=None):
+        '''escribir la página al cache; regresa el hash de su contenido'''
+        sha256 = hashlib.sha256(texto.encode('utf8')).hexdigest()
+        meta = {'url': url, 'etag': etag, 'last_modified': last_modified, 'sha256': sha256}
+
+        # escribimos a un archivo temporal y luego lo movemos para que nunca quede un archivo a medias
+        ruta_meta, ruta_html = self._rutas(url)
+        for ruta, contenido in ((ruta_html, texto), (ruta_meta, json.dumps(meta))):
+            with open(ruta + '.tmp', 'w', encoding='utf8') as outf:
+                outf.write(contenido)
+            os.replace(ruta + '.tmp', ruta)
+        return sha256
+
+    def _contar(self, que):
+        with self.lock:
+            self.numeros[que] += 1
+        metricas.contar('inali_paginas_del_cache_total', estado=que)
+
+    def bajar(self, url, sesion=None, limitador=None):
+        '''
+        regresa el texto de la página, del cache si todavía es válido
+        con la red mandamos un GET condicional; si INALI responde 304 no se baja el cuerpo otra vez
+        '''
+        meta, texto = self.leer(url)
+
+        if self.offline:
+            if meta is None:
+                raise PaginaNoEnCache('no tenemos {} en el cache y estamos en el modo offline'.format(url))
+            self._contar('offline')
+            self.huellas[url] = meta['sha256']
+            return texto
+
+        encabezados = {}
+        if meta and meta['etag']:
+            encabezados['If-None-Match'] = meta['etag']
+        if meta and meta['last_modified']:
+            encabezados['If-Modified-Since'] = meta['last_modified']
+
+        if limitador:
+            limitador.esperar(url)
+        with metricas.medir('inali_fetch_segundos'):
+            r = (sesion or importar_requests()).get(url, headers=encabezados, verify=False)
+        metricas.contar('inali_paginas_bajadas_total')
+        metricas.contar('inali_bytes_bajados_total', len(r.content))
+
+        if r.status_code == 304 and meta:
+            logger.debug('{} no ha cambiado (304)'.format(url))
+            self._contar('sin_cambios')
+            self.huellas[url] = meta['sha256']
+            return texto
+
+        # una página de error no entra al cache; la Exception deja que el crawl reintente más tarde
+        r.raise_for_status()
+        sha256 = self.guardar(url, r.text, r.headers.get('ETag'), r.headers.get('Last-Modified'))
+        self.huellas[url] = sha256
+        if meta and meta['sha256'] == sha256:
+            self._contar('sin_cambios')
+        elif meta:
+            logger.info('{} ha cambiado desde la última vez'.format(url))
+            self._contar('cambiados')
+        else:
+            self._contar('nuevos')
+        return r.text
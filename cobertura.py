@@ -0,0 +1,206 @@
+# la cobertura de los datos de INALI en el catálogo: qué parte de las variantes de cada familia, agrupación o variante
+# tiene registros en el catálogo, por estado, desde las tablas en columnas de exportar_columnas.py
+# todo son group-bys vectorizados de NumPy sobre los códigos de diccionario (sort y bincount), sin un loop de python
+# por fila, así que el reporte sigue rápido con millones de datos encontrados
+# una variante está cubierta si por lo menos un registro la nombra (a ella o a una de sus autodenominaciones).
+# un registro que solamente nombra la agrupación (p.ej. "náhuatl") cuenta en los registros de la agrupación y de su
+# familia en todos sus estados, pero no cubre ninguna variante
+# uso:
+#   python cobertura.py
+#   python cobertura.py --nivel familia --sin-estados
+#   python cobertura.py --nivel variante --estado OAXACA --csv logs/cobertura_de_OAXACA.csv
+
+import csv
+import argparse
+import logging
+
+from exportar_columnas import Categorica, carpeta_de_columnas, escribir_tabla, importar_numpy, leer_tablas
+
+
+logger = logging.getLogger('scrape_INALI')
+
+niveles = ('familia', 'agrupacion', 'variante')
+
+# la categoría de estado cuando no separamos por estado
+todos_los_estados = '(todos)'
+
+
+def pares_unicos(a, b, n_b):
+    '''
+    los pares (a, b) distintos, con b < n_b, con una sola llave int64 por par. ordenamos y quitamos los repetidos
+    en vez de np.unique, que en NumPy 2 pasa por una tabla de hash y es varias veces más lento con llaves enteras
+    '''
+    np = importar_numpy()
+    llaves = a.astype(np.int64) * n_b + b
+    llaves.sort()
+    if len(llaves):
+        llaves = llaves[np.concatenate(([True], llaves[1:] != llaves[:-1]))]
+    return llaves // n_b, llaves % n_b
+
+
+def unir(claves, claves_de_tabla, valores_de_tabla, n_claves):
+    '''
+    un join vectorizado de uno a muchos: cada fila de claves se repite una vez por cada valor de su clave en la tabla
+    regresa (la fila de claves de cada resultado, su valor)
+    '''
+    np = importar_numpy()
+    orden = np.argsort(claves_de_tabla, kind='stable')
+    valores_ordenados = valores_de_tabla[orden]
+    por_clave = np.bincount(claves_de_tabla, minlength=n_claves)
+    inicio_de_clave = np.cumsum(por_clave) - por_clave
+
+    repeticiones = por_clave[claves]
+    filas = np.repeat(np.arange(len(claves)), repeticiones)
+    desplazamiento = np.arange(len(filas)) - np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+    return filas, valores_ordenados[inicio_de_clave[claves][filas] + desplazamiento]
+
+
+def codigos_por_nombre(categorias, nombres):
+    '''el código en "nombres" de cada categoría, o -1 si no está; un loop por categoría, no por fila'''
+    np = importar_numpy()
+    ids = {nombre: i for i, nombre in enumerate(nombres)}
+    return np.array([ids.get(categoria, -1) for categoria in categorias], dtype=np.int64)
+
+
+def cobertura(variantes, estados, encontrados, nivel='agrupacion', por_estado=True):
+    '''
+    @variantes, @estados, @encontrados: las tablas de exportar_columnas.py
+    @nivel: familia, agrupacion o variante
+    regresa una tabla (se puede escribir con escribir_tabla) con una fila por grupo y estado:
+    grupo, estado, variantes, cubiertas (variantes con registros), proporcion (cubiertas / variantes) y registros
+    (registros distintos que nombran el grupo o una de sus variantes)
+    '''
+    np = importar_numpy()
+    if nivel not in niveles:
+        raise ValueError('el nivel tiene que ser uno de {}'.format(', '.join(niveles)))
+
+    # el grupo de cada variante y de cada agrupación
+    codigo_de_variante = variantes['variante'].codigos
+    n_variantes = len(variantes['variante'].categorias)
+    agrupacion_de_variante = np.empty(n_variantes, dtype=np.int64)
+    agrupacion_de_variante[codigo_de_variante] = variantes['agrupacion'].codigos
+    n_agrupaciones = len(variantes['agrupacion'].categorias)
+    if nivel == 'variante':
+        grupos = variantes['variante'].categorias
+        grupo_de_variante = np.arange(n_variantes)
+        grupo_de_agrupacion = None
+    else:
+        grupos = variantes[nivel].categorias
+        grupo_de_variante = np.empty(n_variantes, dtype=np.int64)
+        grupo_de_variante[codigo_de_variante] = variantes[nivel].codigos
+        grupo_de_agrupacion = np.empty(n_agrupaciones, dtype=np.int64)
+        grupo_de_agrupacion[agrupacion_de_variante[codigo_de_variante]] = grupo_de_variante[codigo_de_variante]
+
+    # los pares (variante, estado); sin estados, cada variante una vez en un solo estado
+    if por_estado:
+        nombres_de_estados = estados['estado'].categorias
+        variante_de_par, estado_de_par = pares_unicos(estados['variante'].codigos, estados['estado'].codigos,
+                                                      len(nombres_de_estados))
+    else:
+        nombres_de_estados = [todos_los_estados]
+        variante_de_par = np.sort(codigo_de_variante).astype(np.int64)
+        estado_de_par = np.zeros(len(variante_de_par), dtype=np.int64)
+    n_estados = len(nombres_de_estados)
+
+    # cada dato encontrado como variante o agrupación de INALI; los nombres que no están en las tablas se ignoran
+    nombre = encontrados['nombre'].codigos
+    columna = encontrados['columna']
+    registro = encontrados['registro'].codigos
+    n_registros = max(len(encontrados['registro'].categorias), 1)
+    es_variante = columna.codigos == (columna.categorias.index('variantes') if 'variantes' in columna.categorias else -1)
+    variante = codigos_por_nombre(encontrados['nombre'].categorias, variantes['variante'].categorias)[nombre]
+    agrupacion = codigos_por_nombre(encontrados['nombre'].categorias, variantes['agrupacion'].categorias)[nombre]
+
+    # registros distintos por variante: una variante con por lo menos uno está cubierta
+    de_variante = es_variante & (variante >= 0)
+    variante_encontrada, registro_de_variante = pares_unicos(variante[de_variante], registro[de_variante], n_registros)
+    cubierta = np.bincount(variante_encontrada, minlength=n_variantes) > 0
+
+    # variantes y variantes cubiertas por grupo y estado
+    n_celdas = len(grupos) * n_estados
+    celda_de_par = grupo_de_variante[variante_de_par] * n_estados + estado_de_par
+    numero_de_variantes = np.bincount(celda_de_par, minlength=n_celdas)
+    cubiertas = np.bincount(celda_de_par, weights=cubierta[variante_de_par], minlength=n_celdas).astype(np.int64)
+
+    # los registros de cada variante van a todos los estados de la variante
+    filas, estado = unir(variante_encontrada, variante_de_par, estado_de_par, n_variantes)
+    celdas = [grupo_de_variante[variante_encontrada[filas]] * n_estados + estado]
+    registros_de_celdas = [registro_de_variante[filas]]
+
+    # y los que nombran una agrupación, a todos los estados de sus variantes
+    if grupo_de_agrupacion is not None:
+        de_agrupacion = ~es_variante & (agrupacion >= 0)
+        agrupacion_encontrada, registro_de_agrupacion = pares_unicos(
+            agrupacion[de_agrupacion], registro[de_agrupacion], n_registros)
+        agrupacion_de_par, estado_de_agrupacion = pares_unicos(
+            agrupacion_de_variante[variante_de_par], estado_de_par, n_estados)
+        filas, estado = unir(agrupacion_encontrada, agrupacion_de_par, estado_de_agrupacion, n_agrupaciones)
+        celdas.append(grupo_de_agrupacion[agrupacion_encontrada[filas]] * n_estados + estado)
+        registros_de_celdas.append(registro_de_agrupacion[filas])
+
+    celda_de_registro, _ = pares_unicos(np.concatenate(celdas), np.concatenate(registros_de_celdas), n_registros)
+    registros = np.bincount(celda_de_registro, minlength=n_celdas)
+
+    # una fila por cada grupo que se habla en el estado
+    celda = np.flatnonzero(numero_de_variantes)
+    return {
+        'grupo': Categorica((celda // n_estados).astype(np.int32), list(grupos)),
+        'estado': Categorica((celda % n_estados).astype(np.int32), list(nombres_de_estados)),
+        'variantes': numero_de_variantes[celda],
+        'cubiertas': cubiertas[celda],
+        'proporcion': cubiertas[celda] / numero_de_variantes[celda],
+        'registros': registros[celda]
+    }
+
+
+def filas_del_reporte(tabla, estado=None, ordenar_por='registros'):
+    '''las filas de una tabla de cobertura como tuplas, ordenadas de mayor a menor (y con un solo estado si hay)'''
+    np = importar_numpy()
+    seleccion = np.arange(len(tabla['variantes']))
+    if estado is not None:
+        if estado not in tabla['estado'].categorias:
+            return []
+        seleccion = np.flatnonzero(tabla['estado'].codigos == tabla['estado'].categorias.index(estado))
+    seleccion = seleccion[np.argsort(-tabla[ordenar_por][seleccion], kind='stable')]
+    return [(tabla['grupo'].categorias[tabla['grupo'].codigos[i]], tabla['estado'].categorias[tabla['estado'].codigos[i]],
+             int(tabla['variantes'][i]), int(tabla['cubiertas'][i]), float(tabla['proporcion'][i]), int(tabla['registros'][i]))
+            for i in seleccion]
+
+
+columnas_del_reporte = ['grupo', 'estado', 'variantes', 'cubiertas', 'proporcion', 'registros']
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level='INFO', format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='la cobertura de las variantes de INALI en el catálogo, por estado')
+    parser.add_argument('--carpeta', default=carpeta_de_columnas, help='las tablas de exportar_columnas.py')
+    parser.add_argument('--nivel', choices=niveles, default='agrupacion')
+    parser.add_argument('--sin-estados', action='store_true', help='un solo total por grupo, sin separar por estado')
+    parser.add_argument('--estado', help='solamente las filas de este estado, p.ej. OAXACA')
+    parser.add_argument('--ordenar-por', choices=['registros', 'proporcion', 'variantes', 'cubiertas'], default='registros')
+    parser.add_argument('--maximo', type=int, default=50, help='cuántas filas mostrar (0 para todas)')
+    parser.add_argument('--csv', help='escribir todas las filas a este archivo CSV')
+    parser.add_argument('--guardar', help='escribir la tabla de cobertura en columnas (.parquet o .npz)')
+    args = parser.parse_args()
+
+    try:
+        tablas = leer_tablas(args.carpeta)
+    except FileNotFoundError as error:
+        raise SystemExit(str(error))
+    tabla = cobertura(*tablas, nivel=args.nivel, por_estado=not args.sin_estados)
+    filas = filas_del_reporte(tabla, args.estado, args.ordenar_por)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as outf:
+            escritor = csv.writer(outf)
+            escritor.writerow(columnas_del_reporte)
+            escritor.writerows(filas)
+        logger.info('escribimos {} filas de cobertura a {}'.format(len(filas), args.csv))
+    if args.guardar:
+        escribir_tabla(tabla, args.guardar)
+        logger.info('escribimos la tabla de cobertura a {}'.format(args.guardar))
+
+    print('{:<40} {:<24} {:>9} {:>9} {:>7} {:>10}'.format(args.nivel, 'estado', 'variantes', 'cubiertas', '%', 'registros'))
+    for grupo, estado, numero, cubiertas, proporcion, registros in filas[:args.maximo or None]:
+        print('{:<40} {:<24} {:>9} {:>9} {:>6.1f}% {:>10,}'.format(grupo[:40], estado[:24], numero, cubiertas, 100 * proporcion, registros))
@@ -0,0 +1,189 @@
+'''
+una cola de trabajo persistente para el crawl de INALI.
+cada tarea terminada (o fallida) se apunta en un diario, un archivo de JSON lines,
+así que si el crawl se cae a medias la próxima vez hacemos solamente lo que falta.
+las tareas que echan una Exception se reintentan con backoff exponencial; después del
+último intento se apuntan como fallidas (la "dead-letter list") junto con su Exception
+'''
+
+import os
+import json
+import time
+import heapq
+import logging
+import itertools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from metricas import metricas
+
+
+logger = logging.getLogger('scrape_INALI')
+
+archivo_del_diario = 'diario_del_crawl_de_INALI.jsonl'
+
+# cada entrada se escribe (y flush) en seguida, así que sobrevive si el proceso se cae; el fsync, que solamente
+# importa si se cae la máquina, va por lotes: un fsync por entrada costaba más que bajar y parsear un variante,
+# y corría en el hilo que reparte las tareas. si se pierde un lote, esas tareas se hacen otra vez
+entradas_por_fsync = 64
+segundos_por_fsync = 1.0
+
+# @tipo: p.ej. 'agrupacion' o 'variante'
+# @clave: identifica la tarea en el diario entre una corrida y otra
+# @funcion: recibe *argumentos y regresa (entrada, tareas_nuevas); la entrada se apunta en el diario
+Tarea = namedtuple('Tarea', ['tipo', 'clave', 'funcion', 'argumentos'])
+
+
+class DiarioDelCrawl:
+    '''
+    el diario de un crawl: una línea de JSON por cada tarea hecha o fallida.
+    si el último crawl con el mismo base_url no terminó, seguimos con su diario;
+    si terminó (o desde_cero), empezamos otro. con seguir_terminado seguimos
+    también un diario terminado, p.ej. para reintentar solamente las tareas fallidas
+    '''
+
+    def __init__(self, archivo=archivo_del_diario, base_url=None, desde_cero=False, seguir_terminado=False):
+        self.archivo = archivo
+        self.entradas = [] if desde_cero else self._leer()
+        self.salida = None
+        self.sin_fsync = 0
+        self.ultimo_fsync = time.monotonic()
+
+        eventos = [entrada for entrada in self.entradas if 'evento' in entrada]
+        terminado = bool(eventos) and eventos[-1]['evento'] == 'fin'
+        mismo_base_url = bool(eventos) and eventos[0].get('base_url') == base_url
+
+        if not mismo_base_url or (terminado and not seguir_terminado):
+            self.entradas = []
+            with open(self.archivo, 'w'):
+                pass
+        else:
+            logger.info('seguimos el crawl del diario {} ({} tareas ya apuntadas)'.format(
+                archivo, len(self.entradas) - len(eventos)))
+
+        self.apuntar({'evento': 'inicio', 'base_url': base_url, 'hora': time.strftime('%Y-%m-%d %H:%M:%S')}, sincronizar=True)
+
+    def _leer(self):
+        entradas = []
+        try:
+            with open(self.archivo, 'r') as inf:
+                for linea in inf:
+                    try:
+                        entradas.append(json.loads(linea))
+                    except json.JSONDecodeError:
+                        # la última línea puede quedar a medias si el proceso se cayó escribiéndola
+                        logger.warning('ignoramos una línea incompleta del diario {}'.format(self.archivo))
+        except FileNotFoundError:
+            pass
+        return entradas
+
+    def apuntar(self, entrada, sincronizar=False):
+        '''
+        agregar una entrada al diario. el fsync va por lotes (ver entradas_por_fsync), o en seguida con sincronizar
+        '''
+        if self.salida is None:
+            self.salida = open(self.archivo, 'a')
+        self.salida.write(json.dumps(entrada) + '\n')
+        self.salida.flush()
+        self.entradas.append(entrada)
+        self.sin_fsync += 1
+        if sincronizar or self.sin_fsync >= entradas_por_fsync or time.monotonic() - self.ultimo_fsync >= segundos_por_fsync:
+            self.sincronizar()
+
+    def sincronizar(self):
+        '''asegurar que todas las entradas lleguen al disco'''
+        if self.salida is not None and self.sin_fsync:
+            os.fsync(self.salida.fileno())
+            metricas.contar('inali_diario_fsyncs_total')
+        self.sin_fsync = 0
+        self.ultimo_fsync = time.monotonic()
+
+    def terminar(self):
+        self.apuntar({'evento': 'fin', 'hora': time.strftime('%Y-%m-%d %H:%M:%S')}, sincronizar=True)
+        self.salida.close()
+        self.salida = None
+
+    def estados(self):
+        '''la última entrada de cada tarea, por su clave (una tarea reintentada puede tener varias)'''
+        return {entrada['clave']: entrada for entrada in self.entradas if 'clave' in entrada}
+
+    def fallidas(self):
+        return [entrada for entrada in self.estados().values() if entrada['estado'] == 'fallido']
+
+
+class ColaDeTrabajo:
+    '''
+    corre tareas en un pool de hilos y apunta cada resultado en el diario.
+    el diario solamente se escribe desde el hilo que llama correr(), así que no necesita un lock.
+    entre las tareas listas corren primero las que agregó otra tarea (p.ej. los variantes de una agrupación),
+    así que cada agrupación se termina pronto y no guardamos las páginas de todas en la memoria.
+    una tarea que falla vuelve a la cola después de espera_inicial * 2**intentos segundos
+    (hasta espera_maxima) sin detener las demás, pero solamente si reintentable(excepcion): un error que sale igual
+    cada vez (p.ej. un IndexError al parsear una página que cambió) va directo a fallido
+    '''
+
+    def __init__(self, diario, max_hilos=1, intentos=4, espera_inicial=1.0, espera_maxima=60.0, reintentable=None):
+        self.diario = diario
+        self.max_hilos = max(1, max_hilos)
+        self.intentos = intentos
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.reintentable = reintentable or (lambda excepcion: True)
+
+        # (listo_en, nivel, orden, tarea, intentos_hechos); el nivel es negativo para las tareas agregadas
+        # por otra tarea, y el orden mantiene la cola FIFO entre tareas del mismo nivel
+        self.cola = []
+        self.orden = itertools.count()
+
+    def agregar(self, tarea, listo_en=0.0, intentos_hechos=0, nivel=0):
+        heapq.heappush(self.cola, (listo_en, nivel, next(self.orden), tarea, intentos_hechos))
+
+    def _fallo(self, tarea, intentos_hechos, nivel, excepcion):
+        intentos_hechos += 1
+        descripcion = '{}: {}'.format(type(excepcion).__name__, excepcion)
+
+        if intentos_hechos < self.intentos and self.reintentable(excepcion):
+            espera = min(self.espera_maxima, self.espera_inicial * 2 ** (intentos_hechos - 1))
+            logger.warning('la tarea {} echó una Exception ({}); la reintentamos en {:.1f} s'.format(tarea.clave, descripcion, espera))
+            metricas.contar('inali_reintentos_total', tipo=tarea.tipo)
+            self.agregar(tarea, time.monotonic() + espera, intentos_hechos, nivel)
+            return
+
+        logger.error('la tarea {} falló después de {} intento(s): {}'.format(tarea.clave, intentos_hechos, descripcion))
+        metricas.contar('inali_tareas_fallidas_total', tipo=tarea.tipo)
+        self.diario.apuntar({'tipo': tarea.tipo, 'clave': tarea.clave, 'estado': 'fallido',
+                             'excepcion': descripcion, 'intentos': intentos_hechos})
+
+    def correr(self):
+        '''correr las tareas (y las que ellas agregan) hasta que la cola quede vacía'''
+        pendientes = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_hilos) as ejecutor:
+            while self.cola or pendientes:
+                ahora = time.monotonic()
+                while self.cola and self.cola[0][0] <= ahora and len(pendientes) < self.max_hilos:
+                    _, nivel, _, tarea, intentos_hechos = heapq.heappop(self.cola)
+                    pendientes[ejecutor.submit(tarea.funcion, *tarea.argumentos)] = (tarea, intentos_hechos, nivel)
+
+                # esperamos hasta que termine una tarea o hasta que la próxima de la cola esté lista
+                espera = None
+                if self.cola and len(pendientes) < self.max_hilos:
+                    espera = max(0.0, self.cola[0][0] - ahora)
+
+                if not pendientes:
+                    time.sleep(espera)
+                    continue
+
+                terminados, _ = wait(pendientes, timeout=espera, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    tarea, intentos_hechos, nivel = pendientes.pop(futuro)
+                    try:
+                        entrada, tareas_nuevas = futuro.result()
+                    except Exception as e:
+                        self._fallo(tarea, intentos_hechos, nivel, e)
+                        continue
+
+                    self.diario.apuntar(dict(entrada, tipo=tarea.tipo, clave=tarea.clave, estado='hecho'))
+                    for tarea_nueva in tareas_nuevas:
+                        self.agregar(tarea_nueva, nivel=nivel - 1)
+        self.diario.sincronizar()
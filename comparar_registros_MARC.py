@@ -6,9 +6,19 @@
 import os
 import csv
 import json
+import time
+import hashlib
+import itertools
+import argparse
 import logging
-import logging.config
-from collections import Counter
+from functools import partial
+from collections import Counter, deque, namedtuple
+from almacen_INALI import archivo_del_almacen
+from almacen_de_resultados import AlmacenDeResultados, archivo_de_resultados
+from instantanea_del_emparejador import emparejador_de_INALI
+from metricas import metricas
+from reglas_de_campos import ReglasDeCampos, especificacion_por_defecto
+from registros_MARC import leer_registros, leer_registros_csv, dividir_en_fragmentos, formato_de, lectores
 
 
 # configuración de logging
@@ -49,6 +59,9 @@ logging_config = {
     }
 }
 
+# el logger tiene que existir también cuando importamos este módulo desde otro lugar
+logger = logging.getLogger('scrape_INALI')
+
 
 # nuestro modelo de datos para los resultados de una búsqueda
 # los 'fieldnames' de nuestro archivo de output hay que
@@ -62,117 +75,384 @@ datos_del_registro = {
     'campos_de_variantes': []
 }
 
+# con el emparejador difuso, cada resultado también lleva el puntaje de similitud de cada dato encontrado
+columnas_de_puntajes = {
+    'agrupaciones': 'puntajes_de_agrupaciones',
+    'variantes': 'puntajes_de_variantes'
+}
+
+# súbelo cuando cambie la forma de emparejar (no solamente el vocabulario), para que la
+# búsqueda incremental vuelva a comparar todos los registros del almacén de resultados
+# 2: solamente los campos y subcampos de las reglas (ver reglas_de_campos.py), y campos_de_* lleva el subcampo ("650$a")
+# 3: las palabras comunes ("mayo") ya no se encuentran en medio de un texto (ver palabras_comunes en emparejador_INALI.py)
+# 4: el emparejador difuso no cambia un token por un token de INALI que empieza igual y es más largo ("nahua" -> "nahuat")
+version_de_la_busqueda = 4
 
-def sacar_datos_de_carpetas(carpeta_mas_alta):
-    datos_de_json = []
-    for dirpath, dirname, filenames in os.walk(carpeta_mas_alta):
-        if not dirname and filenames:
-            for filename in filenames:
-                filepath = os.path.join(dirpath, filename)
-                with open(filepath, 'r') as fpath:
-                    dato_json = json.loads(fpath.read())
-                    datos_de_json.append(dato_json)
-    return datos_de_json
+# las reglas de siempre, para quien llama emparejar_registro sin reglas
+reglas_por_defecto = ReglasDeCampos(especificacion_por_defecto)
 
+# la revisión de un registro en la búsqueda incremental
+# @comparado: False si el registro no cambió desde la última búsqueda (y entonces resultado es None)
+# @resultado: el resultado con el modelo de datos_del_registro, o None si no encontramos nada
+Revision = namedtuple('Revision', ['id', 'f005', 'index', 'comparado', 'resultado'])
 
-def escribir_al_archivo(archivo, datos):
+# cada cuántos registros escribimos una línea de progreso al log
+registros_por_linea_de_progreso = 100000
+
+# a qué columna del output va cada tipo de término de INALI;
+# una autodenominación cuenta como su variante
+columnas_por_tipo = {
+    'agrupación': 'agrupaciones',
+    'variante': 'variantes',
+    'autodenominación': 'variantes'
+}
+
+
+def emparejar_valor(emparejador, valor):
     '''
-    chequamos si el archivo ya existe; si no existe escribimos el 'header' primero
-    si existe no queremos escribir el 'header' multiples veces
-    usamos el modo 'a' en vez de 'w' para que nunca borremos un archivo que ya existe
+    las agrupaciones y variantes que encontramos en un valor, como (columna, nombre, puntaje)
+    cada nombre aparece una sola vez por valor aunque lo encontremos varias veces, con su mejor puntaje
+    (el Emparejador exacto siempre da 1.0)
     '''
-    # estos fieldnames viene del los nombres de las llaves de nuestro modelo de datos
-    fieldnames = ['index', 'id', 'agrupaciones', 'campos_de_agrupaciones',
-                  'variantes', 'campos_de_variantes']
-
-    if os.path.isfile(archivo):
-        with open(archivo, 'a') as outfile:
-            escritor = csv.DictWriter(outfile, fieldnames)
-            escritor.writerow(datos_del_registro)
-    else:
-        with open(archivo, 'a') as outfile:
-            escritor = csv.DictWriter(outfile, fieldnames)
-            escritor.writeheader()
-            escritor.writerow(datos_del_registro)
+    encontrados = {}
+    for ocurrencia in emparejador.buscar(valor):
+        encontrado = (columnas_por_tipo[ocurrencia.termino.tipo], ocurrencia.termino.nombre)
+        puntaje = getattr(ocurrencia, 'puntaje', 1.0)
+        encontrados[encontrado] = max(puntaje, encontrados.get(encontrado, 0.0))
+    return [(columna, nombre, puntaje) for (columna, nombre), puntaje in encontrados.items()]
+
+
+def campos_del_output(con_puntajes=False):
+    '''los fieldnames de nuestro archivo de output: las llaves de nuestro modelo de datos, y los puntajes si hay'''
+    fieldnames = list(datos_del_registro.keys())
+    if con_puntajes:
+        fieldnames.extend(columnas_de_puntajes.values())
+    return fieldnames
+
+
+def nuevo_resultado(index, con_puntajes=False):
+    '''una copia vacía de nuestro modelo de datos para el registro con este index'''
+    resultado = {llave: (list(valor) if isinstance(valor, list) else valor) for llave, valor in datos_del_registro.items()}
+    resultado['index'] = index
+    if con_puntajes:
+        for columna in columnas_de_puntajes.values():
+            resultado[columna] = []
+    return resultado
+
+
+def emparejar_registro(registro, emparejador, reglas=None):
+    '''
+    buscar los datos de INALI en los campos y subcampos de un registro MARC que dicen las reglas
+    (ver reglas_de_campos.py; reglas_por_defecto si no hay). un row de un campo que no revisamos se salta
+    antes de tocar sus strings. cada dato encontrado se apunta con su campo y subcampo, p.ej. '650$a'
+    regresa los resultados con el modelo de datos_del_registro, o None si no encontramos nada
+    '''
+    subcampos_de = (reglas or reglas_por_defecto).subcampos_de
+    con_puntajes = getattr(emparejador, 'difuso', False)
+    resultado = nuevo_resultado(registro.index, con_puntajes)
+    for row in registro.rows:
+        if row[1] == '001':  # en el campo 001 tenemos la 'id' del sistema
+            resultado['id'] = row[4]
+            continue
+        subcampos = subcampos_de(row[1])
+        if subcampos is None:
+            continue
+
+        # [index, campo, indicadores, código, valor, código, valor, ...]; los campos de control tienen código ''
+        for i in range(3, len(row) - 1, 2):
+            codigo, value = row[i], row[i + 1]
+            if not value or codigo not in subcampos:
+                continue
+            for columna, nombre, puntaje in emparejar_valor(emparejador, value):
+                resultado[columna].append(nombre)
+                resultado['campos_de_' + columna].append('{}${}'.format(row[1], codigo) if codigo else row[1])
+                metricas.contar('marc_encontrados_total', campo=row[1], columna=columna)
+                if con_puntajes:
+                    resultado[columnas_de_puntajes[columna]].append(round(puntaje, 2))
+
+    if resultado['agrupaciones'] or resultado['variantes']:
+        return resultado
+    return None
+
+
+def huella_de_la_busqueda(emparejador, reglas=None):
+    '''la huella con la que guardamos cada resultado: la versión de la búsqueda, la huella del vocabulario y las reglas'''
+    return '{}-{}-{}'.format(version_de_la_busqueda, emparejador.huella(), (reglas or reglas_por_defecto).huella())
+
+
+def huella_del_contenido(registro):
+    '''un hash de los rows de un registro (sin el index, que cambia con su posición en el archivo)'''
+    contenido = json.dumps([row[1:] for row in registro.rows], ensure_ascii=False)
+    return 'sha256:' + hashlib.sha256(contenido.encode('utf8')).hexdigest()
+
+
+def llave_del_registro(registro, archivo=None):
+    '''
+    el id del sistema (campo 001) y la fecha de la última transacción (campo 005) de un registro.
+    sin 005, un hash de su contenido, para que un registro cambiado no se quede vigente para siempre con un 005 ''.
+    sin 001, la llave es el archivo y el index, porque "index:5" de otro archivo es otro registro
+    '''
+    id, f005 = '', ''
+    for row in registro.rows:
+        if row[1] == '001':
+            id = row[4]
+        elif row[1] == '005':
+            f005 = row[4]
+    if not id:
+        id = 'index:{}:{}'.format(os.path.abspath(archivo), registro.index) if archivo else 'index:{}'.format(registro.index)
+    return id, f005 or huella_del_contenido(registro)
+
+
+def revisar_registros(registros, emparejador, vigente=None, reglas=None, archivo=None):
+    '''
+    consumir los registros uno por uno y producir una Revision de cada uno
+    @reglas: los campos y subcampos que revisamos (ver emparejar_registro)
+    @vigente: vigente(id, f005) es True si ya tenemos el resultado de ese registro (ver almacen_de_resultados.py);
+    esos registros no se comparan otra vez
+    @archivo: el archivo de los registros, para la llave de los registros sin 001 (ver llave_del_registro)
+    '''
+    for numero, registro in enumerate(registros, 1):
+        metricas.contar('marc_registros_total')
+        if numero % registros_por_linea_de_progreso == 0:
+            logger.info('ya revisamos {} registros MARC'.format(numero))
+
+        id, f005 = llave_del_registro(registro, archivo)
+        if vigente and vigente(id, f005):
+            metricas.contar('marc_registros_sin_cambios_total')
+            yield Revision(id, f005, registro.index, False, None)
+            continue
+
+        resultado = emparejar_registro(registro, emparejador, reglas)
+        if resultado:
+            logger.debug('encontramos datos de INALI en el registro MARC con index %s', registro.index)
+        else:
+            logger.debug('no encontramos datos en el registro MARC con index %s', registro.index)
+        yield Revision(id, f005, registro.index, True, resultado)
+
+
+def comparar_registros(registros, emparejador, reglas=None):
+    '''consumir los registros uno por uno y producir los resultados de los que tienen datos de INALI'''
+    for revision in revisar_registros(registros, emparejador, reglas=reglas):
+        # si no hay resultados registrados de la búsqueda, no hay que escribir nada al archivo de output
+        if revision.resultado:
+            yield revision.resultado
+
+
+# cada proceso del pool recibe el emparejador y las reglas una sola vez, cuando empieza (ver _iniciar_trabajador),
+# y abre su propia conexión (de solo lectura) al almacén de resultados si hay búsqueda incremental
+_emparejador_del_trabajador = None
+_vigente_del_trabajador = None
+_reglas_del_trabajador = None
+
+
+def _iniciar_trabajador(emparejador, archivo_de_resultados=None, huella=None, reglas=None):
+    global _emparejador_del_trabajador, _vigente_del_trabajador, _reglas_del_trabajador
+    _emparejador_del_trabajador = emparejador
+    _reglas_del_trabajador = reglas
+    if archivo_de_resultados:
+        almacen = AlmacenDeResultados(archivo_de_resultados, solo_lectura=True)
+        _vigente_del_trabajador = partial(almacen.vigente, huella=huella)
+
+
+def _revisar_fragmento(fragmento):
+    '''las revisiones de un fragmento, con las métricas de este fragmento para sumarlas en el proceso principal'''
+    archivo, inicio, fin = fragmento
+    metricas.reiniciar()
+    revisiones = list(revisar_registros(leer_registros_csv(archivo, inicio, fin), _emparejador_del_trabajador,
+                                        _vigente_del_trabajador, _reglas_del_trabajador, archivo))
+    return revisiones, metricas.instantanea()
+
+
+# el tamaño de cada fragmento del CSV: cada proceso regresa las revisiones de un fragmento entero en un solo pickle,
+# así que la memoria depende de esto y no del tamaño del archivo
+bytes_por_fragmento = 4 * 1024 * 1024
+
+# cuántos fragmentos por proceso mandamos al pool antes de que el proceso principal consuma los anteriores
+fragmentos_en_vuelo_por_proceso = 2
+
+
+def revisar_en_paralelo(archivo, emparejador, procesos, archivo_de_resultados=None, huella=None,
+                        bytes_por_fragmento=bytes_por_fragmento, reglas=None):
+    '''
+    dividir el CSV en fragmentos de bytes_por_fragmento alineados con los registros y revisarlos en un pool de procesos
+    (con por lo menos 4 fragmentos por proceso en un archivo chico, para que ningún proceso se quede sin trabajo al final).
+    regresamos las revisiones en el orden de los fragmentos, así que el output sale en el orden de los registros,
+    idéntico a la búsqueda con un solo proceso. a diferencia de pool.imap, que manda todos los fragmentos de una vez
+    y guarda los que terminan antes de tiempo, solamente hay procesos * fragmentos_en_vuelo_por_proceso fragmentos
+    pendientes a la vez, así que la memoria no crece con un export de varios GB.
+    con archivo_de_resultados, los registros vigentes en ese almacén (con esta huella) no se comparan otra vez
+    '''
+    import multiprocessing  # solamente lo importamos si de veras usamos un pool
+
+    numero = max(procesos * 4, -(-os.path.getsize(archivo) // bytes_por_fragmento))
+    fragmentos = [(archivo, inicio, fin) for inicio, fin in dividir_en_fragmentos(archivo, numero)]
+    logger.info('comparando {} fragmentos de {} en {} procesos'.format(len(fragmentos), archivo, procesos))
+
+    with multiprocessing.Pool(procesos, initializer=_iniciar_trabajador, initargs=(emparejador, archivo_de_resultados, huella, reglas)) as pool:
+        por_mandar = iter(fragmentos)
+        pendientes = deque(pool.apply_async(_revisar_fragmento, (fragmento,))
+                           for fragmento in itertools.islice(por_mandar, procesos * fragmentos_en_vuelo_por_proceso))
+        while pendientes:
+            revisiones, metricas_del_fragmento = pendientes.popleft().get()
+            for fragmento in itertools.islice(por_mandar, 1):
+                pendientes.append(pool.apply_async(_revisar_fragmento, (fragmento,)))
+            metricas.sumar(metricas_del_fragmento)
+            yield from revisiones
+
+
+def comparar_en_paralelo(archivo, emparejador, procesos, bytes_por_fragmento=bytes_por_fragmento, reglas=None):
+    '''como comparar_registros, pero con un pool de procesos (ver revisar_en_paralelo)'''
+    for revision in revisar_en_paralelo(archivo, emparejador, procesos, bytes_por_fragmento=bytes_por_fragmento,
+                                        reglas=reglas):
+        if revision.resultado:
+            yield revision.resultado
+
+
+class EscritorDeResultados:
+    '''
+    un solo archivo abierto (con buffer) para todos los resultados de una búsqueda
+    usamos el modo 'a' en vez de 'w' para que nunca borremos un archivo que ya existe,
+    y solamente escribimos el 'header' si el archivo es nuevo
+    '''
+
+    def __init__(self, archivo, fieldnames=None, tamano_del_buffer=1024 * 1024):
+        self.archivo = archivo
+        self.fieldnames = fieldnames or campos_del_output()
+        self.tamano_del_buffer = tamano_del_buffer
+        self.escritos = 0
+
+    def __enter__(self):
+        nuevo = not os.path.isfile(self.archivo) or os.path.getsize(self.archivo) == 0
+        self.outfile = open(self.archivo, 'a', newline='', buffering=self.tamano_del_buffer)
+        self.escritor = csv.DictWriter(self.outfile, self.fieldnames)
+        if nuevo:
+            self.escritor.writeheader()
+        return self
+
+    def escribir(self, resultado):
+        self.escritor.writerow(resultado)
+        self.escritos += 1
+
+    def __exit__(self, *exc):
+        self.outfile.close()
+
+
+def reescribir_output(resultados, archivo, fieldnames):
+    '''
+    reemplazar el archivo de output con estos resultados (p.ej. todos los del almacén de resultados),
+    así que cada registro aparece una sola vez aunque corramos la búsqueda cada noche.
+    escribimos a un archivo temporal y lo cambiamos por el output al final: nunca queda a medias
+    '''
+    temporal = archivo + '.tmp'
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    with EscritorDeResultados(temporal, fieldnames) as escritor:
+        for resultado in resultados:
+            # un registro guardado por una búsqueda con --difuso tiene columnas de puntajes que quizás no usamos ahora
+            escritor.escribir({campo: resultado.get(campo, '') for campo in fieldnames})
+    os.replace(temporal, archivo)
+    return escritor.escritos
+
+
+def reglas_de_argumento(especificacion):
+    '''para argparse: una especificación mal escrita sale como error del argumento, con el mensaje de ReglasDeCampos'''
+    try:
+        return ReglasDeCampos(especificacion)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='buscar datos de INALI en registros MARC del catálogo')
+    parser.add_argument('--marc', default=os.path.join('documentos', 'Jonathan_Israel_results_nahuatl.csv'),
+                        help='un archivo con multiple registros MARC del catálogo: CSV, MARC binario (ISO 2709) o MARCXML')
+    parser.add_argument('--formato', choices=sorted(lectores),
+                        help='el formato del archivo de registros MARC (por defecto según su extensión)')
+    parser.add_argument('--output', default=os.path.join('documentos', 'MARC_busqueda_ejemplo.csv'),
+                        help='el archivo que guardará resultados positivos de una búsqueda')
+    parser.add_argument('--difuso', action='store_true',
+                        help='no fijarse en acentos ni apóstrofos, tolerar errores de ortografía y reportar un puntaje')
+    parser.add_argument('--umbral', type=float, default=0.7, help='el puntaje mínimo del emparejador difuso')
+    parser.add_argument('--campos', type=reglas_de_argumento, default=reglas_por_defecto,
+                        help='los campos y subcampos que revisamos, p.ej. "041,6XX$axz,546" o "todos" '
+                             '(por defecto "{}")'.format(especificacion_por_defecto))
+    parser.add_argument('--metricas', default=os.path.join('logs', 'metricas_MARC.json'),
+                        help='dónde escribir el resumen de métricas (JSON, o Prometheus si termina en .prom)')
+    parser.add_argument('--procesos', type=int, default=1,
+                        help='número de procesos para comparar fragmentos del archivo en paralelo')
+    parser.add_argument('--resultados', default=archivo_de_resultados,
+                        help='el almacén de resultados por registro (001); solamente comparamos los registros nuevos o cambiados')
+    parser.add_argument('--comparar-todo', action='store_true',
+                        help='comparar todos los registros aunque no hayan cambiado')
+    parser.add_argument('--sin-instantanea', action='store_true',
+                        help='construir el emparejador desde los datos en vez de usar su instantánea (ver instantanea_del_emparejador.py)')
+    parser.add_argument('--borrar-ausentes', action='store_true',
+                        help='borrar del almacén los registros que no están en este archivo (p.ej. un export completo del catálogo)')
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
+    args = parse_args()
+
     # configuración de logging
+    import logging.config
     logging.config.dictConfig(logging_config)
     logger = logging.getLogger('scrape_INALI')
     logger.info('* * * * * * * * * * * * * * * * *')
     logger.info('logging configured')
 
     INALI_carpeta = os.path.join('agrupaciones_de_INALI')  # los datos que ya sacamos de las páginas de INALI
-    MARC_ejemplo = os.path.join('documentos', 'Jonathan_Israel_results_nahuatl.csv')  # un ejemplo de un archivo con multiple registros MARC del catálogo
+    MARC_ejemplo = args.marc  # un ejemplo de un archivo con multiple registros MARC del catálogo
 
     # inciamos nuestro archivo que guardará resultados positivos de una búsqueda
-    output_archivo = os.path.join('documentos', 'MARC_busqueda_ejemplo.csv')
+    output_archivo = args.output
 
-    # primero sacamos los datos de INALI, de los archivos en los carpetas bajo de INALI_carpeta
-    logger.info('sacando los datos de INALI de sus carpetas...')
-    datos_de_inali = sacar_datos_de_carpetas(INALI_carpeta)
+    # el emparejador sale de su instantánea precompilada si los datos de INALI no han cambiado desde que la escribimos;
+    # si no, sacamos los datos (del almacén consolidado si existe, o si no de los archivos en los carpetas bajo de
+    # INALI_carpeta) y lo construimos una sola vez: un dict para búsquedas exactas y un autómata de Aho-Corasick que
+    # encuentra agrupaciones, variantes y autodenominaciones dentro de valores más largos
+    emparejador, variantes = emparejador_de_INALI(archivo_del_almacen, INALI_carpeta, args.difuso, args.umbral,
+                                                  False if args.sin_instantanea else None)
+    logger.info('tenemos {} términos de {} variantes para la búsqueda'.format(len(emparejador), variantes))
 
-    # agarrar todos los distintos agrupaciones lingüísticas de los datos de INALI para la búsqueda
-    logger.info('sacando los distintos agrupaciones para la comparación...')
-    agrupaciones = set()
-    for dato in datos_de_inali:
-        agrupaciones.add(dato['agrupacion_lingüística'])
+    # el almacén de resultados recuerda el 005 de cada registro y la huella del vocabulario con la que lo comparamos;
+    # solamente comparamos los registros nuevos o cambiados, o todos si cambió el vocabulario
+    almacen_de_resultados = AlmacenDeResultados(args.resultados)
+    logger.info('revisamos los campos {}'.format(args.campos.especificacion))
+    huella = huella_de_la_busqueda(emparejador, args.campos)
+    ultima_huella = almacen_de_resultados.ultima_huella()
+    if ultima_huella is not None and ultima_huella != huella:
+        logger.info('el vocabulario de INALI (o la búsqueda) cambió desde la última corrida; comparamos todos los registros')
+    corrida = almacen_de_resultados.empezar_corrida(huella)
+    archivo_vigente = None if args.comparar_todo else args.resultados
+    vigente = None if args.comparar_todo else partial(almacen_de_resultados.vigente, huella=huella)
 
-    # cambiamos las agrups a minúsculo para comparación; haremos lo mismo con los variantes
-    agrups_lower = [agrupacion.lower() for agrupacion in agrupaciones]
-
-    # hacemos lo mismo con los variantes de los datos de INALI
-    logger.info('sacando los variantes para la comparación...')
-    variantes = [dato['variante'].lower() for dato in datos_de_inali]
+    # tres etapas: un generator que lee un registro MARC completo a la vez, otro que compara con los datos de INALI
+    # los que no están vigentes en el almacén, y el almacén que guarda cada revisión con un upsert
+    logger.info('empezamos la búsqueda en el archivo {}'.format(MARC_ejemplo))
+    formato = args.formato or formato_de(MARC_ejemplo)
+    if args.procesos > 1 and formato == 'csv':
+        revisiones = revisar_en_paralelo(MARC_ejemplo, emparejador, args.procesos, archivo_vigente, huella, reglas=args.campos)
+    else:
+        if args.procesos > 1:
+            logger.warning('solamente sabemos dividir archivos CSV en fragmentos; seguimos con un solo proceso')
+        revisiones = revisar_registros(leer_registros(MARC_ejemplo, formato), emparejador, vigente, args.campos, MARC_ejemplo)
 
-    logger.info('tenemos {} agrupaciones y {} variantes para la búsqueda'.format(len(agrups_lower), len(variantes)))
+    inicio = time.perf_counter()
+    with almacen_de_resultados:
+        numeros = almacen_de_resultados.guardar(revisiones, huella, corrida)
+        segundos = time.perf_counter() - inicio
+        if args.borrar_ausentes:
+            logger.info('borramos {} registros que ya no están en {}'.format(almacen_de_resultados.borrar_ausentes(corrida), MARC_ejemplo))
 
-    # iniciamos nuestro variable para el index del registro MARC como '0'
-    # ya que en el archivo de registros MARC de hecho los datos empieza con index '1'
-    registro_index = '0'
+        # el output sale del almacén: un row por registro de este archivo con datos de INALI, sin duplicados
+        escritos = reescribir_output(almacen_de_resultados.resultados(corrida), output_archivo, campos_del_output(args.difuso))
+    metricas.observar('marc_busqueda_segundos', segundos)
 
-    # abrimos nuestro archivo de registros MARC
-    logger.info('empezamos la búsqueda en el archivo {}'.format(MARC_ejemplo))
-    with open(MARC_ejemplo, 'r') as marcs:
-        marcs_reader = csv.reader(marcs)
-        for row in marcs_reader:
-
-            # si el index del row cambia, ya estamos en nuevo registro de MARC
-            if row[0] != registro_index and int(row[0]) > 0:
-                logger.info('encontramos nuevo registro de MARC con index {}'.format(row[0]))
-
-                # si el index del registro es 1 o más, vemos si hay datos encontrados de la búsqueda
-                if int(registro_index) >= 1:
-
-                    # si hay datos encontrados, los escribimos a nuestro archivo de output
-                    if len(datos_del_registro['agrupaciones']) > 0 or len(datos_del_registro['variantes']) > 0:
-                        logger.info('escribiendo los datos del registro MARC con index {} a {}'.format(registro_index, output_archivo))
-                        escribir_al_archivo(output_archivo, datos_del_registro)
-                    else:
-                        # si no hay resultados registrados de la búsqueda, no hay que escribir nada al archivo de output
-                        logger.info('no encontramos datos en el registro MARC con index {}'.format(registro_index))
-
-                # reiniciamos nuestros variables para el próximo registro
-                datos_del_registro = {
-                    'index': '',
-                    'id': '',
-                    'agrupaciones': [],
-                    'campos_de_agrupaciones': [],
-                    'variantes': [],
-                    'campos_de_variantes': []
-                }
-                registro_index = row[0]
-                datos_del_registro['index'] = registro_index
-                continue  # no chequamos los datos de este primer row porque, como es el row 'LDR', no es relevante a la búsqueda
-            else:
-                if row[1] == '001':  # en el campo 001 tenemos la 'id' del sistema
-                    datos_del_registro['id'] = row[4]
-                else:
-                    for value in row:
-                        if value.lower() in agrups_lower:
-                            datos_del_registro['agrupaciones'].append(value)
-                            datos_del_registro['campos_de_agrupaciones'].append(row[1])
-                        if value.lower() in variantes:
-                            datos_del_registro['variantes'].append(value)
-                            datos_del_registro['campos_de_variantes'].append(row[1])
+    registros = metricas.valor('marc_registros_total')
+    logger.info('revisamos {} registros MARC en {:.1f} s ({:.0f} registros/s)'.format(registros, segundos, registros / max(segundos, 1e-9)))
+    logger.info('{} registros comparados ({} con datos de INALI) y {} sin cambios desde la última corrida'.format(
+        numeros['comparados'], numeros['encontrados'], numeros['sin_cambios']))
+    logger.info('escribimos los resultados de {} registros MARC a {}'.format(escritos, output_archivo))
+    metricas.escribir(args.metricas)
+    logger.info('escribimos el resumen de métricas a {}'.format(args.metricas))
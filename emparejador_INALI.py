@@ -0,0 +1,175 @@
+# un emparejador construido una sola vez desde los datos de INALI, para buscarlos en los valores de los campos MARC
+# - búsquedas exactas en tiempo constante (un dict)
+# - todas las ocurrencias de una agrupación, variante o autodenominación dentro de un valor más largo,
+#   como secuencia de tokens, con un autómata de Aho-Corasick: "Náhuatl (Idioma)" encuentra la agrupación "náhuatl"
+# - los términos que también son palabras comunes ("mayo") solamente al principio del valor o con "lengua", "idioma"...
+# el tiempo de buscar depende del largo del valor, no del número de términos en el vocabulario
+
+import re
+import hashlib
+from collections import deque, namedtuple
+
+
+# un término del vocabulario de INALI
+# @tipo: 'agrupación', 'variante' o 'autodenominación'
+# @nombre: la agrupación o el variante al que pertenece (para una autodenominación, el nombre de su variante)
+# @texto: el texto tal como aparece en los datos de INALI
+Termino = namedtuple('Termino', ['tipo', 'nombre', 'texto'])
+
+# una ocurrencia de un término en un valor: los tokens [inicio, fin) del valor
+Ocurrencia = namedtuple('Ocurrencia', ['inicio', 'fin', 'termino'])
+
+# las palabras las sacamos así; los apóstrofos (' y ’) y los paréntesis separan tokens,
+# así que "K'iche'" y "K’iche’" salen iguales
+patron_de_tokens = re.compile(r'\w+')
+
+# las autodenominaciones a veces son fragmentos de una o dos letras ("o̱", "gu");
+# si las buscamos como palabras encontramos "o" en cualquier título en español
+largo_minimo_de_autodenominacion = 3
+
+
+def es_pronunciacion(autode):
+    '''
+    cada autodenominación viene con su pronunciación en el AFI entre corchetes ("[nawat]"). un catálogo nunca la
+    escribe así, y sin los corchetes las cortas ("[nta]" -> "nta") se encuentran dentro de cualquier texto
+    '''
+    return autode.strip().startswith('[')
+
+
+# términos de una sola palabra que también son palabras comunes en español (o abreviaturas, como "Ote." de oriente):
+# "mayo" es un mes, "ñandú" un ave, "nauta" un marinero. dentro de un texto cualquiera ("Dicc. de la lengua española,
+# 12 mayo 2008") no son la lengua; solamente cuentan si el valor empieza con ellos, como un encabezamiento
+# ("Mayo (Idioma)", "Mayo-Yaqui"), o si lo demás del valor son palabras_de_contexto ("Lengua mayo")
+palabras_comunes = {
+    'mayo', 'ñandú', 'nauta', 'mocho', 'ote',
+    'enero', 'febrero', 'marzo', 'abril', 'junio', 'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre'
+}
+palabras_de_contexto = {
+    'lengua', 'lenguas', 'idioma', 'idiomas', 'dialecto', 'dialectos', 'indios', 'indígenas',
+    'language', 'languages', 'dialect', 'dialects', 'indians'
+}
+
+
+def tokenizar(texto):
+    return patron_de_tokens.findall(texto.lower())
+
+
+def terminos_de_INALI(datos_de_inali):
+    '''todos los términos que buscamos: agrupaciones, variantes y autodenominaciones'''
+    vistos = set()
+    for dato in datos_de_inali:
+        agrupacion = dato['agrupacion_lingüística']
+        variante = dato['variante']
+        candidatos = [Termino('agrupación', agrupacion, agrupacion), Termino('variante', variante, variante)]
+        for autodes in dato['autodenominaciones']:
+            for autode in autodes:
+                if not es_pronunciacion(autode) and len(''.join(tokenizar(autode))) >= largo_minimo_de_autodenominacion:
+                    candidatos.append(Termino('autodenominación', variante, autode))
+
+        for termino in candidatos:
+            if termino not in vistos:
+                vistos.add(termino)
+                yield termino
+
+
+class Emparejador:
+    '''
+    @datos_de_inali: los datos de los variantes, con el modelo de output_variante_json
+    construye el dict de búsquedas exactas y el autómata de Aho-Corasick sobre secuencias de tokens
+    '''
+
+    def __init__(self, datos_de_inali):
+        self.terminos = []
+        self.exactos = {}  # 'tokens separados por espacios' -> [índices de términos]
+
+        # el trie: cada estado es un dict token -> estado, con los términos que terminan ahí
+        self.transiciones = [{}]
+        self.salidas = [[]]
+        self.largos = []  # número de tokens de cada término
+
+        for termino in terminos_de_INALI(datos_de_inali):
+            tokens = self.tokenizar(termino.texto)
+            if not tokens:
+                continue
+            indice = len(self.terminos)
+            self.terminos.append(termino)
+            self.largos.append(len(tokens))
+            self.exactos.setdefault(' '.join(tokens), []).append(indice)
+
+            estado = 0
+            for token in tokens:
+                siguiente = self.transiciones[estado].get(token)
+                if siguiente is None:
+                    siguiente = len(self.transiciones)
+                    self.transiciones[estado][token] = siguiente
+                    self.transiciones.append({})
+                    self.salidas.append([])
+                estado = siguiente
+            self.salidas[estado].append(indice)
+
+        self._construir_fallas()
+
+        # los términos que son una palabra_común (ver arriba), y el contexto, con los tokens de este emparejador
+        comunes = {token for palabra in palabras_comunes for token in self.tokenizar(palabra)}
+        self.contexto = {token for palabra in palabras_de_contexto for token in self.tokenizar(palabra)}
+        self.comunes = {indice for indice, termino in enumerate(self.terminos)
+                        if self.largos[indice] == 1 and self.tokenizar(termino.texto)[0] in comunes}
+
+    def _construir_fallas(self):
+        '''los enlaces de falla de Aho-Corasick, por anchura; cada estado hereda las salidas de su falla'''
+        self.fallas = [0] * len(self.transiciones)
+        cola = deque(self.transiciones[0].values())
+        while cola:
+            estado = cola.popleft()
+            for token, siguiente in self.transiciones[estado].items():
+                cola.append(siguiente)
+                falla = self.fallas[estado]
+                while falla and token not in self.transiciones[falla]:
+                    falla = self.fallas[falla]
+                destino = self.transiciones[falla].get(token, 0)
+                self.fallas[siguiente] = destino if destino != siguiente else 0
+                self.salidas[siguiente] = self.salidas[siguiente] + self.salidas[self.fallas[siguiente]]
+
+    def __len__(self):
+        return len(self.terminos)
+
+    def huella(self):
+        '''
+        un hash corto del vocabulario y del tipo de emparejador: si cambia, pueden cambiar los resultados
+        de cualquier registro (ver la búsqueda incremental en comparar_registros_MARC.py)
+        '''
+        h = hashlib.sha256(type(self).__name__.encode('utf8'))
+        for termino in sorted(self.terminos):
+            h.update('\x1f'.join(termino).encode('utf8') + b'\x1e')
+        return h.hexdigest()[:16]
+
+    def tokenizar(self, texto):
+        '''las subclases pueden normalizar los tokens de otra forma (ver emparejador_difuso.py)'''
+        return tokenizar(texto)
+
+    def buscar_exacto(self, valor):
+        '''los términos que son exactamente este valor entero (sin importar mayúsculas ni puntuación)'''
+        return [self.terminos[i] for i in self.exactos.get(' '.join(self.tokenizar(valor)), ())]
+
+    def buscar(self, valor):
+        '''todas las ocurrencias de todos los términos dentro del valor, en orden'''
+        return self.buscar_en_tokens(self.tokenizar(valor))
+
+    def es_la_lengua(self, tokens, posicion):
+        '''si una palabra común en esta posición nombra la lengua: al principio del valor, o con puro contexto'''
+        return posicion == 0 or all(token in self.contexto for i, token in enumerate(tokens) if i != posicion)
+
+    def buscar_en_tokens(self, tokens):
+        '''recorrer el autómata sobre una secuencia de tokens ya normalizados'''
+        ocurrencias = []
+        estado = 0
+        transiciones, fallas, salidas, comunes = self.transiciones, self.fallas, self.salidas, self.comunes
+        for posicion, token in enumerate(tokens):
+            while estado and token not in transiciones[estado]:
+                estado = fallas[estado]
+            estado = transiciones[estado].get(token, 0)
+            for indice in salidas[estado]:
+                if indice in comunes and not self.es_la_lengua(tokens, posicion):
+                    continue
+                ocurrencias.append(Ocurrencia(posicion + 1 - self.largos[indice], posicion + 1, self.terminos[indice]))
+        return ocurrencias
@@ -0,0 +1,103 @@
+# un emparejador difuso, que no se fija en acentos, mayúsculas ni apóstrofos, y que tolera errores de ortografía:
+# "Nahuatl" = "Náhuatl", "Kʼicheʼ" = "K'iche'", "otomi" = "otomí", "Matlatzinga" ~ "matlatzinca"
+# normalizamos los términos de INALI una sola vez cuando construimos el emparejador, y guardamos un índice de
+# trigramas de caracteres sobre sus tokens. cada token de un valor MARC se cambia por el token más parecido
+# del vocabulario (con su puntaje) y luego usamos el mismo autómata de Aho-Corasick que el Emparejador.
+# como los tokens de un catálogo se repiten muchísimo, guardamos el token parecido de cada token que ya vimos,
+# así que el tiempo por registro no crece con el tamaño del vocabulario
+
+import re
+from collections import Counter, namedtuple
+
+from emparejador_INALI import Emparejador
+from normalizacion import normalizar
+
+
+# una ocurrencia con su puntaje de similitud (1.0 es igual después de normalizar)
+OcurrenciaDifusa = namedtuple('OcurrenciaDifusa', ['inicio', 'fin', 'termino', 'puntaje'])
+
+patron_de_tokens = re.compile(r'\w+')
+
+# los tokens más cortos que esto solamente se emparejan si son iguales: en tokens de dos o tres letras
+# un solo error ya es otra palabra
+largo_minimo_difuso = 5
+
+# un token que es solamente el principio de un token de INALI no lo cubre: "nahua" (de "Yuto-nahua") no es la
+# autodenominación "nahuat", aunque el puntaje (0.73) pasa el umbral. la única parte que puede faltar es la vocal
+# final del español, como en "Mixtec" ~ "mixteco" o "Totonac" ~ "totonaco"
+vocales_finales = set('aeo')
+
+
+def cubre(token, candidato):
+    '''si @token cubre todo el token @candidato del vocabulario, salvo quizás su vocal final'''
+    return not candidato.startswith(token) or candidato[len(token):] in vocales_finales
+
+
+def trigramas(token):
+    rellenado = '${}$'.format(token)
+    return {rellenado[i:i + 3] for i in range(len(rellenado) - 2)}
+
+
+class EmparejadorDifuso(Emparejador):
+    '''
+    @umbral: el puntaje mínimo (coeficiente de Dice entre los trigramas de dos tokens) para aceptar un token parecido
+    @maximo_de_memoria: cuántos tokens del catálogo recordamos antes de empezar de nuevo
+    '''
+    difuso = True
+
+    def __init__(self, datos_de_inali, umbral=0.7, maximo_de_memoria=200000):
+        self.umbral = umbral
+        self.maximo_de_memoria = maximo_de_memoria
+        super().__init__(datos_de_inali)
+
+        # el índice de trigramas sobre todos los tokens distintos del vocabulario
+        self.vocabulario = {token for transiciones in self.transiciones for token in transiciones}
+        self.trigramas_de_token = {token: trigramas(token) for token in self.vocabulario}
+        self.indice = {}
+        for token, grams in self.trigramas_de_token.items():
+            for gram in grams:
+                self.indice.setdefault(gram, []).append(token)
+
+        self.memoria = {}
+
+    def __getstate__(self):
+        '''la memoria de tokens del catálogo no va en un pickle (a los procesos del pool o a una instantánea)'''
+        estado = dict(self.__dict__)
+        estado['memoria'] = {}
+        return estado
+
+    def tokenizar(self, texto):
+        return patron_de_tokens.findall(normalizar(texto))
+
+    def huella(self):
+        '''con otro umbral encontramos otros términos, así que el umbral también cuenta'''
+        return '{}-{}'.format(super().huella(), self.umbral)
+
+    def token_parecido(self, token):
+        '''el token del vocabulario más parecido a este y su puntaje, o (token, 0.0) si ninguno pasa el umbral'''
+        if token in self.vocabulario:
+            return token, 1.0
+        # con get y no "in" + [], porque otro hilo (ver servicio_INALI.py) puede vaciar la memoria entre los dos
+        recordado = self.memoria.get(token)
+        if recordado is not None:
+            return recordado
+
+        parecido = (token, 0.0)
+        if len(token) >= largo_minimo_difuso:
+            grams = trigramas(token)
+            compartidos = Counter(candidato for gram in grams for candidato in self.indice.get(gram, ()))
+            for candidato, numero in compartidos.most_common():
+                puntaje = 2.0 * numero / (len(grams) + len(self.trigramas_de_token[candidato]))
+                if puntaje >= self.umbral and puntaje > parecido[1] and cubre(token, candidato):
+                    parecido = (candidato, puntaje)
+
+        if len(self.memoria) >= self.maximo_de_memoria:
+            self.memoria.clear()
+        self.memoria[token] = parecido
+        return parecido
+
+    def buscar(self, valor):
+        '''todas las ocurrencias, con el puntaje del token menos parecido de cada una'''
+        parecidos = [self.token_parecido(token) for token in self.tokenizar(valor)]
+        return [OcurrenciaDifusa(o.inicio, o.fin, o.termino, min(p for _, p in parecidos[o.inicio:o.fin]))
+                for o in self.buscar_en_tokens([token for token, _ in parecidos])]
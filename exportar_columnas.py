@@ -0,0 +1,316 @@
+# exportar los datos de INALI y los resultados de la búsqueda en el catálogo en columnas, para los reportes de
+# cobertura (ver cobertura.py). en vez del árbol de JSON por variante y del CSV con listas de python adentro de
+# cada celda, cada tabla es un array de NumPy por columna. los textos que se repiten (familia, agrupación,
+# variante, estado, campo, registro) van codificados como diccionario: un array de int32 con un código por fila
+# y la lista de las categorías, cada una una sola vez.
+# con pyarrow escribimos Parquet (con columnas de diccionario, que pandas lee como categóricas); si no, un .npz de NumPy
+# las tablas:
+#   variantes:   variante, agrupacion, familia                    (una fila por variante de INALI)
+#   estados:     variante, estado                                 (una fila por variante y estado donde se habla)
+#   encontrados: registro, columna, nombre, campo, puntaje        (una fila por dato de INALI encontrado en un registro)
+# uso:
+#   python exportar_columnas.py
+#   python exportar_columnas.py --resultados resultados_MARC.sqlite --carpeta columnas --formato npz
+#   python exportar_columnas.py --output documentos/MARC_busqueda_ejemplo.csv
+
+import os
+import ast
+import csv
+import argparse
+import logging
+from array import array
+from functools import lru_cache
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from almacen_INALI import archivo_del_almacen, datos_de_INALI
+from almacen_de_resultados import AlmacenDeResultados, archivo_de_resultados
+from comparar_registros_MARC import columnas_de_puntajes
+
+
+logger = logging.getLogger('scrape_INALI')
+
+carpeta_de_columnas = 'columnas'
+formatos = ('parquet', 'npz')
+
+# una columna codificada como diccionario: categorias[codigos[i]] es el valor de la fila i
+Categorica = namedtuple('Categorica', ['codigos', 'categorias'])
+
+# la columna "columna" de encontrados, como en el output de la búsqueda
+columnas_del_output = tuple(columnas_de_puntajes)
+
+# lo que separa las categorías de su columna en un .npz
+sufijo_de_categorias = '__categorias'
+
+
+def importar_numpy():
+    if np is None:
+        raise ImportError('para las tablas en columnas hace falta numpy (pip install numpy)')
+    return np
+
+
+@lru_cache(maxsize=None)
+def importar_pyarrow():
+    '''pyarrow tarda en importarse y es opcional: None si no está instalado'''
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def formato_por_defecto():
+    return 'parquet' if importar_pyarrow() is not None else 'npz'
+
+
+class Codificador:
+    '''el diccionario de una columna de textos que llega fila por fila; los códigos se guardan en un array de C'''
+
+    def __init__(self, categorias=()):
+        self.ids = {categoria: i for i, categoria in enumerate(categorias)}
+        self.codigos = array('i')
+
+    def codigo(self, texto):
+        codigo = self.ids.get(texto)
+        if codigo is None:
+            codigo = self.ids[texto] = len(self.ids)
+        return codigo
+
+    def agregar(self, texto):
+        self.codigos.append(self.codigo(texto))
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def categorica(self):
+        return Categorica(a_numpy(self.codigos, 'int32'), list(self.ids))
+
+
+def a_numpy(arreglo, dtype):
+    '''un array de C (del módulo array) como array de NumPy, con una sola copia'''
+    importar_numpy()
+    if not len(arreglo):
+        return np.zeros(0, dtype=dtype)
+    return np.frombuffer(arreglo, dtype=arreglo.typecode).astype(dtype)
+
+
+def largo_de_tabla(tabla):
+    columna = next(iter(tabla.values()))
+    return len(columna.codigos if isinstance(columna, Categorica) else columna)
+
+
+def tablas_de_INALI(datos_de_inali):
+    '''
+    las tablas de variantes y de estados. la variante de la tabla de estados usa las mismas categorías que la de
+    variantes, así que su código es la fila de la variante. una variante aparece una sola vez por estado aunque
+    INALI la ponga en varias representaciones geográficas
+    '''
+    variante, agrupacion, familia = Codificador(), Codificador(), Codificador()
+    variante_del_estado, estado = array('i'), Codificador()
+    for dato in datos_de_inali:
+        if dato['variante'] in variante.ids:
+            continue
+        variante.agregar(dato['variante'])
+        agrupacion.agregar(dato['agrupacion_lingüística'])
+        familia.agregar(dato['familia_lingüística'])
+        estados_de_la_variante = set()
+        for repr_geo in dato['representación_geográfica']:
+            for nombre in repr_geo:
+                if nombre not in estados_de_la_variante:
+                    estados_de_la_variante.add(nombre)
+                    variante_del_estado.append(variante.codigos[-1])
+                    estado.agregar(nombre)
+
+    variantes = {
+        'variante': variante.categorica(),
+        'agrupacion': agrupacion.categorica(),
+        'familia': familia.categorica()
+    }
+    estados = {
+        'variante': Categorica(a_numpy(variante_del_estado, 'int32'), variantes['variante'].categorias),
+        'estado': estado.categorica()
+    }
+    return variantes, estados
+
+
+def tabla_de_encontrados(resultados):
+    '''
+    @resultados: resultados con el modelo de datos_del_registro (del almacén de resultados o del output)
+    el registro es su id (001), o su index si no tiene. el puntaje es 1.0 para una búsqueda exacta
+    '''
+    registro, columna, nombre, campo = Codificador(), Codificador(columnas_del_output), Codificador(), Codificador()
+    puntaje = array('f')
+    registros = 0
+    for resultado in resultados:
+        registros += 1
+        id = resultado.get('id') or resultado['index']
+        for de_la_columna in columnas_del_output:
+            nombres = resultado.get(de_la_columna) or []
+            campos = resultado.get('campos_de_' + de_la_columna) or []
+            puntajes = resultado.get(columnas_de_puntajes[de_la_columna]) or [1.0] * len(nombres)
+            for nombre_encontrado, campo_encontrado, puntaje_encontrado in zip(nombres, campos, puntajes):
+                registro.agregar(id)
+                columna.agregar(de_la_columna)
+                nombre.agregar(nombre_encontrado)
+                campo.agregar(campo_encontrado)
+                puntaje.append(puntaje_encontrado)
+    logger.info('{} datos de INALI encontrados en {} registros'.format(len(registro), registros))
+
+    return {
+        'registro': registro.categorica(),
+        'columna': columna.categorica(),
+        'nombre': nombre.categorica(),
+        'campo': campo.categorica(),
+        'puntaje': a_numpy(puntaje, 'float32')
+    }
+
+
+def resultados_del_csv(archivo):
+    '''los resultados de un archivo de output de la búsqueda, donde cada lista se escribió como texto: "['náhuatl']"'''
+    with open(archivo, newline='') as inf:
+        for resultado in csv.DictReader(inf):
+            for llave, valor in resultado.items():
+                if valor.startswith('['):
+                    resultado[llave] = ast.literal_eval(valor)
+            yield resultado
+
+
+def escribir_tabla(tabla, archivo):
+    '''una tabla (un dict de columnas: arrays de NumPy o Categoricas) a Parquet o .npz, según la extensión'''
+    importar_numpy()
+    if archivo.endswith('.parquet'):
+        pyarrow = importar_pyarrow()
+        if pyarrow is None:
+            raise ImportError('para escribir Parquet hace falta pyarrow (pip install pyarrow); si no, usa el formato npz')
+        columnas = {}
+        for nombre, columna in tabla.items():
+            if isinstance(columna, Categorica):
+                columnas[nombre] = pyarrow.DictionaryArray.from_arrays(
+                    pyarrow.array(columna.codigos), pyarrow.array(columna.categorias, type=pyarrow.string()))
+            else:
+                columnas[nombre] = pyarrow.array(columna)
+        # un solo row group, así que cada columna tiene un solo diccionario al leerla
+        pyarrow.parquet.write_table(pyarrow.table(columnas), archivo, row_group_size=max(largo_de_tabla(tabla), 1))
+    elif archivo.endswith('.npz'):
+        arrays = {}
+        for nombre, columna in tabla.items():
+            if isinstance(columna, Categorica):
+                arrays[nombre] = columna.codigos
+                arrays[nombre + sufijo_de_categorias] = np.array(columna.categorias, dtype=str)
+            else:
+                arrays[nombre] = columna
+        np.savez(archivo, **arrays)
+    else:
+        raise ValueError('no sabemos escribir {} (.parquet o .npz)'.format(archivo))
+
+
+def categorica_de_arrow(columna, pyarrow):
+    '''
+    una columna de diccionario de pyarrow (en trozos) como Categorica. los trozos de un mismo row group comparten su
+    diccionario, y entonces basta con juntar los códigos; unify_dictionaries vuelve a hashear todas las categorías
+    '''
+    trozos = columna.chunks
+    if not trozos:
+        return Categorica(np.zeros(0, dtype='int32'), [])
+    if any(not trozo.dictionary.equals(trozos[0].dictionary) for trozo in trozos[1:]):
+        trozos = columna.unify_dictionaries().chunks
+    codigos = pyarrow.concat_arrays([trozo.indices for trozo in trozos])
+    return Categorica(codigos.to_numpy().astype('int32', copy=False), trozos[0].dictionary.to_pylist())
+
+
+def leer_tabla(archivo):
+    '''una tabla escrita por escribir_tabla; las columnas de diccionario regresan como Categoricas'''
+    importar_numpy()
+    tabla = {}
+    if archivo.endswith('.parquet'):
+        pyarrow = importar_pyarrow()
+        if pyarrow is None:
+            raise ImportError('para leer Parquet hace falta pyarrow (pip install pyarrow)')
+        leida = pyarrow.parquet.read_table(archivo)
+        for nombre in leida.column_names:
+            columna = leida.column(nombre)
+            if pyarrow.types.is_dictionary(columna.type):
+                tabla[nombre] = categorica_de_arrow(columna, pyarrow)
+            else:
+                tabla[nombre] = columna.to_numpy()
+    elif archivo.endswith('.npz'):
+        with np.load(archivo, allow_pickle=False) as leida:
+            for nombre in leida.files:
+                if nombre.endswith(sufijo_de_categorias):
+                    continue
+                if nombre + sufijo_de_categorias in leida.files:
+                    tabla[nombre] = Categorica(leida[nombre], leida[nombre + sufijo_de_categorias].tolist())
+                else:
+                    tabla[nombre] = leida[nombre]
+    else:
+        raise ValueError('no sabemos leer {} (.parquet o .npz)'.format(archivo))
+    return tabla
+
+
+def archivo_de_tabla(carpeta, nombre, formato):
+    return os.path.join(carpeta, '{}.{}'.format(nombre, formato))
+
+
+def buscar_tabla(carpeta, nombre):
+    '''el archivo de una tabla en la carpeta, en el formato que haya (Parquet primero)'''
+    for formato in formatos:
+        archivo = archivo_de_tabla(carpeta, nombre, formato)
+        if os.path.isfile(archivo):
+            return archivo
+    raise FileNotFoundError('no hay una tabla de {} en {}; corre exportar_columnas.py primero'.format(nombre, carpeta))
+
+
+def leer_tablas(carpeta=carpeta_de_columnas):
+    '''(variantes, estados, encontrados) de una carpeta escrita por exportar'''
+    return tuple(leer_tabla(buscar_tabla(carpeta, nombre)) for nombre in ('variantes', 'estados', 'encontrados'))
+
+
+def exportar(tablas, carpeta=carpeta_de_columnas, formato=None):
+    '''
+    @tablas: un dict de nombre -> tabla
+    cada tabla se escribe a un archivo temporal y se cambia al final, así que un reporte nunca lee una a medias
+    '''
+    formato = formato or formato_por_defecto()
+    os.makedirs(carpeta, exist_ok=True)
+    escritos = []
+    for nombre, tabla in tablas.items():
+        archivo = archivo_de_tabla(carpeta, nombre, formato)
+        temporal = archivo_de_tabla(carpeta, '{}.tmp'.format(nombre), formato)
+        escribir_tabla(tabla, temporal)
+        os.replace(temporal, archivo)
+        # una tabla vieja en el otro formato ya no corresponde
+        for otro in formatos:
+            if otro != formato and os.path.isfile(archivo_de_tabla(carpeta, nombre, otro)):
+                os.remove(archivo_de_tabla(carpeta, nombre, otro))
+        logger.info('escribimos {} filas de {} a {}'.format(largo_de_tabla(tabla), nombre, archivo))
+        escritos.append(archivo)
+    return escritos
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level='INFO', format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='exportar los datos de INALI y los resultados de la búsqueda en columnas')
+    parser.add_argument('--almacen', default=archivo_del_almacen)
+    parser.add_argument('--carpeta-de-INALI', default='agrupaciones_de_INALI')
+    parser.add_argument('--resultados', default=archivo_de_resultados, help='el almacén de resultados de la búsqueda')
+    parser.add_argument('--output', help='un archivo de output de la búsqueda (CSV) en vez del almacén de resultados')
+    parser.add_argument('--carpeta', default=carpeta_de_columnas, help='dónde escribir las tablas')
+    parser.add_argument('--formato', choices=formatos, help='por defecto Parquet si pyarrow está instalado, y si no npz')
+    args = parser.parse_args()
+
+    variantes, estados = tablas_de_INALI(datos_de_INALI(args.almacen, args.carpeta_de_INALI))
+    if args.output:
+        encontrados = tabla_de_encontrados(resultados_del_csv(args.output))
+    else:
+        if not os.path.isfile(args.resultados):
+            raise SystemExit('no existe el almacén de resultados {}; corre comparar_registros_MARC.py primero'.format(args.resultados))
+        with AlmacenDeResultados(args.resultados) as almacen:
+            encontrados = tabla_de_encontrados(almacen.resultados())
+
+    exportar({'variantes': variantes, 'estados': estados, 'encontrados': encontrados}, args.carpeta, args.formato)
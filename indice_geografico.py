@@ -0,0 +1,207 @@
+# un índice invertido de la representación geográfica de INALI: estado, municipio y localidad -> variantes
+# parse_datos_geos deja las localidades de un municipio como un solo string separado por comas,
+# así que sin el índice hay que abrir todos los JSON y buscar adentro de esos strings para cada pregunta.
+# construimos el índice una vez (al final del crawl, o desde el almacén), con cada localidad separada y
+# cada nombre de lugar guardado una sola vez, y lo guardamos a disco para consultarlo sin releer nada
+# uso:
+#   python indice_geografico.py --construir
+#   python indice_geografico.py --estado OAXACA
+#   python indice_geografico.py --municipio "San Juan Guichicovi"
+#   python indice_geografico.py --localidad "Santa María Huazolotitlán" --estado OAXACA
+#   python indice_geografico.py --variante "mixteco de Santa María Peñoles"
+
+import os
+import sys
+import json
+import argparse
+
+from normalizacion import normalizar
+
+
+archivo_del_indice = 'indice_geografico_de_INALI.json'
+version_del_indice = 1
+
+
+def separar_localidades(localidades):
+    '''"Maya Balam, San Isidro la Laguna" -> ['Maya Balam', 'San Isidro la Laguna']'''
+    return [localidad.strip() for localidad in localidades.split(',') if localidad.strip()]
+
+
+def construir_indice(datos_de_inali):
+    '''
+    el índice en la forma que guardamos a disco: cada nombre de lugar y cada variante una sola vez
+    en una lista, y los lugares como ids en esas listas
+    '''
+    nombres = []
+    ids_de_nombres = {}
+
+    def id_de(nombre):
+        nombre = sys.intern(nombre)
+        if nombre not in ids_de_nombres:
+            ids_de_nombres[nombre] = len(nombres)
+            nombres.append(nombre)
+        return ids_de_nombres[nombre]
+
+    variantes = []
+    estados, municipios, localidades = {}, {}, {}
+    for dato in datos_de_inali:
+        id_variante = len(variantes)
+        variantes.append([dato['agrupacion_lingüística'], dato['variante']])
+        for repr_geo in dato['representación_geográfica']:
+            for estado, municipios_del_estado in repr_geo.items():
+                e = id_de(estado)
+                estados.setdefault(e, set()).add(id_variante)
+                for municipio, cadenas in municipios_del_estado.items():
+                    m = id_de(municipio)
+                    municipios.setdefault((e, m), set()).add(id_variante)
+                    for cadena in cadenas:
+                        for localidad in separar_localidades(cadena):
+                            localidades.setdefault((e, m, id_de(localidad)), set()).add(id_variante)
+
+    return {
+        'version': version_del_indice,
+        'nombres': nombres,
+        'variantes': variantes,
+        'estados': [[e, sorted(vs)] for e, vs in estados.items()],
+        'municipios': [[e, m, sorted(vs)] for (e, m), vs in municipios.items()],
+        'localidades': [[e, m, l, sorted(vs)] for (e, m, l), vs in localidades.items()]
+    }
+
+
+def escribir_indice(datos_de_inali, archivo=archivo_del_indice):
+    indice = construir_indice(datos_de_inali)
+    with open(archivo, 'w') as outf:
+        outf.write(json.dumps(indice))
+    return indice
+
+
+class IndiceGeografico:
+    '''
+    consultas sobre el índice guardado. los nombres se comparan sin mayúsculas ni acentos,
+    así que "Oaxaca", "OAXACA" y "oaxaca" son el mismo estado.
+    cada consulta regresa una lista de (agrupación, variante)
+    '''
+
+    def __init__(self, indice):
+        if indice.get('version') != version_del_indice:
+            raise ValueError('el índice geográfico es de la versión {}, esperábamos {}'.format(
+                indice.get('version'), version_del_indice))
+        self.nombres = indice['nombres']
+        self.variantes = [tuple(variante) for variante in indice['variantes']]
+        self.normalizados = [normalizar(nombre) for nombre in self.nombres]
+
+        self.por_estado = {e: vs for e, vs in indice['estados']}
+        self.por_municipio = {(e, m): vs for e, m, vs in indice['municipios']}
+        self.por_localidad = {(e, m, l): vs for e, m, l, vs in indice['localidades']}
+
+        # nombre normalizado -> los lugares con ese nombre, para encontrar un municipio o una localidad sin su estado
+        self.municipios_por_nombre = {}
+        for e, m in self.por_municipio:
+            self.municipios_por_nombre.setdefault(self.normalizados[m], []).append((e, m))
+        self.localidades_por_nombre = {}
+        for e, m, l in self.por_localidad:
+            self.localidades_por_nombre.setdefault(self.normalizados[l], []).append((e, m, l))
+
+        # variante -> sus lugares, para la consulta inversa. un municipio donde el variante no tiene localidades
+        # (en INALI hay municipios con la lista vacía) entra como (e, m, None), y lo mismo un estado sin municipios
+        self.lugares_por_variante = {}
+        con_lugares = set()
+        for (e, m, l), vs in self.por_localidad.items():
+            for v in vs:
+                self.lugares_por_variante.setdefault(v, []).append((e, m, l))
+                con_lugares.update([(v, e, m), (v, e)])
+        for (e, m), vs in self.por_municipio.items():
+            for v in vs:
+                if (v, e, m) not in con_lugares:
+                    self.lugares_por_variante.setdefault(v, []).append((e, m, None))
+                    con_lugares.add((v, e))
+        for e, vs in self.por_estado.items():
+            for v in vs:
+                if (v, e) not in con_lugares:
+                    self.lugares_por_variante.setdefault(v, []).append((e, None, None))
+
+    @classmethod
+    def abrir(cls, archivo=archivo_del_indice):
+        with open(archivo, 'r') as inf:
+            return cls(json.loads(inf.read()))
+
+    def _variantes(self, ids):
+        return [self.variantes[v] for v in sorted(ids)]
+
+    def _es(self, id_nombre, nombre):
+        return nombre is None or self.normalizados[id_nombre] == normalizar(nombre)
+
+    def estados(self):
+        return sorted(self.nombres[e] for e in self.por_estado)
+
+    def variantes_en_estado(self, estado):
+        ids = set()
+        for e, vs in self.por_estado.items():
+            if self._es(e, estado):
+                ids.update(vs)
+        return self._variantes(ids)
+
+    def variantes_en_municipio(self, municipio, estado=None):
+        ids = set()
+        for e, m in self.municipios_por_nombre.get(normalizar(municipio), ()):
+            if self._es(e, estado):
+                ids.update(self.por_municipio[(e, m)])
+        return self._variantes(ids)
+
+    def variantes_en_localidad(self, localidad, estado=None, municipio=None):
+        ids = set()
+        for e, m, l in self.localidades_por_nombre.get(normalizar(localidad), ()):
+            if self._es(e, estado) and self._es(m, municipio):
+                ids.update(self.por_localidad[(e, m, l)])
+        return self._variantes(ids)
+
+    def lugares_de_variante(self, variante):
+        '''
+        todas las (estado, municipio, localidad) donde se habla un variante; en los municipios sin localidades
+        la localidad es '', y en los estados sin municipios también el municipio
+        '''
+        def nombre_de(id_nombre):
+            return '' if id_nombre is None else self.nombres[id_nombre]
+
+        lugares = []
+        for v, (_, nombre) in enumerate(self.variantes):
+            if normalizar(nombre) == normalizar(variante):
+                lugares.extend((nombre_de(e), nombre_de(m), nombre_de(l))
+                               for e, m, l in self.lugares_por_variante.get(v, ()))
+        return lugares
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='el índice geográfico de los variantes de INALI')
+    parser.add_argument('--indice', default=archivo_del_indice)
+    parser.add_argument('--construir', action='store_true',
+                        help='construir el índice desde el almacén de INALI (o desde agrupaciones_de_INALI)')
+    parser.add_argument('--estado')
+    parser.add_argument('--municipio')
+    parser.add_argument('--localidad')
+    parser.add_argument('--variante')
+    args = parser.parse_args()
+
+    if args.construir:
+        from almacen_INALI import AlmacenINALI, archivo_del_almacen, sacar_datos_de_carpetas
+        if os.path.isfile(archivo_del_almacen):
+            with AlmacenINALI(archivo_del_almacen) as almacen:
+                datos_de_inali = list(almacen)
+        else:
+            datos_de_inali = sacar_datos_de_carpetas('agrupaciones_de_INALI')
+        indice = escribir_indice(datos_de_inali, args.indice)
+        print('índice de {} estados, {} municipios y {} localidades escrito a {}'.format(
+            len(indice['estados']), len(indice['municipios']), len(indice['localidades']), args.indice))
+
+    if args.estado or args.municipio or args.localidad or args.variante:
+        indice = IndiceGeografico.abrir(args.indice)
+        if args.variante:
+            resultados = indice.lugares_de_variante(args.variante)
+        elif args.localidad:
+            resultados = indice.variantes_en_localidad(args.localidad, args.estado, args.municipio)
+        elif args.municipio:
+            resultados = indice.variantes_en_municipio(args.municipio, args.estado)
+        else:
+            resultados = indice.variantes_en_estado(args.estado)
+        for resultado in resultados:
+            print(' / '.join(filter(None, resultado)))
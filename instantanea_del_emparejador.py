@@ -0,0 +1,190 @@
+# una instantánea del emparejador ya construido (el vocabulario, el dict de búsquedas exactas, el autómata de
+# Aho-Corasick y, para el difuso, el índice de trigramas) como un pickle precompilado en un archivo con versión,
+# así una búsqueda corta no tiene que leer cientos de archivos de JSON ni construir el autómata cada vez.
+# cada proceso que la carga tiene su propia copia del emparejador (no se comparte memoria entre procesos);
+# lo que ahorra es el tiempo de construirlo
+# el archivo es:
+#   firma | largo del encabezado (4 bytes) | encabezado (JSON) | el emparejador (pickle)
+# el encabezado lleva la huella del origen: los tamaños y fechas de los archivos de agrupaciones_de_INALI/
+# (o del almacén) y el código de los emparejadores. si algo de eso cambia, la instantánea ya no sirve y
+# se construye otra automáticamente
+# uso:
+#   python instantanea_del_emparejador.py --construir
+#   python instantanea_del_emparejador.py --construir --difuso --umbral 0.8
+#   python instantanea_del_emparejador.py --info
+
+import os
+import sys
+import json
+import time
+import pickle
+import struct
+import hashlib
+import argparse
+import logging
+
+from almacen_INALI import archivo_del_almacen, datos_de_INALI
+from metricas import metricas
+
+
+logger = logging.getLogger('scrape_INALI')
+
+firma = b'INALI-EMPAREJADOR\n'
+version_de_la_instantanea = 1
+
+archivos_de_instantanea = {
+    False: 'emparejador_de_INALI.instantanea',
+    True: 'emparejador_difuso_de_INALI.instantanea'
+}
+
+# si cambia el código que construye el emparejador, una instantánea vieja tampoco sirve
+modulos_del_emparejador = ['emparejador_INALI.py', 'emparejador_difuso.py']
+
+
+def huella_de_origen(almacen=archivo_del_almacen, carpeta='agrupaciones_de_INALI'):
+    '''
+    un hash del origen de los datos sin leerlos: el nombre, tamaño y fecha de cada archivo de JSON
+    (o del almacén, si existe, porque de ahí los sacamos primero) y el contenido de los módulos del emparejador
+    '''
+    h = hashlib.sha256()
+    if almacen and os.path.isfile(almacen):
+        estado = os.stat(almacen)
+        h.update('almacén\x1f{}\x1f{}\x1e'.format(estado.st_size, estado.st_mtime_ns).encode('utf8'))
+    else:
+        for dirpath, dirnames, filenames in os.walk(carpeta):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                estado = os.stat(os.path.join(dirpath, filename))
+                h.update('{}\x1f{}\x1f{}\x1e'.format(
+                    os.path.relpath(os.path.join(dirpath, filename), carpeta), estado.st_size, estado.st_mtime_ns).encode('utf8'))
+
+    aqui = os.path.dirname(os.path.abspath(__file__))
+    for modulo in modulos_del_emparejador:
+        with open(os.path.join(aqui, modulo), 'rb') as codigo:
+            h.update(codigo.read())
+    return h.hexdigest()[:16]
+
+
+def escribir_instantanea(emparejador, archivo, origen, variantes):
+    '''
+    @origen: la huella_de_origen de los datos con los que construimos el emparejador
+    escribimos a un archivo temporal (uno por proceso) y lo cambiamos al final, así que nadie abre una instantánea a medias
+    '''
+    encabezado = json.dumps({
+        'version': version_de_la_instantanea,
+        'python': list(sys.version_info[:2]),
+        'origen': origen,
+        'clase': type(emparejador).__name__,
+        'umbral': getattr(emparejador, 'umbral', None),
+        'huella': emparejador.huella(),
+        'terminos': len(emparejador),
+        'variantes': variantes,
+        'creado': time.strftime('%Y-%m-%d %H:%M:%S')
+    }).encode('utf8')
+
+    temporal = '{}.{}.tmp'.format(archivo, os.getpid())
+    with open(temporal, 'wb') as outf:
+        outf.write(firma)
+        outf.write(struct.pack('<I', len(encabezado)))
+        outf.write(encabezado)
+        pickle.dump(emparejador, outf, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporal, archivo)
+    logger.info('escribimos la instantánea del emparejador ({} términos) a {}'.format(len(emparejador), archivo))
+
+
+def leer_encabezado(archivo):
+    '''el encabezado de una instantánea, o None si el archivo no existe o no es una instantánea'''
+    try:
+        with open(archivo, 'rb') as inf:
+            if inf.read(len(firma)) != firma:
+                return None
+            largo, = struct.unpack('<I', inf.read(4))
+            return json.loads(inf.read(largo))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def vigente(encabezado, origen, difuso=False, umbral=None):
+    '''True si la instantánea se construyó con esta versión, este python, estos datos y este tipo de emparejador'''
+    return (encabezado is not None
+            and encabezado['version'] == version_de_la_instantanea
+            and encabezado['python'] == list(sys.version_info[:2])
+            and encabezado['origen'] == origen
+            and encabezado['clase'] == ('EmparejadorDifuso' if difuso else 'Emparejador')
+            and (not difuso or encabezado['umbral'] == umbral))
+
+
+def cargar_instantanea(archivo):
+    '''el emparejador y el encabezado de una instantánea; pickle.load arma el emparejador entero en la memoria'''
+    with open(archivo, 'rb') as inf:
+        inf.seek(len(firma))
+        largo, = struct.unpack('<I', inf.read(4))
+        encabezado = json.loads(inf.read(largo))
+        emparejador = pickle.load(inf)
+    return emparejador, encabezado
+
+
+def construir_emparejador(almacen=archivo_del_almacen, carpeta='agrupaciones_de_INALI', difuso=False, umbral=0.7):
+    '''sacar los datos de INALI (del almacén si existe) y construir el emparejador; regresa (emparejador, variantes)'''
+    datos_de_inali = datos_de_INALI(almacen, carpeta)
+
+    # los emparejadores los importamos aquí: al cargar una instantánea, pickle importa solamente el que hace falta
+    logger.info('construyendo el emparejador de agrupaciones, variantes y autodenominaciones...')
+    if difuso:
+        from emparejador_difuso import EmparejadorDifuso
+        return EmparejadorDifuso(datos_de_inali, umbral=umbral), len(datos_de_inali)
+    from emparejador_INALI import Emparejador
+    return Emparejador(datos_de_inali), len(datos_de_inali)
+
+
+def emparejador_de_INALI(almacen=archivo_del_almacen, carpeta='agrupaciones_de_INALI', difuso=False, umbral=0.7,
+                         archivo=None):
+    '''
+    el emparejador de la instantánea si sigue vigente; si no, lo construimos y escribimos una instantánea nueva.
+    con archivo=False nunca usamos instantáneas. regresa (emparejador, variantes)
+    '''
+    if archivo is False:
+        return construir_emparejador(almacen, carpeta, difuso, umbral)
+    archivo = archivo or archivos_de_instantanea[difuso]
+
+    origen = huella_de_origen(almacen, carpeta)
+    if vigente(leer_encabezado(archivo), origen, difuso, umbral):
+        with metricas.medir('instantanea_carga_segundos'):
+            emparejador, encabezado = cargar_instantanea(archivo)
+        logger.info('cargamos el emparejador de la instantánea {} (creada {})'.format(archivo, encabezado['creado']))
+        return emparejador, encabezado['variantes']
+
+    logger.info('la instantánea {} no existe o ya no corresponde a los datos de INALI; la construimos'.format(archivo))
+    emparejador, variantes = construir_emparejador(almacen, carpeta, difuso, umbral)
+    try:
+        escribir_instantanea(emparejador, archivo, origen, variantes)
+    except OSError as e:
+        logger.warning('no pudimos escribir la instantánea {}: {}'.format(archivo, e))
+    return emparejador, variantes
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level='INFO', format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='la instantánea precompilada del emparejador de INALI')
+    parser.add_argument('--construir', action='store_true', help='construir la instantánea aunque siga vigente')
+    parser.add_argument('--info', action='store_true', help='mostrar el encabezado de la instantánea y si sigue vigente')
+    parser.add_argument('--difuso', action='store_true')
+    parser.add_argument('--umbral', type=float, default=0.7)
+    parser.add_argument('--almacen', default=archivo_del_almacen)
+    parser.add_argument('--carpeta', default='agrupaciones_de_INALI')
+    parser.add_argument('--instantanea', help='el archivo de la instantánea (por defecto según --difuso)')
+    args = parser.parse_args()
+    archivo = args.instantanea or archivos_de_instantanea[args.difuso]
+
+    if args.construir:
+        emparejador, variantes = construir_emparejador(args.almacen, args.carpeta, args.difuso, args.umbral)
+        escribir_instantanea(emparejador, archivo, huella_de_origen(args.almacen, args.carpeta), variantes)
+
+    if args.info or not args.construir:
+        encabezado = leer_encabezado(archivo)
+        if encabezado is None:
+            raise SystemExit('no hay una instantánea en {}'.format(archivo))
+        print(json.dumps(encabezado, ensure_ascii=False, indent=2))
+        print('vigente' if vigente(encabezado, huella_de_origen(args.almacen, args.carpeta), args.difuso, args.umbral)
+              else 'ya no corresponde a los datos de INALI')
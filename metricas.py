@@ -0,0 +1,131 @@
+# métricas baratas para los dos scripts: contadores y cronómetros en memoria, y un resumen al final de la corrida
+# como JSON o como un "textfile" de Prometheus (según la extensión del archivo), en vez de un log INFO por cada row
+# uso:
+#   from metricas import metricas
+#   metricas.contar('marc_registros_total')
+#   metricas.contar('marc_encontrados_total', campo='650')
+#   with metricas.medir('inali_parseo_segundos', pagina='variantes'):
+#       ...
+#   metricas.escribir('logs/metricas_MARC.prom')
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+def _llave(nombre, etiquetas):
+    return (nombre, tuple(sorted(etiquetas.items())))
+
+
+class Metricas:
+    '''contadores y cronómetros con etiquetas; se pueden usar desde varios hilos'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self.lock:
+            self.contadores = {}
+            self.cronometros = {}  # llave -> [suma, número, mínimo, máximo]
+            self.inicio = time.time()
+
+    def contar(self, nombre, cantidad=1, **etiquetas):
+        llave = _llave(nombre, etiquetas)
+        with self.lock:
+            self.contadores[llave] = self.contadores.get(llave, 0) + cantidad
+
+    def observar(self, nombre, segundos, **etiquetas):
+        llave = _llave(nombre, etiquetas)
+        with self.lock:
+            cronometro = self.cronometros.get(llave)
+            if cronometro is None:
+                self.cronometros[llave] = [segundos, 1, segundos, segundos]
+            else:
+                cronometro[0] += segundos
+                cronometro[1] += 1
+                cronometro[2] = min(cronometro[2], segundos)
+                cronometro[3] = max(cronometro[3], segundos)
+
+    @contextmanager
+    def medir(self, nombre, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def valor(self, nombre, **etiquetas):
+        return self.contadores.get(_llave(nombre, etiquetas), 0)
+
+    def instantanea(self):
+        '''una copia que se puede mandar entre procesos (ver sumar)'''
+        with self.lock:
+            return {'contadores': dict(self.contadores),
+                    'cronometros': {llave: list(valores) for llave, valores in self.cronometros.items()}}
+
+    def sumar(self, instantanea):
+        '''agregar las métricas de otro proceso a estas'''
+        for llave, cantidad in instantanea['contadores'].items():
+            self.contar(llave[0], cantidad, **dict(llave[1]))
+        with self.lock:
+            for llave, (suma, numero, minimo, maximo) in instantanea['cronometros'].items():
+                cronometro = self.cronometros.setdefault(llave, [0.0, 0, minimo, maximo])
+                cronometro[0] += suma
+                cronometro[1] += numero
+                cronometro[2] = min(cronometro[2], minimo)
+                cronometro[3] = max(cronometro[3], maximo)
+
+    def resumen(self):
+        '''todas las métricas como un dict que se puede escribir como JSON'''
+        def nombre_con_etiquetas(llave):
+            nombre, etiquetas = llave
+            if not etiquetas:
+                return nombre
+            return '{}{{{}}}'.format(nombre, ','.join('{}="{}"'.format(k, v) for k, v in etiquetas))
+
+        with self.lock:
+            return {
+                'duracion_segundos': time.time() - self.inicio,
+                'contadores': {nombre_con_etiquetas(llave): cantidad for llave, cantidad in sorted(self.contadores.items())},
+                'cronometros': {nombre_con_etiquetas(llave): {'suma': suma, 'numero': numero, 'minimo': minimo,
+                                                               'maximo': maximo, 'promedio': suma / numero}
+                                for llave, (suma, numero, minimo, maximo) in sorted(self.cronometros.items())}
+            }
+
+    def prometheus(self):
+        '''el formato de texto de Prometheus, para el textfile collector de node_exporter'''
+        def etiquetas_de(etiquetas):
+            if not etiquetas:
+                return ''
+            return '{{{}}}'.format(','.join('{}="{}"'.format(k, str(v).replace('"', '\\"')) for k, v in etiquetas))
+
+        lineas = []
+        with self.lock:
+            tipos_escritos = set()
+            for (nombre, etiquetas), cantidad in sorted(self.contadores.items()):
+                if nombre not in tipos_escritos:
+                    lineas.append('# TYPE {} counter'.format(nombre))
+                    tipos_escritos.add(nombre)
+                lineas.append('{}{} {}'.format(nombre, etiquetas_de(etiquetas), cantidad))
+            for (nombre, etiquetas), (suma, numero, _, _) in sorted(self.cronometros.items()):
+                if nombre not in tipos_escritos:
+                    lineas.append('# TYPE {} summary'.format(nombre))
+                    tipos_escritos.add(nombre)
+                lineas.append('{}_sum{} {}'.format(nombre, etiquetas_de(etiquetas), suma))
+                lineas.append('{}_count{} {}'.format(nombre, etiquetas_de(etiquetas), numero))
+        return '\n'.join(lineas) + '\n'
+
+    def escribir(self, archivo):
+        '''escribir el resumen: formato Prometheus si el archivo termina en .prom, JSON si no'''
+        contenido = self.prometheus() if archivo.endswith('.prom') else json.dumps(self.resumen(), indent=2)
+        with open(archivo + '.tmp', 'w') as outf:
+            outf.write(contenido)
+        # el textfile collector no debe leer un archivo a medias
+        os.replace(archivo + '.tmp', archivo)
+
+
+# las métricas de este proceso
+metricas = Metricas()
@@ -0,0 +1,19 @@
+# la normalización de nombres que comparten el emparejador difuso, el índice geográfico y la reconciliación del CLIN:
+# sin mayúsculas, acentos, diacríticos ni apóstrofos, así que "Kʼicheʼ" = "K'iche'" y "OAXACA" = "Oaxaca"
+# uso:
+#   from normalizacion import normalizar
+#   normalizar('Santa María Huazolotitlán')   -> 'santa maria huazolotitlan'
+
+import re
+import unicodedata
+
+
+# los distintos apóstrofos que aparecen en los nombres de INALI y en el catálogo; los quitamos del todo
+apostrofos = re.compile("['’‘ʼʻ`´]")
+
+
+def normalizar(texto):
+    '''minúsculas, sin acentos ni diacríticos (NFKD sin las marcas combinantes) y sin apóstrofos'''
+    descompuesto = unicodedata.normalize('NFKD', texto.casefold())
+    sin_marcas = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return apostrofos.sub('', sin_marcas)
@@ -0,0 +1,245 @@
+# leer registros MARC de un archivo, un registro completo a la vez
+# cada registro es su index y sus rows, con la forma del CSV del catálogo:
+#   [index, campo, indicadores, código, valor, código, valor, ...]
+# por ejemplo ['1', '150', '  ', 'a', 'Náhuatl (Idioma)', '', '', ...]
+# los campos de control (LDR, 001-009) no tienen subcampos: ['1', '001', ' ', '', '989533732102716']
+# leemos el CSV del catálogo, MARC binario (ISO 2709) y MARCXML, y los tres producen los mismos rows
+# nunca tenemos más que un registro en memoria, así que sirve para archivos de varios GB
+
+import os
+import csv
+import logging
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+from metricas import metricas
+
+
+logger = logging.getLogger('scrape_INALI')
+
+
+RegistroMARC = namedtuple('RegistroMARC', ['index', 'rows'])
+
+
+def agrupar_registros(rows):
+    '''juntar los rows en registros: un registro nuevo empieza cuando cambia el index en la primera columna'''
+    index = None
+    registro = []
+    for row in rows:
+        if not row:
+            continue
+        if row[0] != index:
+            if registro:
+                yield RegistroMARC(index, registro)
+            index = row[0]
+            registro = []
+        registro.append(row)
+
+    # el último registro también
+    if registro:
+        yield RegistroMARC(index, registro)
+
+
+def lineas_entre(archivo, inicio, fin):
+    '''las líneas (ya decodificadas) que empiezan entre los bytes [inicio, fin) del archivo'''
+    with open(archivo, 'rb') as marcs:
+        marcs.seek(inicio)
+        posicion = inicio
+        while fin is None or posicion < fin:
+            linea = marcs.readline()
+            if not linea:
+                break
+            posicion += len(linea)
+            yield linea.decode('utf8')
+
+
+def leer_registros_csv(archivo, inicio=0, fin=None):
+    '''
+    un generator de los registros de un CSV del catálogo
+    con inicio y fin solamente leemos ese fragmento del archivo (ver dividir_en_fragmentos)
+    '''
+    if inicio == 0 and fin is None:
+        with open(archivo, 'r', newline='') as marcs:
+            yield from agrupar_registros(csv.reader(marcs))
+    else:
+        yield from agrupar_registros(csv.reader(lineas_entre(archivo, inicio, fin)))
+
+
+def _index_de_linea(linea):
+    return linea.split(b',', 1)[0]
+
+
+def _inicio_de_registro(marcs, posicion):
+    '''el primer byte, desde posicion, donde empieza un registro (donde cambia el index de la columna 0)'''
+    if posicion == 0:
+        return 0
+
+    # terminamos la línea en la que cae posicion; si posicion ya es el inicio de una línea, nos quedamos ahí
+    marcs.seek(posicion - 1)
+    marcs.readline()
+    inicio = marcs.tell()
+    primera = marcs.readline()
+    if not primera:
+        return inicio
+
+    index = _index_de_linea(primera)
+    inicio += len(primera)
+    for linea in iter(marcs.readline, b''):
+        if _index_de_linea(linea) != index:
+            return inicio
+        inicio += len(linea)
+    return inicio
+
+
+def dividir_en_fragmentos(archivo, numero):
+    '''
+    dividir el archivo en hasta "numero" fragmentos de bytes [inicio, fin) de más o menos el mismo tamaño,
+    alineados con el inicio de un registro, así que ningún registro queda partido entre dos fragmentos.
+    NOTA: presupone que ningún valor del CSV tiene un newline adentro
+    '''
+    tamano = os.path.getsize(archivo)
+    with open(archivo, 'rb') as marcs:
+        limites = sorted({_inicio_de_registro(marcs, tamano * i // numero) for i in range(numero)} | {tamano})
+    return [(inicio, fin) for inicio, fin in zip(limites, limites[1:]) if fin > inicio]
+
+
+# los separadores de ISO 2709
+fin_de_campo = b'\x1e'
+fin_de_registro = b'\x1d'
+delimitador_de_subcampo = b'\x1f'
+
+
+def _codificacion(index, datos):
+    '''
+    la posición 09 del leader dice 'a' para UTF-8; si no, el registro está en MARC-8 (aunque muchos "MARC-8" en
+    realidad son UTF-8). MARC-8 no lo sabemos decodificar, así que un registro que no es UTF-8 lo leemos como latin-1
+    para no perderlo, pero sus acentos salen mal y puede que no encontremos sus datos de INALI: lo avisamos en el log
+    y lo contamos en marc_registros_no_utf8_total
+    '''
+    if datos[9:10] == b'a':
+        return 'utf8'
+    try:
+        datos.decode('utf8')
+        return 'utf8'
+    except UnicodeDecodeError:
+        logger.warning('el registro {} no es UTF-8 (el leader dice MARC-8); lo leemos como latin-1'.format(index))
+        metricas.contar('marc_registros_no_utf8_total')
+        return 'latin-1'
+
+
+def _rows_de_iso2709(index, datos):
+    '''los rows de un registro ISO 2709 (los bytes de un registro completo)'''
+    leader = datos[:24]
+    base = int(leader[12:17])
+    directorio = datos[24:datos.index(fin_de_campo, 24)]
+    codificacion = _codificacion(index, datos)
+
+    def _decodificar(parte):
+        return parte.decode(codificacion, errors='replace')
+
+    rows = [[index, 'LDR', ' ', '', _decodificar(leader)]]
+    for i in range(0, len(directorio) - len(directorio) % 12, 12):
+        campo = directorio[i:i + 3].decode('ascii')
+        largo = int(directorio[i + 3:i + 7])
+        inicio = base + int(directorio[i + 7:i + 12])
+        contenido = datos[inicio:inicio + largo].rstrip(fin_de_campo)
+
+        if campo < '010':
+            rows.append([index, campo, ' ', '', _decodificar(contenido)])
+            continue
+
+        partes = contenido.split(delimitador_de_subcampo)
+        row = [index, campo, _decodificar(partes[0])]
+        for parte in partes[1:]:
+            if parte:
+                subcampo = _decodificar(parte)
+                row.extend([subcampo[0], subcampo[1:]])
+        rows.append(row)
+    return rows
+
+
+def leer_registros_iso2709(archivo):
+    '''
+    un generator de los registros de un archivo MARC binario (ISO 2709)
+    leemos el largo de cada registro de sus primeros 5 bytes y luego solamente ese registro
+    '''
+    with open(archivo, 'rb') as marcs:
+        numero = 0
+        while True:
+            largo = marcs.read(5)
+            if not largo.strip():
+                break
+            datos = largo + marcs.read(int(largo) - 5)
+            numero += 1
+            yield RegistroMARC(str(numero), _rows_de_iso2709(str(numero), datos))
+
+
+def _nombre_local(elemento):
+    '''el nombre de un elemento sin su namespace: '{http://www.loc.gov/MARC21/slim}record' -> 'record' '''
+    return elemento.tag.rsplit('}', 1)[-1]
+
+
+def leer_registros_marcxml(archivo):
+    '''
+    un generator de los registros de un archivo MARCXML, con iterparse
+    después de usar cada <record> vaciamos la raíz (el <collection>): elemento.clear() vacía el registro pero lo deja
+    colgado de la raíz, y con millones de registros esos elementos vacíos también llenan la memoria
+    '''
+    numero = 0
+    raiz = None
+    for evento, elemento in ET.iterparse(archivo, events=('start', 'end')):
+        if evento == 'start':
+            if raiz is None:
+                raiz = elemento
+            continue
+        if _nombre_local(elemento) != 'record':
+            continue
+
+        numero += 1
+        index = str(numero)
+        rows = []
+        for campo in elemento:
+            nombre = _nombre_local(campo)
+            if nombre == 'leader':
+                rows.append([index, 'LDR', ' ', '', campo.text or ''])
+            elif nombre == 'controlfield':
+                rows.append([index, campo.get('tag'), ' ', '', campo.text or ''])
+            elif nombre == 'datafield':
+                row = [index, campo.get('tag'), campo.get('ind1', ' ') + campo.get('ind2', ' ')]
+                for subcampo in campo:
+                    row.extend([subcampo.get('code', ''), subcampo.text or ''])
+                rows.append(row)
+
+        elemento.clear()
+        if raiz is not elemento:
+            raiz.clear()
+        yield RegistroMARC(index, rows)
+
+
+# cómo reconocemos el formato de un archivo por su extensión
+formatos_por_extension = {
+    '.csv': 'csv',
+    '.mrc': 'iso2709',
+    '.marc': 'iso2709',
+    '.iso': 'iso2709',
+    '.dat': 'iso2709',
+    '.xml': 'marcxml'
+}
+
+lectores = {
+    'csv': leer_registros_csv,
+    'iso2709': leer_registros_iso2709,
+    'marcxml': leer_registros_marcxml
+}
+
+
+def formato_de(archivo):
+    extension = os.path.splitext(archivo)[1].lower()
+    if extension not in formatos_por_extension:
+        raise ValueError('no sabemos el formato de {}; usa uno de {}'.format(archivo, sorted(lectores)))
+    return formatos_por_extension[extension]
+
+
+def leer_registros(archivo, formato=None):
+    '''los registros de un archivo en cualquiera de nuestros formatos (por defecto según la extensión)'''
+    return lectores[formato or formato_de(archivo)](archivo)
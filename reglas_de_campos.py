@@ -0,0 +1,95 @@
+# qué campos y subcampos de un registro MARC revisamos al buscar los datos de INALI
+# antes revisábamos cada celda de cada row (menos el 001): el LDR, el 008, los indicadores, números de control como
+# el 035 y campos locales como el 902 o el 907. eso es trabajo perdido, y los nombres cortos de INALI chocan con códigos
+# una especificación es una lista separada por comas de campos, con "X" como comodín, y opcionalmente sus subcampos:
+#   041,1XX$axz,4XX$axz,5XX$axz,65X$axz,546
+# revisa todo el 041 y el 546, y solamente los subcampos a, x y z de los 1XX, 4XX, 5XX y 65X (las materias).
+# el 670 al 68X no: son citas de las fuentes y notas ("Dicc. de la lengua española, 12 mayo 2008"), no encabezamientos.
+# si varias reglas corresponden a un campo, gana la más específica (546 antes que 5XX). "todos" revisa todos los campos
+# uso:
+#   from reglas_de_campos import ReglasDeCampos
+#   reglas = ReglasDeCampos('6XX$avxyz,546')
+#   reglas.subcampos_de('650')  # -> frozenset({'a', 'v', 'x', 'y', 'z'})
+#   reglas.subcampos_de('035')  # -> None, el campo no se revisa
+
+import re
+
+
+especificacion_por_defecto = '041,1XX$axz,4XX$axz,5XX$axz,65X$axz,546'
+
+# estos nunca los revisamos: el leader no tiene nombres y el 001 es la id del sistema
+campos_sin_nombres = ('LDR', '001')
+
+patron_de_regla = re.compile(r'^([0-9X]{3})(?:\$([0-9a-z]+))?$')
+
+
+class TodosLosSubcampos:
+    '''los subcampos de un campo que revisamos entero'''
+
+    def __contains__(self, codigo):
+        return True
+
+    def __repr__(self):
+        return 'TodosLosSubcampos()'
+
+
+todos_los_subcampos = TodosLosSubcampos()
+
+
+class ReglasDeCampos:
+    '''
+    @especificacion: p.ej. '041,1XX$axz,546' (ver arriba); una especificación mal escrita echa ValueError
+    la decisión de cada campo se guarda, así que un registro cuesta un dict lookup por row
+    '''
+
+    def __init__(self, especificacion=especificacion_por_defecto):
+        self.reglas = []  # (patrón, subcampos o todos_los_subcampos)
+        for parte in especificacion.split(','):
+            parte = parte.strip()
+            if not parte:
+                continue
+            if parte.lower() == 'todos':
+                self.reglas.append(('XXX', todos_los_subcampos))
+                continue
+            encontrado = patron_de_regla.match(parte.upper()[:3] + parte[3:])
+            if not encontrado:
+                raise ValueError('"{}" no es una regla de campo (p.ej. 650, 6XX o 6XX$axz)'.format(parte))
+            patron, subcampos = encontrado.groups()
+            self.reglas.append((patron, frozenset(subcampos) if subcampos else todos_los_subcampos))
+        if not self.reglas:
+            raise ValueError('hace falta por lo menos una regla de campo')
+        self.especificacion = ','.join(
+            patron + ('$' + ''.join(sorted(subcampos)) if subcampos is not todos_los_subcampos else '')
+            for patron, subcampos in self.reglas)
+        self._por_campo = {}
+
+    def __repr__(self):
+        return 'ReglasDeCampos({!r})'.format(self.especificacion)
+
+    def __eq__(self, otras):
+        return isinstance(otras, ReglasDeCampos) and self.especificacion == otras.especificacion
+
+    def __hash__(self):
+        return hash(self.especificacion)
+
+    def huella(self):
+        '''con otras reglas encontramos otras cosas (ver huella_de_la_busqueda en comparar_registros_MARC.py)'''
+        return self.especificacion
+
+    def subcampos_de(self, campo):
+        '''los subcampos que revisamos en este campo (algo con "in"), o None si no revisamos el campo'''
+        try:
+            return self._por_campo[campo]
+        except KeyError:
+            pass
+
+        subcampos = None
+        if campo not in campos_sin_nombres:
+            especificidad = -1
+            for patron, de_la_regla in self.reglas:
+                if len(campo) == 3 and all(p == 'X' or p == c for p, c in zip(patron, campo)):
+                    if 3 - patron.count('X') > especificidad:
+                        especificidad = 3 - patron.count('X')
+                        subcampos = de_la_regla
+        self._por_campo[campo] = subcampos
+        return subcampos
@@ -4,19 +4,29 @@
 # versión actualizado 7/11/20
 
 import os
-import bs4
+import re
 import json
-import requests
+import time
+import argparse
+import threading
 import logging
 import logging.config
 from collections import Counter
-
-# cada vez que hacemos una toca al inali.cob.mx, recibimos una alarma así:
-# "InsecureRequestWarning: Unverified HTTPS request is being made. Adding certificate verification is strongly advised."
-# creo q los certificados de INALI se han caducado
-# por no ver la alarma cada vez que agarramos un vínculo de INALI, la deshabilitamos aquí
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from functools import partial
+from functools import lru_cache
+from urllib.parse import urlsplit
+from cache_de_paginas import CacheDePaginas, PaginaNoEnCache, importar_requests
+from cola_de_trabajo import Tarea, ColaDeTrabajo, DiarioDelCrawl, archivo_del_diario
+from almacen_INALI import escribir_almacen, archivo_del_almacen
+from indice_geografico import escribir_indice, archivo_del_indice
+from metricas import metricas
+
+# lxml es mucho más rápido que el 'html.parser' de python, pero no siempre está instalado
+try:
+    import lxml  # noqa: F401
+    parser_rapido = 'lxml'
+except ImportError:
+    parser_rapido = 'html.parser'
 
 
 # configuración de logging
@@ -57,6 +67,9 @@ logging_config = {
     }
 }
 
+# el logger tiene que existir también cuando importamos este módulo desde otro lugar
+logger = logging.getLogger('scrape_INALI')
+
 
 # aquí tenemos nuestro modelo de datos para cada representación de un variante en su JSON file
 modelo_de_representacion_JSON = {
@@ -67,14 +80,40 @@ modelo_de_representacion_JSON = {
     'representación_geográfica': [{}]  # esta es una lista de dictionaries porque un variante puede ser hablado en estados múltiples
 }
 
-# aquí tenemos los URLs, agrupacions, or variantes que ahora son problemáticos (están echando Excepciones)
-datos_problematicos = {
-    'urls': ['https://www.inali.gob.mx/clin-inali/html/l_mazahua.html', 'https://www.inali.gob.mx/clin-inali/html/l_qanjobal.html'],
-    'agrupaciones': ['Chuj', 'kiliwa'],
-    'variantes': ['otomí de Ixtenco', 'otomí de Tilapa o del sur', 'zapoteco de San Felipe Tejalápam']
+# súbelo cuando cambie lo que sacamos de una página: los datos parseados que guardamos en el cache
+# (ver datos_ya_parseados) con otra versión ya no sirven aunque la página no haya cambiado
+version_del_parseo = 1
+
+# bs4 y requests tardan más en importarse que todo lo demás, y solamente los usa el crawl, no quien importa
+# este módulo por output_variante_json (p.ej. sacar_datos_del_CLIN.py); los importamos la primera vez que hacen falta
+# (requests con importar_requests, en cache_de_paginas.py)
+@lru_cache(maxsize=None)
+def _bs4():
+    import bs4
+    return bs4
+
+
+# las únicas etiquetas que nuestras funciones de extraer buscan en cada tipo de página
+etiquetas_de_pagina = {
+    'base': ['tr'],  # get_agrup_urls
+    'agrupacion': ['h4', 'a'],  # sacar_agrup_y_familia y el vínculo a los variantes
+    'variantes': ['tr']  # sacar_autodes, sacar_variante, parse_datos_geos
 }
 
 
+def hacer_sopa(texto, pagina, rapido=False):
+    '''
+    @pagina: una de las llaves de etiquetas_de_pagina
+    @rapido: si es True solamente construimos las etiquetas que necesitamos (con lxml si está instalado);
+             si no, parseamos la página entera con 'html.parser' como siempre
+    '''
+    bs4 = _bs4()
+    with metricas.medir('inali_parseo_segundos', pagina=pagina):
+        if rapido:
+            return bs4.BeautifulSoup(texto, parser_rapido, parse_only=bs4.SoupStrainer(etiquetas_de_pagina[pagina]))
+        return bs4.BeautifulSoup(texto, 'html.parser')
+
+
 def get_agrup_urls(caldo, base_url):
     '''
     por suerte todos los vínculos de agrupaciones lingüísticas
@@ -107,8 +146,8 @@ def sacar_agrup_y_familia(sopa):
     }
 
     for key, value in ling_indexes.items():
-        ling_querido = sopa.body.h4.contents[value].split(':')[-1].strip()
-        logger.info('ha sacado el dato tipo {} de la sopa HTML: {}'.format(key, ling_querido))
+        ling_querido = sopa.find('h4').contents[value].split(':')[-1].strip()
+        logger.debug('ha sacado el dato tipo %s de la sopa HTML: %s', key, ling_querido)
         ling_queridos.append(ling_querido)
     return ling_queridos
 
@@ -140,20 +179,31 @@ def sacar_autodes(td):
             autode = [pstrings[i-1], pstrings[i]]
             autodes.append(autode)
 
-    logger.info('autodenominaciones extraidos del table: {}'.format(autodes))
+    logger.debug('autodenominaciones extraidos del table: %s', autodes)
     return autodes
 
 
+# restos de los "<" y ">" escritos como entidades de HTML mal formadas: una página de INALI tiene
+# "&altzapoteco de la Sierra sur, noreste" en vez de "<zapoteco de la Sierra sur, noreste>"
+patron_de_entidades_rotas = re.compile(r'^&a?lt;?|&gt;?$')
+
+
+def limpiar_nombre(nombre):
+    '''un nombre (variante, agrupación, familia) sin los "<>" que lo rodean, restos de entidades ni espacios de más'''
+    nombre = patron_de_entidades_rotas.sub('', nombre.strip().strip('<>').strip())
+    return ' '.join(nombre.split())
+
+
 def sacar_variante(td):
     '''@td: debe ser el mismo table que tiene las autodenominaciones'''
-    variante = td.contents[-1].strip()
-    variante = variante.strip('<>')
-    logger.info('variante extraido del table: {}'.format(variante))
+    variante = limpiar_nombre(td.contents[-1])
+    logger.debug('variante extraido del table: %s', variante)
     return variante
 
 
 def parse_datos_geos(datos_geos):
     '''@datos_geo debe ser un table de HTML'''
+    bs4 = _bs4()
     repr_geo = {}
 
     for parte in datos_geos:
@@ -167,7 +217,9 @@ def parse_datos_geos(datos_geos):
 
         # luego, si el parte tiene los bold HTML tags "<br></br>"
         # es otro tipo de bs4 object of class 'bs4.element.Tag'
-        if parte.__class__ == bs4.element.Tag and parte.decode() != '<br/>':
+        # (parte.name == 'br' sin atributos es lo mismo que parte.decode() == '<br/>', sin construir el string)
+        es_linebreak = parte.__class__ == bs4.element.Tag and parte.name == 'br' and not parte.attrs
+        if parte.__class__ == bs4.element.Tag and not es_linebreak:
             municipio = parte.text
             repr_geo[estado][municipio] = []
 
@@ -180,22 +232,22 @@ def parse_datos_geos(datos_geos):
         # si hay multiples estados en los que se hablan la misma variante
         # van a ser separados por "linebreaks". entonces usamos el linebreak
         # como un flag para identificar que hay que construir otro repr_geo nuevo
-        if parte.__class__ == bs4.element.Tag and parte.decode() == '<br/>':
+        if es_linebreak:
             yield repr_geo
             repr_geo = {}
 
     # yield el último
-    logger.info('hemos extraido todos los datos geográficos de este table')
+    logger.debug('hemos extraido todos los datos geográficos de este table')
     yield repr_geo
 
 
-def output_variante_json(datos):
+def output_variante_json(datos, carpeta='agrupaciones_de_INALI'):
     '''construir un filename del nombre de variante y escribir los datos a un archivo de JSON'''
     variante_split = datos['variante'].strip('<>').split(' ')
     datos_file_ending = ('_').join([vsplit.strip(',') for vsplit in variante_split])
 
     # crear una carpeta por la agrupación si no existe
-    outpath = os.path.join('agrupaciones_de_INALI', '_'.join(datos['agrupacion_lingüística'].split(' ')))
+    outpath = os.path.join(carpeta, '_'.join(datos['agrupacion_lingüística'].split(' ')))
     try:
         os.makedirs(outpath)
         logger.info('carpeta {} creado'.format(outpath))
@@ -203,106 +255,426 @@ def output_variante_json(datos):
         pass
 
     outfile = os.path.join(outpath, 'datos_de_{}.json'.format(datos_file_ending))
-    logger.info('escribiendo los datos del variante {} a "{}"'.format(datos_file_ending, outfile))
+    contenido = json.dumps(datos)
+
+    # si el archivo ya tiene exactamente estos datos (p.ej. la página de INALI no cambió) no lo reescribimos
+    try:
+        with open(outfile, 'r') as inf:
+            if inf.read() == contenido:
+                logger.debug('los datos del variante %s no han cambiado en "%s"', datos_file_ending, outfile)
+                return False
+    except FileNotFoundError:
+        pass
+
+    logger.debug('escribiendo los datos del variante %s a "%s"', datos_file_ending, outfile)
     with open(outfile, 'w') as outf:
-        outf.write(json.dumps(datos))
+        outf.write(contenido)
+    return True
 
 
-if __name__ == '__main__':
-    # configuración de logging
-    logging.config.dictConfig(logging_config)
-    logger = logging.getLogger('scrape_INALI')
-    logger.info('* * * * * * * * * * * * * * * * *')
-    logger.info('logging configured')
+def crear_sesion(max_conexiones=10):
+    '''
+    una sesión de requests que guarda sus conexiones en un "pool",
+    así que no pagamos un handshake TCP+TLS nuevo por cada página de INALI
+    '''
+    requests = importar_requests()
+    sesion = requests.Session()
+    sesion.verify = False
+    adaptador = requests.adapters.HTTPAdapter(pool_connections=max_conexiones, pool_maxsize=max_conexiones)
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    return sesion
 
-    # inicar nuestro objecto de contar
-    numeros_de_datos = Counter()
 
-    # esto es el URL donde se encuentra todos los vínculos de las agrupaciones lingüísticas
-    # ver aquí más detalle sobre "verify" y certificates:
-    # https://stackoverflow.com/questions/28667684/python-requests-getting-sslerror
-    base_url = 'https://www.inali.gob.mx/clin-inali/'
+class LimitadorDeRitmo:
+    '''
+    limita las peticiones a no más de "por_segundo" por host, para no molestar a INALI.
+    se puede compartir entre varios hilos: cada hilo reserva su turno con el lock
+    y luego duerme afuera del lock hasta que llega su turno
+    '''
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0.0
+        self.proximos_turnos = {}
+        self.lock = threading.Lock()
+
+    def esperar(self, url):
+        if not self.intervalo:
+            return
+
+        host = urlsplit(url).netloc
+        with self.lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self.proximos_turnos.get(host, ahora))
+            self.proximos_turnos[host] = turno + self.intervalo
+
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+
+def bajar_pagina(url, sesion=None, limitador=None, cache=None):
+    '''
+    bajar el texto de una página de INALI
+    sin sesión usamos requests.get() como siempre; con sesión reutilizamos sus conexiones
+    con un cache (ver cache_de_paginas.py) solamente bajamos las páginas que han cambiado
+    '''
+    if cache:
+        return cache.bajar(url, sesion=sesion, limitador=limitador)
+
+    if limitador:
+        limitador.esperar(url)
+
+    with metricas.medir('inali_fetch_segundos'):
+        if sesion:
+            r = sesion.get(url, verify=False)
+        else:
+            r = importar_requests().get(url, verify=False)
+    metricas.contar('inali_paginas_bajadas_total')
+    metricas.contar('inali_bytes_bajados_total', len(r.content))
+    r.raise_for_status()
+    return r.text
+
+
+def sacar_agrupacion(agrup_url, base_url, bajar=bajar_pagina, rapido=False):
+    '''
+    bajar y parsear la página l_<agrupación>.html
+    regresa la agrupación lingüística, la familia lingüística y el vínculo a la página de sus variantes
+    '''
+    # empezamos en esta página (l_<variante>.html) para agarrar
+    # la información de Agrupación y Familia Lingüística
+    logger.info('sacando datos de {}'.format(agrup_url))
+    sopa = hacer_sopa(bajar(agrup_url), 'agrupacion', rapido)
+    agrup_ling, familia_ling = sacar_agrup_y_familia(sopa)
+
+    # construimos el vínculo de la agrupación
+    var_url = ''.join([base_url, 'html/', sopa.find('a').attrs['href']])
+    return agrup_ling, familia_ling, var_url
+
+
+def sacar_filas_de_variantes(var_url, agrup_ling, bajar=bajar_pagina, rapido=False):
+    '''bajar y parsear la página de los variantes de una agrupación; regresa las rows <tr></tr> de los variantes'''
+    logger.debug('ya bajamos un nivel para sacar los datos de los variantes de %s', var_url)
+    guisado = hacer_sopa(bajar(var_url), 'variantes', rapido)
+
+    # los datos específicos que buscamos aparacen
+    # entre los "rows" <tr></tr> tags que hay en una página
+    # por ejemplo la página de nahuatl tiene 30 rows de contenido relevante
+    all_trs = guisado.find_all('tr')
+    all_trs.pop(0)  # (la primera row (representado por all_trs[0]) no nos importa porque no tiene un table)
+    logger.info('hay {} variante(s) en esta agrupación lingüística: {}'.format(len(all_trs), agrup_ling))
+    return all_trs
+
+
+def sacar_datos_de_fila(tr, agrup_ling, familia_ling):
+    '''los datos de un variante de su row <tr></tr> en el modelo de JSON'''
+    # más específicamente, los datos del los lenguajes quedan dentro
+    # de los tables que así mismos están dentro de un "row"
+    # es decir, encontramos los datos que nos interesa entre los tags <td></td>
+    all_tds = tr.find_all('td')
+    # el primer table contiene las autdenominaciones y el nombre de variante
+    autodes = sacar_autodes(all_tds[0])
+    variante = sacar_variante(all_tds[0])
+
+    # seguimos con los datos geográficos, que están en el segundo table
+    gdatos = all_tds[1]
+    repr_geo = [geo for geo in parse_datos_geos(gdatos) if geo]
+
+    # ya podemos usar nuestro modelo de JSON para colocar los datos
+    return {
+        'agrupacion_lingüística': agrup_ling,
+        'familia_lingüística': familia_ling,
+        'autodenominaciones': autodes,
+        'variante': variante,
+        'representación_geográfica': repr_geo
+    }
+
+
+def clave_de_variante(agrup_url, posicion):
+    return '{}#{}'.format(agrup_url, posicion)
+
+
+def huellas_de_paginas(cache, *urls):
+    '''la versión del parseo y el sha256 de cada página en el cache: si nada de eso cambió, los datos tampoco'''
+    return [version_del_parseo] + [cache.huella(url) for url in urls]
 
-    # sacamos todos los URLs de agrupaciones lingüísticas que hay en el base_url
-    r = requests.get(base_url, verify=False)
-    caldo = bs4.BeautifulSoup(r.text, 'html.parser')
-    agrup_urls = get_agrup_urls(caldo, base_url)
 
+def tarea_de_variante(agrup_url, posicion, tr, agrup_ling, familia_ling, carpeta, cache=None, huellas=None):
+    '''sacar los datos de una row de variante y escribir su archivo de JSON'''
+    datos = sacar_datos_de_fila(tr, agrup_ling, familia_ling)
+    if cache:
+        cache.guardar_parseado(clave_de_variante(agrup_url, posicion), huellas, datos)
+    escrito = output_variante_json(datos, carpeta=carpeta)
+    return {'url': agrup_url, 'posicion': posicion, 'datos': datos, 'escrito': escrito}, []
+
+
+def tarea_de_variante_parseada(agrup_url, posicion, datos, carpeta):
+    '''escribir el archivo de JSON de un variante con los datos que ya sacamos de las mismas páginas en otro crawl'''
+    escrito = output_variante_json(datos, carpeta=carpeta)
+    return {'url': agrup_url, 'posicion': posicion, 'datos': datos, 'escrito': escrito}, []
+
+
+def datos_ya_parseados(agrup_url, bajar, cache):
+    '''
+    si las páginas de una agrupación tienen el mismo sha256 en el cache que cuando las parseamos la última vez,
+    regresa (los datos de la agrupación, la lista de los datos de sus variantes) sin parsear nada; si no, None.
+    las páginas sí se bajan (con un GET condicional), porque así sabemos si cambiaron
+    '''
+    if cache is None:
+        return None
+    bajar(agrup_url)
+    agrupacion = cache.leer_parseado(agrup_url, huellas_de_paginas(cache, agrup_url))
+    if agrupacion is None:
+        return None
+    bajar(agrupacion['var_url'])
+    huellas = huellas_de_paginas(cache, agrup_url, agrupacion['var_url'])
+    variantes = [cache.leer_parseado(clave_de_variante(agrup_url, posicion), huellas)
+                 for posicion in range(agrupacion['variantes'])]
+    if any(datos is None for datos in variantes):
+        return None
+    return agrupacion, variantes
+
+
+def tarea_de_agrupacion(agrup_url, base_url, bajar, rapido, carpeta, terminadas, cache=None):
+    '''
+    bajar una agrupación y agregar a la cola una tarea por cada variante que todavía no está en el diario.
+    si sus páginas no cambiaron desde que las parseamos (ver datos_ya_parseados), no las parseamos otra vez
+    '''
+    # cada página se baja una sola vez por tarea, aunque haga falta parsearla después de revisar su huella
+    paginas = {}
+
+    def bajar_una_vez(url):
+        if url not in paginas:
+            paginas[url] = bajar(url)
+        return paginas[url]
+
+    ya_parseados = datos_ya_parseados(agrup_url, bajar_una_vez, cache)
+    if ya_parseados is not None:
+        agrupacion, variantes = ya_parseados
+        logger.debug('las páginas de %s no cambiaron; usamos los datos que ya sacamos', agrup_url)
+        metricas.contar('inali_agrupaciones_sin_parsear_total')
+        tareas_nuevas = [
+            Tarea('variante', clave_de_variante(agrup_url, posicion), tarea_de_variante_parseada,
+                  (agrup_url, posicion, datos, carpeta))
+            for posicion, datos in enumerate(variantes) if clave_de_variante(agrup_url, posicion) not in terminadas
+        ]
+        return {'url': agrup_url, 'agrupacion': agrupacion['agrupacion'], 'variantes': len(variantes)}, tareas_nuevas
+
+    agrup_ling, familia_ling, var_url = sacar_agrupacion(agrup_url, base_url, bajar_una_vez, rapido)
+    all_trs = sacar_filas_de_variantes(var_url, agrup_ling, bajar_una_vez, rapido)
+    huellas = None
+    if cache:
+        cache.guardar_parseado(agrup_url, huellas_de_paginas(cache, agrup_url), {
+            'agrupacion': agrup_ling, 'familia': familia_ling, 'var_url': var_url, 'variantes': len(all_trs)})
+        huellas = huellas_de_paginas(cache, agrup_url, var_url)
+    tareas_nuevas = [
+        Tarea('variante', clave_de_variante(agrup_url, posicion), tarea_de_variante,
+              (agrup_url, posicion, tr, agrup_ling, familia_ling, carpeta, cache, huellas))
+        for posicion, tr in enumerate(all_trs) if clave_de_variante(agrup_url, posicion) not in terminadas
+    ]
+    return {'url': agrup_url, 'agrupacion': agrup_ling, 'variantes': len(all_trs)}, tareas_nuevas
+
+
+def tareas_de_agrupaciones(agrup_urls, estados, terminadas, base_url, bajar, rapido, carpeta, cache=None):
+    '''las tareas de las agrupaciones que todavía tienen trabajo pendiente según el diario'''
+    tareas = []
     for agrup_url in agrup_urls:
-        # TEMPORARY:
-        if agrup_url in datos_problematicos['urls']:
-            logger.warning('esta vínculo echa una Exception: {}'.format(agrup_url))
-            logger.warning('seguimos con la próxima...')
+        entrada = estados.get(agrup_url)
+        if agrup_url in terminadas and (entrada['estado'] == 'fallido' or all(
+                clave_de_variante(agrup_url, posicion) in terminadas for posicion in range(entrada['variantes']))):
             continue
+        tareas.append(Tarea('agrupacion', agrup_url, tarea_de_agrupacion,
+                            (agrup_url, base_url, bajar, rapido, carpeta, terminadas, cache)))
 
-        # empezamos en esta página (l_<variante>.html) para agarrar
-        # la información de Agrupación y Familia Lingüística
-        logger.info('sacando datos de {}'.format(agrup_url))
-        r = requests.get(agrup_url, verify=False)
-        sopa = bs4.BeautifulSoup(r.text, 'html.parser')
-        agrup_ling, familia_ling = sacar_agrup_y_familia(sopa)
-
-        # TEMPORARY:
-        if agrup_ling in datos_problematicos['agrupaciones']:
-            logger.warning('esta agrupación echa una Exception: {}'.format(agrup_ling))
-            logger.warning('seguimos con la próxima')
-            continue
+    logger.info('{} de {} agrupaciones tienen trabajo pendiente'.format(len(tareas), len(agrup_urls)))
+    return tareas
 
-        # construimos el vínculo de la agrupación
-        var_url = ''.join([base_url, 'html/', sopa.body.a.attrs['href']])
-        logger.info('ya bajamos un nivel para sacar los datos de los variantes de {}'.format(var_url))
-        r = requests.get(var_url, verify=False)
-        guisado = bs4.BeautifulSoup(r.text, 'html.parser')
-
-        # los datos específicos que buscamos aparacen
-        # entre los "rows" <tr></tr> tags que hay en una página
-        # por ejemplo la página de nahuatl tiene 30 rows de contenido relevante
-        all_trs = guisado.find_all('tr')
-        all_trs.pop(0)  # (la primera row (representado por all_trs[0]) no nos importa porque no tiene un table)
-        logger.info('hay {} variante(s) en esta agrupación lingüística: {}'.format(len(all_trs), agrup_ling))
-
-        # más específicamente, los datos del los lenguajes quedan dentro
-        # de los tables que así mismos están dentro de un "row"
-        # es decir, encontramos los datos que nos interesa entre los tags <td></td>
-        for tr in all_trs:
-            all_tds = tr.find_all('td')
-            # el primer table contiene las autdenominaciones y el nombre de variante
-            autodes = sacar_autodes(all_tds[0])
-            variante = sacar_variante(all_tds[0])
-
-            # TEMPORARY:
-            if variante in datos_problematicos['variantes']:
-                logger.warning('este variante echa una Exception: {}'.format(variante))
-                logger.warning('seguimos con el próximo...')
-                continue
 
-            # seguimos con los datos geográficos, que están en el segundo table
-            gdatos = all_tds[1]
-            repr_geo = [geo for geo in parse_datos_geos(gdatos) if geo]
+def tarea_de_base(base_url, bajar, rapido, carpeta, estados, terminadas, cache=None):
+    '''
+    sacar todos los URLs de agrupaciones lingüísticas que hay en el base_url; el diario los guarda en orden.
+    si la página no cambió desde que la parseamos, los URLs salen del cache
+    '''
+    texto = bajar(base_url)
+    agrup_urls = cache.leer_parseado(base_url, huellas_de_paginas(cache, base_url)) if cache else None
+    if agrup_urls is None:
+        agrup_urls = get_agrup_urls(hacer_sopa(texto, 'base', rapido), base_url)
+        if cache:
+            cache.guardar_parseado(base_url, huellas_de_paginas(cache, base_url), agrup_urls)
+    return {'agrup_urls': agrup_urls}, tareas_de_agrupaciones(agrup_urls, estados, terminadas, base_url, bajar, rapido,
+                                                              carpeta, cache)
+
+
+def es_error_de_red(excepcion):
+    '''
+    si vale la pena reintentar una tarea: solamente los errores de la red (conexión, timeout, un 5xx del servidor).
+    un 404, una página que no está en el cache en el modo offline, o una Exception del parseo salen igual cada vez
+    '''
+    if isinstance(excepcion, PaginaNoEnCache):
+        return False
+    if isinstance(excepcion, (ConnectionError, TimeoutError)):
+        return True
+    requests = importar_requests()
+    if isinstance(excepcion, requests.HTTPError):
+        return excepcion.response is None or excepcion.response.status_code >= 500
+    return isinstance(excepcion, requests.RequestException)
+
+
+def crawl_con_diario(base_url, diario, carpeta, max_hilos=0, por_segundo=4.0, cache=None, rapido=False,
+                     reintentar_fallidos=False, intentos=4, espera_inicial=1.0):
+    '''
+    el crawl como una cola de trabajo de tareas (ver cola_de_trabajo.py): la página base,
+    una por cada agrupación y una por cada variante.
+    saltamos todo lo que el diario ya tiene como hecho (y como fallido, menos con reintentar_fallidos),
+    así que un crawl que se cayó a medias sigue donde se quedó.
+    con max_hilos=0 bajamos las páginas una por una como el crawl secuencial
+    '''
+    if max_hilos > 0:
+        bajar = partial(bajar_pagina, sesion=crear_sesion(max_conexiones=max_hilos), limitador=LimitadorDeRitmo(por_segundo), cache=cache)
+    else:
+        bajar = partial(bajar_pagina, cache=cache)
+
+    estados = diario.estados()
+    terminadas = {clave for clave, entrada in estados.items()
+                  if entrada['estado'] == 'hecho' or (entrada['estado'] == 'fallido' and not reintentar_fallidos)}
+
+    cola = ColaDeTrabajo(diario, max_hilos=max_hilos, intentos=intentos, espera_inicial=espera_inicial,
+                         reintentable=es_error_de_red)
+
+    # si ya tenemos la lista de agrupaciones en el diario no bajamos la página base otra vez
+    entrada = estados.get(base_url)
+    if entrada and entrada['estado'] == 'hecho':
+        for tarea in tareas_de_agrupaciones(entrada['agrup_urls'], estados, terminadas, base_url, bajar, rapido, carpeta, cache):
+            cola.agregar(tarea)
+    else:
+        cola.agregar(Tarea('base', base_url, tarea_de_base, (base_url, bajar, rapido, carpeta, estados, terminadas, cache)))
+
+    cola.correr()
 
-            # ya podemos usar nuestro modelo de JSON para colocar los datos
-            datos_del_variante = {
-                'agrupacion_lingüística': agrup_ling,
-                'familia_lingüística': familia_ling,
-                'autodenominaciones': autodes,
-                'variante': variante,
-                'representación_geográfica': repr_geo
-            }
 
-            # contar este variante
+def resultados_del_diario(diario, base_url):
+    '''
+    los datos de todos los variantes hechos, en el orden de las agrupaciones en la página base
+    y de sus rows (el mismo orden del crawl secuencial), y los números de datos contados del diario.
+    regresa (None, None) si no pudimos bajar la página base
+    '''
+    estados = diario.estados()
+    entrada = estados.get(base_url)
+    if not entrada or entrada['estado'] != 'hecho':
+        return None, None
+
+    orden_de_url = {agrup_url: i for i, agrup_url in enumerate(entrada['agrup_urls'])}
+    numeros_de_datos = Counter()
+    variantes = []
+
+    for entrada in estados.values():
+        if entrada['estado'] == 'fallido':
+            numeros_de_datos['tareas_fallidas'] += 1
+        elif entrada['tipo'] == 'agrupacion':
+            numeros_de_datos['agrupaciones'] += 1
+        elif entrada['tipo'] == 'variante' and entrada['url'] in orden_de_url:
+            variantes.append((orden_de_url[entrada['url']], entrada['posicion'], entrada['datos']))
             numeros_de_datos['variantes'] += 1
+            numeros_de_datos['archivos_escritos'] += entrada['escrito']
+
+    return [datos for _, _, datos in sorted(variantes, key=lambda variante: variante[:2])], numeros_de_datos
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='extraer los datos de las páginas de INALI')
+    parser.add_argument('--base-url', default='https://www.inali.gob.mx/clin-inali/',
+                        help='el URL con los vínculos de las agrupaciones (p.ej. un servidor local con páginas guardadas)')
+    parser.add_argument('--carpeta', default='agrupaciones_de_INALI', help='dónde escribimos los archivos de JSON')
+    parser.add_argument('--almacen', default=archivo_del_almacen, help='el almacén consolidado (SQLite) con todos los variantes')
+    parser.add_argument('--indice-geografico', default=archivo_del_indice,
+                        help='el índice de estado/municipio/localidad -> variantes')
+    parser.add_argument('--hilos', type=int, default=0,
+                        help='número de agrupaciones que bajamos a la vez; 0 significa el crawl secuencial de siempre')
+    parser.add_argument('--por-segundo', type=float, default=4.0,
+                        help='límite de peticiones por segundo por host en el modo concurrente (0 = sin límite)')
+    parser.add_argument('--cache', default='cache_de_INALI', help='carpeta del cache de páginas de INALI')
+    parser.add_argument('--sin-cache', action='store_true', help='bajar todas las páginas sin usar el cache')
+    parser.add_argument('--metricas', default=os.path.join('logs', 'metricas_INALI.json'),
+                        help='dónde escribir el resumen de métricas (JSON, o Prometheus si termina en .prom)')
+    parser.add_argument('--parseo-rapido', action='store_true',
+                        help='parsear solamente las etiquetas que usamos, con lxml si está instalado')
+    parser.add_argument('--diario', default=archivo_del_diario,
+                        help='el diario del crawl; si el último crawl no terminó, seguimos donde se quedó')
+    parser.add_argument('--desde-cero', action='store_true', help='ignorar el diario y empezar el crawl otra vez')
+    parser.add_argument('--reintentar-fallidos', action='store_true',
+                        help='seguir el último diario (aunque haya terminado) y reintentar solamente las tareas fallidas')
+    parser.add_argument('--intentos', type=int, default=4, help='intentos por tarea antes de apuntarla como fallida')
+    parser.add_argument('--offline', action='store_true', help='no tocar la red; sacar los datos solamente del cache')
+    return parser.parse_args()
+
 
-            # ahora ya tenemos todos los datos, entonces los escribimos a un JSON file
-            output_variante_json(datos_del_variante)
-            logger.info('- - - - - - - - - - - - - - - - -')
+if __name__ == '__main__':
+    args = parse_args()
 
-        # contar esta agrupación
-        numeros_de_datos['agrupaciones'] += 1
+    # configuración de logging
+    logging.config.dictConfig(logging_config)
+    logger = logging.getLogger('scrape_INALI')
+    logger.info('* * * * * * * * * * * * * * * * *')
+    logger.info('logging configured')
+
+    # esto es el URL donde se encuentra todos los vínculos de las agrupaciones lingüísticas
+    # ver aquí más detalle sobre "verify" y certificates:
+    # https://stackoverflow.com/questions/28667684/python-requests-getting-sslerror
+    base_url = args.base_url
+
+    # las páginas de INALI casi nunca cambian, así que las guardamos en un cache y las revalidamos
+    cache = None
+    if not args.sin_cache:
+        cache = CacheDePaginas(args.cache, offline=args.offline)
+        logger.info('usando el cache de páginas en {}{}'.format(args.cache, ' (offline)' if args.offline else ''))
+
+    # la página base, cada agrupación y cada variante son tareas; las que ya están hechas en el diario no se repiten
+    diario = DiarioDelCrawl(args.diario, base_url=base_url, desde_cero=args.desde_cero, seguir_terminado=args.reintentar_fallidos)
+    if args.hilos > 0:
+        logger.info('bajando las agrupaciones con {} hilos ({} peticiones/s por host)'.format(args.hilos, args.por_segundo))
+    try:
+        crawl_con_diario(base_url, diario, args.carpeta, max_hilos=args.hilos, por_segundo=args.por_segundo, cache=cache,
+                         rapido=args.parseo_rapido, reintentar_fallidos=args.reintentar_fallidos, intentos=args.intentos)
+    except KeyboardInterrupt:
+        logger.warning('el crawl se interrumpió; la próxima vez seguimos desde el diario {}'.format(args.diario))
+        raise SystemExit(1)
+
+    # los datos y los números salen del diario, así que incluyen lo que hicimos antes de seguir un crawl
+    todos_los_variantes, numeros_de_datos = resultados_del_diario(diario, base_url)
+    if todos_los_variantes is None:
+        logger.error('no pudimos bajar la página base {}; no tocamos el almacén ni el índice geográfico'.format(base_url))
+        diario.terminar()
+        raise SystemExit(1)
+
+    # además del árbol de archivos de JSON, escribimos todo a un solo almacén con índices, y el índice geográfico,
+    # para consultar qué variantes se hablan en un lugar sin releer los datos. los dos se escriben desde cero con
+    # los datos del diario, así que con tareas fallidas les faltarían variantes que sí están en el árbol (de un
+    # crawl anterior) y comparar_registros_MARC.py dejaría de encontrarlos: mejor dejamos los de antes
+    if diario.fallidas():
+        logger.warning('hay tareas fallidas; no tocamos el almacén {} ni el índice geográfico {} (reintenta con '
+                       '--reintentar-fallidos, o constrúyelos desde el árbol con almacen_INALI.py --desde-carpetas y '
+                       'indice_geografico.py --construir)'.format(
+                           args.almacen, args.indice_geografico))
+    else:
+        escribir_almacen(todos_los_variantes, args.almacen)
+        escribir_indice(todos_los_variantes, args.indice_geografico)
+        logger.info('escribimos el índice geográfico a {}'.format(args.indice_geografico))
 
     logger.info('ya hemos sacado todos los datos que pudimos de las páginas de INALI')
-    logger.info('los datos de {} agrupacions fueron extraidos (menos los variantes problematicos)'.format(numeros_de_datos['agrupaciones']))
+    logger.info('los datos de {} agrupacions fueron extraidos (menos las tareas fallidas)'.format(numeros_de_datos['agrupaciones']))
     logger.info('los datos de {} variantes fueran extraidos'.format(numeros_de_datos['variantes']))
-    logger.warning('estos son las vínculos, agrupaciones, y variantes que ahora están echando Excepciones')
-    logger.warning('o sea, no pudimos extraer los datos de los siguentes:')
-    for key, value in datos_problematicos.items():
-        logger.warning('{}: {}'.format(key, value))
+    logger.info('{} archivos de JSON fueron escritos; los demás no cambiaron'.format(numeros_de_datos['archivos_escritos']))
+    if cache:
+        logger.info('páginas del cache: {}'.format(dict(cache.numeros)))
+    # el resumen de métricas: latencia de cada fetch, bytes bajados, tiempo de parseo por página...
+    for nombre, cantidad in numeros_de_datos.items():
+        metricas.contar('inali_{}_total'.format(nombre), cantidad)
+    metricas.escribir(args.metricas)
+    logger.info('escribimos el resumen de métricas a {}'.format(args.metricas))
+
+    diario.terminar()
+
+    fallidas = diario.fallidas()
+    if fallidas:
+        logger.warning('{} tareas fallaron; se pueden reintentar con --reintentar-fallidos'.format(len(fallidas)))
+        for entrada in fallidas:
+            logger.warning('{}: {}'.format(entrada['clave'], entrada['excepcion']))
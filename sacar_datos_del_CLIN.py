@@ -0,0 +1,537 @@
+# sacar los datos de INALI del catálogo completo en PDF (documentos/CLIN_completo_de_INALI.zip) en vez de bajar
+# cientos de páginas: el CLIN tiene las mismas tablas que el sitio, una por agrupación, con las autodenominaciones
+# y el variante en la primera columna y la referencia geoestadística (con los municipios en negrita) en la segunda.
+# cada página se lee por separado (en un pool de procesos con --procesos) y luego armamos los variantes en el orden
+# de las páginas, porque una fila de la tabla puede seguir en la próxima página.
+# el resultado tiene el mismo modelo que output_variante_json, y lo reconciliamos con el árbol agrupaciones_de_INALI/
+# el PDF tiene sus propios artefactos: los símbolos del AFI salen como glifos de una fuente privada (ver glifos_del_CLIN),
+# algunas celdas traen basura de la maquetación después del <variante> ("n n n"), y dos variantes tienen el mismo
+# nombre. limpiamos los glifos, descartamos los nombres que no son nombres, y avisamos de todo en el log
+# hace falta pdfplumber (pip install pdfplumber)
+# uso:
+#   python sacar_datos_del_CLIN.py
+#   python sacar_datos_del_CLIN.py --procesos 8 --carpeta agrupaciones_del_CLIN --almacen agrupaciones_del_CLIN.sqlite
+
+import os
+import re
+import json
+import zipfile
+import argparse
+import logging
+import tempfile
+import multiprocessing
+
+from indice_geografico import separar_localidades, escribir_indice
+from normalizacion import normalizar
+from almacen_INALI import escribir_almacen, sacar_datos_de_carpetas
+from sacar_datos_de_INALI import output_variante_json, limpiar_nombre
+from metricas import metricas
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+
+logger = logging.getLogger('sacar_datos_del_CLIN')
+
+archivo_del_CLIN = os.path.join('documentos', 'CLIN_completo_de_INALI.zip')
+archivo_de_reconciliacion = 'reconciliacion_del_CLIN.json'
+
+# "8.6. Variantes lingüísticas de las agrupaciones de la familia maya"
+patron_de_familia = re.compile(r'^8\.\d+\.?\s+Variantes lingüísticas de las agrupaciones de la familia (.+)$')
+# después de la última familia vienen las notas y los apéndices, con otras tablas que no son de variantes
+patron_del_fin = re.compile(r'^9\.\s+Notas y apéndices\.?$')
+# el encabezado de cada tabla empieza así; la línea que está justo arriba de la tabla es la agrupación
+encabezado_de_tabla = 'AUTODENOMINACI'
+# los guiones que parten una palabra al final de una línea
+guiones = ('-', '–')
+conectores = ('de', 'del', 'la', 'y')
+
+# los símbolos del AFI de las pronunciaciones (y la "ä" del ch'ol en algunas localidades) están en una fuente con
+# codificación propia, y pdfplumber los saca como caracteres del área privada de Unicode. los comparamos con las
+# mismas autodenominaciones en las páginas de INALI para saber qué es cada uno
+glifos_del_CLIN = str.maketrans({
+    '\uf03f': 'ʔ', '\uf04e': 'ŋ', '\uf052': 'ɾ', '\uf053': 'ʃ', '\uf067': 'g', '\uf083': '\u0361', '\uf091': '˦',
+    '\uf09a': '˨', '\uf0c3': 'ä', '\uf0c8': 'ˈ', '\uf0e2': '\u0303', '\uf0f6': 'ɨ', '\uf0f9': 'ː'
+})
+# los tonos, la duración y los diacríticos van pegados a la letra de antes, y la ligadura a las dos letras, pero como
+# vienen de otra fuente a veces salen con un espacio de más: "[meʔpʰa˨a ˨ ba˦]"
+patron_de_espacio_antes = re.compile(r'\s+(?=[˦˨ː\u0303\u0361])')
+patron_de_espacio_despues = re.compile(r'(?<=\u0361)\s+')
+patron_de_glifos_desconocidos = re.compile('[\ue000-\uf8ff]')
+
+
+def limpiar_texto(texto):
+    '''los glifos del CLIN como los caracteres de Unicode que son, sin los espacios que la maquetación les agrega'''
+    texto = texto.translate(glifos_del_CLIN)
+    texto = patron_de_espacio_antes.sub('', texto)
+    texto = patron_de_espacio_despues.sub('', texto)
+    desconocidos = patron_de_glifos_desconocidos.findall(texto)
+    if desconocidos:
+        logger.warning('glifos del CLIN que no conocemos en "{}": {}'.format(texto, ', '.join(map(ascii, desconocidos))))
+        metricas.contar('clin_glifos_desconocidos_total', len(desconocidos))
+        texto = patron_de_glifos_desconocidos.sub('', texto)
+    return ' '.join(texto.split())
+
+
+def nombre_plausible(nombre):
+    '''
+    un nombre tiene por lo menos dos letras y no es puras letras sueltas: "n n n" es lo que queda de una línea
+    de la maquetación, no una autodenominación
+    '''
+    partes = nombre.split()
+    return sum(letra.isalpha() for letra in nombre) >= 2 and not all(len(parte) == 1 for parte in partes)
+
+
+def abrir_pdf(archivo):
+    if pdfplumber is None:
+        raise ImportError('para leer el CLIN hace falta pdfplumber (pip install pdfplumber)')
+    return pdfplumber.open(archivo)
+
+
+def extraer_pdf(archivo, carpeta):
+    '''el PDF viene adentro de un zip; lo sacamos una vez a "carpeta" para que cada proceso lo pueda abrir'''
+    if not zipfile.is_zipfile(archivo):
+        return archivo
+    with zipfile.ZipFile(archivo) as zf:
+        nombre = next(nombre for nombre in zf.namelist()
+                      if nombre.lower().endswith('.pdf') and not nombre.startswith('__MACOSX'))
+        return zf.extract(nombre, carpeta)
+
+
+def palabras_de_celda(pagina, bbox):
+    '''
+    las palabras de una celda en orden, con si están en negrita (los municipios).
+    una palabra partida con un guion al final de una línea ("X-" "Campeu") la juntamos otra vez
+    '''
+    palabras = []
+    anterior = None
+    pegar_la_proxima = False
+    # con la tolerancia de siempre (3) algunas palabras se pegan: "Cerro de" sale "Cerrode"
+    for palabra in pagina.crop(bbox).extract_words(x_tolerance=2, extra_attrs=['fontname']):
+        # un glifo de otra fuente sale como una palabra aparte en medio de la suya: "S", "\uf0c3", "clumpá" es "Säclumpá"
+        solo_glifos = not patron_de_glifos_desconocidos.sub('', palabra['text'])
+        texto = limpiar_texto(palabra['text'])
+        # hay comas sueltas en negrita ("**Sucilá**: África **,** Almazan"), que no son municipios
+        negrita = 'Bold' in palabra['fontname'] and any(letra.isalnum() for letra in texto)
+        if palabras and (solo_glifos or pegar_la_proxima or
+                         (anterior['text'].endswith(guiones) and palabra['top'] > anterior['bottom'])):
+            palabras[-1] = (palabras[-1][0] + texto, palabras[-1][1])
+        else:
+            palabras.append((texto, negrita))
+        pegar_la_proxima = solo_glifos
+        anterior = palabra
+    return palabras
+
+
+def eventos_de_pagina(pagina):
+    '''
+    lo que nos importa de una página, en el orden de arriba para abajo:
+    ('familia', nombre), ('agrupacion', nombre), ('fila', texto de la primera columna, [(palabra, negrita), ...])
+    y ('fin',) donde terminan las tablas de variantes
+    '''
+    eventos = []
+    with metricas.medir('clin_parseo_segundos'):
+        lineas = pagina.extract_text_lines()
+        for linea in lineas:
+            encontrado = patron_de_familia.match(linea['text'].strip())
+            if encontrado:
+                eventos.append((linea['top'], 'familia', encontrado.group(1).strip(' .')))
+            elif patron_del_fin.match(linea['text'].strip()):
+                eventos.append((linea['top'], 'fin'))
+
+        for tabla in pagina.find_tables():
+            for fila in tabla.rows:
+                # las tablas de variantes tienen dos columnas; a veces una raya de más parte la segunda en dos,
+                # así que todo lo que está a la derecha de la primera celda es la referencia geoestadística
+                celdas = [celda for celda in fila.cells if celda]
+                if len(celdas) < 2:
+                    continue
+                izquierda = celdas[0]
+                derecha = (celdas[1][0], fila.bbox[1], max(celda[2] for celda in celdas[1:]), fila.bbox[3])
+                texto = pagina.crop(izquierda).extract_text() or ''
+
+                if texto.startswith(encabezado_de_tabla):
+                    # en la primera página de cada sección del Diario Oficial la tabla sigue de la sección anterior,
+                    # y arriba hay un "(Viene de la página ...)" en vez del nombre de una agrupación nueva
+                    arriba = [linea for linea in lineas if linea['bottom'] <= izquierda[1] + 1]
+                    if arriba and not arriba[-1]['text'].startswith('(Viene de'):
+                        # un poquito antes de la fila, para que la agrupación quede antes de sus filas en la misma página
+                        eventos.append((fila.bbox[1] - 0.1, 'agrupacion', arriba[-1]['text'].strip()))
+                    continue
+
+                eventos.append((fila.bbox[1], 'fila', texto, palabras_de_celda(pagina, derecha)))
+
+    metricas.contar('clin_paginas_total')
+    return [evento[1:] for evento in sorted(eventos, key=lambda evento: evento[0])]
+
+
+# cada proceso del pool abre el PDF una sola vez, cuando empieza
+_pdf_del_trabajador = None
+
+
+def _iniciar_trabajador(archivo):
+    global _pdf_del_trabajador
+    _pdf_del_trabajador = abrir_pdf(archivo)
+
+
+def _eventos_de_numero(numero):
+    '''los eventos de una página, con las métricas de esta página para sumarlas en el proceso principal'''
+    metricas.reiniciar()
+    pagina = _pdf_del_trabajador.pages[numero]
+    eventos = eventos_de_pagina(pagina)
+    # pdfplumber guarda los objetos de cada página; los soltamos para no tener todo el PDF en memoria
+    pagina.close()
+    return eventos, metricas.instantanea()
+
+
+def eventos_del_pdf(archivo, procesos=1):
+    '''los eventos de todas las páginas en orden, página por página, en un pool de procesos si procesos > 1'''
+    if procesos > 1:
+        with abrir_pdf(archivo) as pdf:
+            numero_de_paginas = len(pdf.pages)
+        logger.info('leyendo {} páginas de {} en {} procesos'.format(numero_de_paginas, archivo, procesos))
+        with multiprocessing.Pool(procesos, initializer=_iniciar_trabajador, initargs=(archivo,)) as pool:
+            for eventos, metricas_de_la_pagina in pool.imap(_eventos_de_numero, range(numero_de_paginas), chunksize=4):
+                metricas.sumar(metricas_de_la_pagina)
+                yield from eventos
+        return
+
+    with abrir_pdf(archivo) as pdf:
+        logger.info('leyendo {} páginas de {}'.format(len(pdf.pages), archivo))
+        for pagina in pdf.pages:
+            yield from eventos_de_pagina(pagina)
+            pagina.close()
+
+
+def sacar_autodes_y_variante(texto):
+    '''
+    @texto: la primera columna de una fila, p.ej. "tohono o’otham\n[tohono ʔoʔoðam]\n<pápago>"
+    las autodenominaciones salen en pares [nombre, [pronunciación]] como en sacar_autodes().
+    un nombre, una pronunciación o un variante pueden seguir en la próxima línea, así que juntamos las líneas
+    hasta que cierra el "]" o el ">". el <variante> es lo último de la celda: lo que sigue es de la maquetación.
+    regresa (autodenominaciones, variante, nombres descartados)
+    '''
+    piezas = []
+    for linea in texto.split('\n'):
+        linea = limpiar_texto(linea)
+        if not linea:
+            continue
+        if piezas and piezas[-1].endswith(guiones):
+            piezas[-1] += linea
+        elif piezas and (
+                (piezas[-1].startswith('[') and not piezas[-1].endswith(']')) or
+                (piezas[-1].startswith('<') and not piezas[-1].endswith('>')) or
+                (not piezas[-1].startswith(('[', '<')) and not linea.startswith(('[', '<')))):
+            piezas[-1] = '{} {}'.format(piezas[-1], linea)
+        else:
+            piezas.append(linea)
+
+    autodes = []
+    variante = ''
+    descartados = []
+    for pieza in piezas:
+        if variante:
+            descartados.append(pieza)
+        elif pieza.startswith('<'):
+            variante = limpiar_nombre(pieza)
+        elif pieza.startswith('[') and autodes and not autodes[-1][1]:
+            autodes[-1][1] = pieza
+        elif nombre_plausible(pieza):
+            autodes.append([pieza, ''])
+        else:
+            descartados.append(pieza)
+    return autodes, variante, descartados
+
+
+def fin_de_estado(palabras, i):
+    '''
+    si en palabras[i] empieza un estado ("SONORA:" o "BAJA CALIFORNIA:" en mayúsculas, seguido por un municipio
+    en negrita) regresa dónde termina; si no, None. algunos llevan conectores en minúsculas: "OAXACA de JUÁREZ:"
+    '''
+    if not palabras[i][0].isupper():
+        return None
+    j = i
+    while j < len(palabras) and not palabras[j][1] and (palabras[j][0].isupper() or palabras[j][0] in conectores):
+        if palabras[j][0].endswith(':'):
+            if j + 1 < len(palabras) and palabras[j + 1][1]:
+                return j + 1
+            return None
+        j += 1
+    return None
+
+
+def parse_referencia_geografica(palabras):
+    '''
+    @palabras: las palabras de la segunda columna en orden, con si están en negrita
+    "SONORA: **Altar**: Altar, El Cubabi. **Caborca**: El Soñic" -> [{'SONORA': {'Altar': ['Altar, El Cubabi'], ...}}]
+    un dict por estado, como parse_datos_geos; las localidades de un municipio quedan en un solo string
+    '''
+    repr_geo = []
+    municipio = None
+    localidades = []
+    i = 0
+
+    def cerrar_municipio():
+        if municipio is not None and repr_geo:
+            cadena = ' '.join(localidades).strip(' :.')
+            estado, = repr_geo[-1]
+            repr_geo[-1][estado][municipio] = [cadena] if cadena else []
+
+    while i < len(palabras):
+        texto, negrita = palabras[i]
+        fin_del_estado = fin_de_estado(palabras, i) if not localidades or localidades[-1].endswith('.') else None
+        if fin_del_estado is not None:
+            cerrar_municipio()
+            municipio, localidades = None, []
+            repr_geo.append({' '.join(texto for texto, _ in palabras[i:fin_del_estado]).strip(' :'): {}})
+            i = fin_del_estado
+        elif negrita:
+            cerrar_municipio()
+            nombre = []
+            while i < len(palabras) and palabras[i][1]:
+                nombre.append(palabras[i][0])
+                i += 1
+            municipio, localidades = ' '.join(nombre).strip(' :'), []
+        else:
+            localidades.append(texto)
+            i += 1
+
+    cerrar_municipio()
+    return [geo for geo in repr_geo if any(geo.values())]
+
+
+def armar_variante(fila, agrup_ling, familia_ling):
+    texto, palabras = fila
+    autodes, variante, descartados = sacar_autodes_y_variante(texto)
+    for descartado in descartados:
+        logger.warning('descartamos "{}" de la celda del variante {} ({}): no es un nombre'.format(descartado, variante, agrup_ling))
+        metricas.contar('clin_nombres_descartados_total')
+    return {
+        'agrupacion_lingüística': agrup_ling,
+        'familia_lingüística': familia_ling,
+        'autodenominaciones': autodes,
+        'variante': variante,
+        'representación_geográfica': parse_referencia_geografica(palabras)
+    }
+
+
+def armar_variantes(eventos):
+    '''
+    los datos de cada variante en el modelo de JSON, en el orden del PDF.
+    una fila cortada por el fin de una página sigue en la primera fila de la próxima: si esa fila no tiene
+    nada en la primera columna, o si la fila anterior todavía no tenía su <variante>, la juntamos con la anterior
+    '''
+    familia_ling = agrup_ling = None
+    fila = None
+
+    for evento in eventos:
+        tipo = evento[0]
+        if tipo in ('familia', 'agrupacion', 'fin'):
+            if fila:
+                yield armar_variante(fila, agrup_ling, familia_ling)
+                fila = None
+            if tipo == 'familia':
+                # en el sitio de INALI las familias empiezan con mayúscula
+                familia_ling = limpiar_nombre(limpiar_texto(evento[1]))
+                familia_ling = familia_ling[:1].upper() + familia_ling[1:]
+            elif tipo == 'agrupacion':
+                agrup_ling = limpiar_nombre(limpiar_texto(evento[1]))
+            else:
+                agrup_ling = None
+            continue
+
+        # las tablas antes de la primera agrupación no son de variantes
+        if agrup_ling is None:
+            continue
+
+        _, texto, palabras = evento
+        if fila and (not texto.strip() or '<' not in fila[0]):
+            fila = ('\n'.join(filter(None, (fila[0], texto))), fila[1] + palabras)
+        else:
+            if fila:
+                yield armar_variante(fila, agrup_ling, familia_ling)
+            fila = (texto, palabras)
+
+    if fila:
+        yield armar_variante(fila, agrup_ling, familia_ling)
+
+
+def sacar_datos_del_CLIN(archivo, procesos=1):
+    '''todos los variantes del PDF en el modelo de JSON'''
+    return list(armar_variantes(eventos_del_pdf(archivo, procesos)))
+
+
+def _llave(dato):
+    return normalizar(limpiar_nombre(dato['agrupacion_lingüística'])), normalizar(limpiar_nombre(dato['variante']))
+
+
+def _nombre(dato):
+    return [dato['agrupacion_lingüística'], dato['variante']]
+
+
+def _por_llave(datos):
+    '''los datos por (agrupación, variante), con el primero de cada llave, y los nombres de los que se repiten'''
+    por_llave, repetidos = {}, []
+    for dato in datos:
+        llave = _llave(dato)
+        if llave in por_llave:
+            repetidos.append(_nombre(dato))
+        else:
+            por_llave[llave] = dato
+    return por_llave, repetidos
+
+
+def quitar_repetidos(datos):
+    '''
+    el CLIN tiene variantes con el mismo nombre en la misma agrupación (dos "zapoteco de la Sierra sur, noroeste"),
+    que irían al mismo archivo de JSON y se sobreescribirían en cada corrida. nos quedamos con el primero y avisamos
+    '''
+    por_llave, repetidos = _por_llave(datos)
+    for agrup_ling, variante in repetidos:
+        logger.warning('el variante {} ({}) está más de una vez en el CLIN; nos quedamos con el primero'.format(variante, agrup_ling))
+        metricas.contar('clin_variantes_repetidos_total')
+    return list(por_llave.values())
+
+
+def _lugares(dato, municipios_conocidos=frozenset()):
+    '''
+    (estado, municipio, localidad) normalizados de un variante, con cada localidad separada, y (estado, municipio, '')
+    para los municipios sin localidades. en las páginas de INALI algunos municipios salen partidos, el primer pedazo
+    sin localidades ("La", "Trinitaria"): los juntamos si el nombre entero está en @municipios_conocidos
+    '''
+    lugares = set()
+    for repr_geo in dato['representación_geográfica']:
+        for estado, municipios in repr_geo.items():
+            pedazo = None
+            for municipio, cadenas in municipios.items():
+                localidades = [localidad for cadena in cadenas for localidad in separar_localidades(cadena)]
+                if pedazo is not None:
+                    if (normalizar(estado), normalizar(pedazo + ' ' + municipio)) in municipios_conocidos:
+                        municipio = pedazo + ' ' + municipio
+                    else:
+                        lugares.add((normalizar(estado), normalizar(pedazo), ''))
+                    pedazo = None
+                if not localidades and (normalizar(estado), normalizar(municipio)) not in municipios_conocidos:
+                    pedazo = municipio
+                    continue
+                lugares.update((normalizar(estado), normalizar(municipio), normalizar(localidad))
+                               for localidad in localidades or [''])
+            if pedazo is not None:
+                lugares.add((normalizar(estado), normalizar(pedazo), ''))
+    return lugares
+
+
+def _autodenominaciones(dato):
+    '''los nombres normalizados de las autodenominaciones, sin los que no son nombres (p.ej. restos de la página)'''
+    return {normalizar(autode[0]) for autode in dato['autodenominaciones'] if nombre_plausible(autode[0])}
+
+
+def reconciliar(datos_del_pdf, datos_de_carpetas):
+    '''
+    comparar los variantes del PDF con los del árbol de agrupaciones_de_INALI, sin fijarse en acentos, mayúsculas
+    ni apóstrofos. regresa un reporte con los variantes que solamente están en uno de los dos, los que se repiten, y,
+    para los que están en los dos, los campos que no coinciden y las localidades que faltan en cada lado
+    '''
+    del_pdf, repetidos_en_pdf = _por_llave(datos_del_pdf)
+    de_carpetas, repetidos_en_carpetas = _por_llave(datos_de_carpetas)
+
+    diferencias = []
+    for llave in sorted(del_pdf.keys() & de_carpetas.keys()):
+        pdf, carpeta = del_pdf[llave], de_carpetas[llave]
+        diferencia = {}
+        if normalizar(limpiar_nombre(pdf['familia_lingüística'])) != normalizar(limpiar_nombre(carpeta['familia_lingüística'])):
+            diferencia['familia_lingüística'] = [pdf['familia_lingüística'], carpeta['familia_lingüística']]
+        if _autodenominaciones(pdf) != _autodenominaciones(carpeta):
+            diferencia['autodenominaciones'] = [pdf['autodenominaciones'], carpeta['autodenominaciones']]
+        municipios_del_pdf = {lugar[:2] for lugar in _lugares(pdf)}
+        lugares_del_pdf, lugares_de_carpeta = _lugares(pdf), _lugares(carpeta, municipios_del_pdf)
+        if lugares_del_pdf != lugares_de_carpeta:
+            diferencia['localidades_solamente_en_pdf'] = sorted(lugares_del_pdf - lugares_de_carpeta)
+            diferencia['localidades_solamente_en_carpetas'] = sorted(lugares_de_carpeta - lugares_del_pdf)
+        if diferencia:
+            diferencias.append(dict(variante=_nombre(pdf), **diferencia))
+
+    return {
+        'variantes_en_pdf': len(del_pdf),
+        'variantes_en_carpetas': len(de_carpetas),
+        'variantes_iguales': len(del_pdf.keys() & de_carpetas.keys()) - len(diferencias),
+        'solamente_en_pdf': [_nombre(del_pdf[llave]) for llave in sorted(del_pdf.keys() - de_carpetas.keys())],
+        'solamente_en_carpetas': [_nombre(de_carpetas[llave]) for llave in sorted(de_carpetas.keys() - del_pdf.keys())],
+        'repetidos_en_pdf': repetidos_en_pdf,
+        'repetidos_en_carpetas': repetidos_en_carpetas,
+        'diferencias': diferencias
+    }
+
+
+def avisar_diferencias(reporte, carpeta):
+    '''cada diferencia de la reconciliación como una línea del log, para que no quede solamente en el reporte'''
+    for agrup_ling, variante in reporte['solamente_en_pdf']:
+        logger.warning('{} / {}: solamente en el PDF'.format(agrup_ling, variante))
+    for agrup_ling, variante in reporte['solamente_en_carpetas']:
+        logger.warning('{} / {}: solamente en {}'.format(agrup_ling, variante, carpeta))
+    for diferencia in reporte['diferencias']:
+        agrup_ling, variante = diferencia['variante']
+        partes = []
+        if 'familia_lingüística' in diferencia:
+            partes.append('familia {} vs {}'.format(*diferencia['familia_lingüística']))
+        if 'autodenominaciones' in diferencia:
+            partes.append('autodenominaciones {} vs {}'.format(
+                *[', '.join(autode[0] for autode in autodes) for autodes in diferencia['autodenominaciones']]))
+        for llave, lado in [('localidades_solamente_en_pdf', 'solamente en el PDF'), ('localidades_solamente_en_carpetas', 'solamente en ' + carpeta)]:
+            if diferencia.get(llave):
+                partes.append('{} lugares {} ({})'.format(len(diferencia[llave]), lado, '; '.join(
+                    ', '.join(filter(None, reversed(lugar))) for lugar in diferencia[llave][:3])
+                    + ('; ...' if len(diferencia[llave]) > 3 else '')))
+        logger.warning('{} / {}: {}'.format(agrup_ling, variante, ' | '.join(partes)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='sacar los datos de INALI del catálogo completo en PDF, sin tocar la red')
+    parser.add_argument('--clin', default=archivo_del_CLIN, help='el PDF del CLIN, o el zip que lo tiene')
+    parser.add_argument('--procesos', type=int, default=multiprocessing.cpu_count(),
+                        help='número de procesos que leen páginas a la vez')
+    parser.add_argument('--carpeta', default='agrupaciones_del_CLIN', help='dónde escribimos los archivos de JSON')
+    parser.add_argument('--almacen', help='también escribir el almacén consolidado (SQLite) a este archivo')
+    parser.add_argument('--indice-geografico', help='también escribir el índice geográfico a este archivo')
+    parser.add_argument('--reconciliar-con', default='agrupaciones_de_INALI',
+                        help='el árbol de archivos de JSON del crawl con el que comparamos los datos del PDF')
+    parser.add_argument('--reporte', default=archivo_de_reconciliacion, help='dónde escribir el reporte de la reconciliación')
+    parser.add_argument('--metricas', default=os.path.join('logs', 'metricas_CLIN.json'),
+                        help='dónde escribir el resumen de métricas (JSON, o Prometheus si termina en .prom)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level='INFO', format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta_temporal:
+        with metricas.medir('clin_total_segundos'):
+            todos_los_variantes = sacar_datos_del_CLIN(extraer_pdf(args.clin, carpeta_temporal), args.procesos)
+    logger.info('sacamos {} variantes de {} agrupaciones del CLIN'.format(
+        len(todos_los_variantes), len({dato['agrupacion_lingüística'] for dato in todos_los_variantes})))
+
+    variantes = quitar_repetidos(todos_los_variantes)
+    escritos = sum(output_variante_json(dato, carpeta=args.carpeta) for dato in variantes)
+    logger.info('{} de {} archivos de JSON fueron escritos a {}; los demás no cambiaron'.format(
+        escritos, len(variantes), args.carpeta))
+    if args.almacen:
+        escribir_almacen(variantes, args.almacen)
+    if args.indice_geografico:
+        escribir_indice(variantes, args.indice_geografico)
+        logger.info('escribimos el índice geográfico a {}'.format(args.indice_geografico))
+
+    if os.path.isdir(args.reconciliar_con):
+        reporte = reconciliar(todos_los_variantes, sacar_datos_de_carpetas(args.reconciliar_con))
+        with open(args.reporte, 'w') as outf:
+            outf.write(json.dumps(reporte, ensure_ascii=False, indent=2))
+        avisar_diferencias(reporte, args.reconciliar_con)
+        logger.info('reconciliación con {}: {} variantes iguales, {} con diferencias, {} solamente en el PDF, {} solamente en las carpetas, {} repetidos en el PDF'.format(
+            args.reconciliar_con, reporte['variantes_iguales'], len(reporte['diferencias']),
+            len(reporte['solamente_en_pdf']), len(reporte['solamente_en_carpetas']), len(reporte['repetidos_en_pdf'])))
+        logger.info('escribimos el reporte de la reconciliación a {}'.format(args.reporte))
+
+    metricas.contar('clin_variantes_total', len(variantes))
+    metricas.escribir(args.metricas)
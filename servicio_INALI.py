@@ -0,0 +1,341 @@
+# un servicio local (HTTP y JSON) que carga los datos de INALI y construye el emparejador una sola vez y los mantiene
+# en memoria, para que otras herramientas de la biblioteca pregunten "¿este encabezado menciona una lengua de INALI?"
+# sin correr comparar_registros_MARC.py (que reconstruye el vocabulario cada vez)
+# endpoints:
+#   GET  /buscar?valor=Náhuatl (Idioma)     un solo valor
+#   POST /buscar   {"valor": "..."}
+#   POST /lote     {"valores": ["...", ...], "registros": [{"index": "1", "rows": [[...], ...]}, ...]}
+#                  los registros llevan los rows con la forma del CSV del catálogo (ver registros_MARC.py)
+#   POST /recargar                          volver a cargar los datos de INALI (también con la señal SIGHUP)
+#   GET  /salud                             el vocabulario cargado
+#   GET  /metricas                          latencia y rendimiento (JSON, o ?formato=prometheus)
+# una recarga construye el vocabulario nuevo aparte y lo cambia por el viejo de un golpe: las peticiones que ya
+# empezaron terminan con el vocabulario viejo y ninguna se pierde
+# uso:
+#   python servicio_INALI.py --puerto 8765
+#   python servicio_INALI.py --difuso --umbral 0.8
+#   curl -s localhost:8765/lote -d '{"valores": ["Nahuatl language", "Otomí (Idioma)"]}'
+
+import os
+import json
+import time
+import signal
+import argparse
+import logging
+import threading
+from collections import namedtuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+from almacen_INALI import archivo_del_almacen
+from instantanea_del_emparejador import emparejador_de_INALI
+from comparar_registros_MARC import emparejar_valor, emparejar_registro, reglas_por_defecto, reglas_de_argumento
+from registros_MARC import RegistroMARC
+from metricas import metricas
+
+
+logger = logging.getLogger('servicio_INALI')
+
+puerto_por_defecto = 8765
+
+# el cuerpo más grande que aceptamos en una petición (un lote de muchos registros cabe de sobra)
+maximo_del_cuerpo = 64 * 1024 * 1024
+
+# segundos que una conexión keep-alive puede quedarse sin hacer nada antes de cerrarla;
+# al terminar, server_close() espera a lo más esto a las conexiones abiertas
+segundos_de_espera = 5
+
+# el vocabulario que usa cada petición; una recarga cambia el objeto entero, nunca sus partes
+# @origen: el almacén o la carpeta de donde salieron los datos
+Vocabulario = namedtuple('Vocabulario', ['emparejador', 'variantes', 'huella', 'origen', 'cargado'])
+
+
+class ErrorDePeticion(Exception):
+    '''una petición mal hecha; el manejador la contesta con este código y el mensaje'''
+
+    def __init__(self, codigo, mensaje):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+class ServicioINALI:
+    '''
+    el emparejador y los datos de INALI que contestan las peticiones, sin nada de HTTP
+    @difuso, @umbral: como en comparar_registros_MARC.py
+    @instantanea: el archivo de la instantánea del emparejador, o False para construirlo siempre
+    @reglas: los campos y subcampos de los registros que revisamos (ver reglas_de_campos.py)
+    '''
+
+    def __init__(self, almacen=archivo_del_almacen, carpeta='agrupaciones_de_INALI', difuso=False, umbral=0.7,
+                 instantanea=None, reglas=None):
+        self.almacen = almacen
+        self.carpeta = carpeta
+        self.difuso = difuso
+        self.umbral = umbral
+        self.instantanea = instantanea
+        self.reglas = reglas or reglas_por_defecto
+        self.lock_de_recarga = threading.Lock()
+        self.vocabulario = None
+        self.recargar()
+
+    def recargar(self):
+        '''
+        cargar el emparejador otra vez (de la instantánea si los datos no cambiaron), fuera del camino de las peticiones.
+        si algo falla, el vocabulario de antes se queda y la Exception sube a quien pidió la recarga
+        '''
+        with self.lock_de_recarga:
+            with metricas.medir('servicio_recarga_segundos'):
+                emparejador, variantes = emparejador_de_INALI(self.almacen, self.carpeta, self.difuso, self.umbral,
+                                                              self.instantanea)
+            origen = self.almacen if self.almacen and os.path.isfile(self.almacen) else self.carpeta
+            self.vocabulario = Vocabulario(emparejador, variantes, emparejador.huella(), origen,
+                                           time.strftime('%Y-%m-%d %H:%M:%S'))
+        metricas.contar('servicio_recargas_total')
+        logger.info('cargamos {} términos de {} variantes de {} (vocabulario {})'.format(
+            len(emparejador), variantes, origen, self.vocabulario.huella))
+        return self.vocabulario
+
+    def salud(self):
+        vocabulario = self.vocabulario
+        return {
+            'estado': 'ok',
+            'terminos': len(vocabulario.emparejador),
+            'variantes': vocabulario.variantes,
+            'huella': vocabulario.huella,
+            'origen': vocabulario.origen,
+            'cargado': vocabulario.cargado,
+            'difuso': self.difuso,
+            'campos': self.reglas.especificacion
+        }
+
+    @staticmethod
+    def _buscar_valor(emparejador, valor):
+        '''el resultado de un solo valor: las agrupaciones y los variantes encontrados, y cada uno con su puntaje'''
+        resultado = {'valor': valor, 'agrupaciones': [], 'variantes': [], 'encontrados': []}
+        for columna, nombre, puntaje in emparejar_valor(emparejador, valor):
+            resultado[columna].append(nombre)
+            resultado['encontrados'].append({'columna': columna, 'nombre': nombre, 'puntaje': round(puntaje, 2)})
+        return resultado
+
+    def buscar(self, valor):
+        vocabulario = self.vocabulario
+        metricas.contar('servicio_valores_total')
+        resultado = self._buscar_valor(vocabulario.emparejador, valor)
+        resultado['huella'] = vocabulario.huella
+        return resultado
+
+    def buscar_lote(self, valores=(), registros=()):
+        '''
+        todos los valores y registros de una petición, con el mismo vocabulario aunque haya una recarga a la mitad.
+        un registro sin datos de INALI sale con resultado None, así que las respuestas van en el orden de la petición
+        '''
+        vocabulario = self.vocabulario
+        emparejador = vocabulario.emparejador
+        respuesta = {'huella': vocabulario.huella, 'valores': [], 'registros': []}
+        for valor in valores:
+            respuesta['valores'].append(self._buscar_valor(emparejador, valor))
+        for registro in registros:
+            resultado = emparejar_registro(RegistroMARC(registro.get('index', ''), registro['rows']), emparejador, self.reglas)
+            respuesta['registros'].append({'index': registro.get('index', ''), 'resultado': resultado})
+        metricas.contar('servicio_valores_total', len(respuesta['valores']))
+        metricas.contar('servicio_registros_total', len(respuesta['registros']))
+        return respuesta
+
+
+def rendimiento():
+    '''el resumen de métricas, con la latencia promedio por ruta y cuántos valores y registros por segundo'''
+    resumen = metricas.resumen()
+    duracion = max(resumen['duracion_segundos'], 1e-9)
+    resumen['rendimiento'] = {
+        'peticiones_por_segundo': sum(cantidad for nombre, cantidad in resumen['contadores'].items()
+                                      if nombre.startswith('servicio_peticiones_total')) / duracion,
+        'valores_por_segundo': resumen['contadores'].get('servicio_valores_total', 0) / duracion,
+        'registros_por_segundo': resumen['contadores'].get('servicio_registros_total', 0) / duracion
+    }
+    return resumen
+
+
+def _lista_de(cuerpo, llave, tipo):
+    lista = cuerpo.get(llave, [])
+    if not isinstance(lista, list) or not all(isinstance(elemento, tipo) for elemento in lista):
+        raise ErrorDePeticion(400, '"{}" tiene que ser una lista de {}'.format(llave, 'strings' if tipo is str else 'objetos'))
+    return lista
+
+
+# [index, campo, indicadores, código, valor, ...]: emparejar_registro lee por lo menos hasta el primer valor
+columnas_minimas_de_row = 5
+
+
+def _validar_registros(registros):
+    '''un 400 (y no un 500 con un IndexError) si algún registro no tiene rows como los del CSV del catálogo'''
+    for numero, registro in enumerate(registros):
+        rows = registro.get('rows')
+        if not isinstance(rows, list):
+            raise ErrorDePeticion(400, 'cada registro lleva sus "rows" (una lista de rows del CSV del catálogo)')
+        for row in rows:
+            if (not isinstance(row, list) or len(row) < columnas_minimas_de_row
+                    or not all(isinstance(columna, str) for columna in row)):
+                raise ErrorDePeticion(400, 'el registro {} tiene un row que no es una lista de por lo menos {} strings '
+                                           '([index, campo, indicadores, código, valor, ...]): {}'.format(
+                                               numero, columnas_minimas_de_row, json.dumps(row, ensure_ascii=False)[:200]))
+
+
+class ManejadorINALI(BaseHTTPRequestHandler):
+    '''las rutas del servicio; el servidor le pone el ServicioINALI en "servicio" (ver servir)'''
+    servicio = None
+    protocol_version = 'HTTP/1.1'  # keep-alive, para que un cliente no abra una conexión por petición
+    timeout = segundos_de_espera
+    # los headers y el cuerpo salen en dos writes; con Nagle el segundo espera el ACK retrasado del cliente (~40 ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+    def responder(self, codigo, cuerpo, tipo='application/json; charset=utf-8'):
+        if not isinstance(cuerpo, str):
+            cuerpo = json.dumps(cuerpo, ensure_ascii=False)
+        datos = cuerpo.encode('utf8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def leer_json(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        if largo > maximo_del_cuerpo:
+            raise ErrorDePeticion(413, 'el cuerpo tiene más de {} bytes'.format(maximo_del_cuerpo))
+        try:
+            cuerpo = json.loads(self.rfile.read(largo) or b'{}')
+        except ValueError as e:
+            raise ErrorDePeticion(400, 'el cuerpo no es JSON: {}'.format(e))
+        if not isinstance(cuerpo, dict):
+            raise ErrorDePeticion(400, 'el cuerpo tiene que ser un objeto de JSON')
+        return cuerpo
+
+    def atender(self, metodo):
+        url = urlsplit(self.path)
+        ruta = url.path.rstrip('/') or '/'
+        parametros = {llave: valores[-1] for llave, valores in parse_qs(url.query).items()}
+        codigo = 500
+        inicio = time.perf_counter()
+        try:
+            codigo, cuerpo, tipo = self.despachar(metodo, ruta, parametros)
+            if isinstance(cuerpo, dict) and 'segundos' not in cuerpo:
+                cuerpo['segundos'] = round(time.perf_counter() - inicio, 6)
+            self.responder(codigo, cuerpo, tipo)
+        except ErrorDePeticion as e:
+            codigo = e.codigo
+            self.responder(codigo, {'error': str(e)})
+        except Exception as e:
+            logger.exception('error en {} {}'.format(metodo, self.path))
+            self.responder(codigo, {'error': '{}: {}'.format(type(e).__name__, e)})
+        finally:
+            # las rutas que no existen cuentan todas juntas, para no llenar las métricas con cualquier path
+            ruta_de_metricas = ruta if codigo != 404 else 'otra'
+            metricas.observar('servicio_peticion_segundos', time.perf_counter() - inicio, ruta=ruta_de_metricas)
+            metricas.contar('servicio_peticiones_total', ruta=ruta_de_metricas, codigo=codigo)
+
+    def despachar(self, metodo, ruta, parametros):
+        '''regresa (código, cuerpo, tipo de contenido)'''
+        servicio = self.servicio
+        json_tipo = 'application/json; charset=utf-8'
+
+        if ruta == '/buscar':
+            valor = parametros.get('valor') if metodo == 'GET' else self.leer_json().get('valor')
+            if not isinstance(valor, str):
+                raise ErrorDePeticion(400, 'hace falta "valor" (un string)')
+            return 200, servicio.buscar(valor), json_tipo
+
+        if ruta == '/lote' and metodo == 'POST':
+            cuerpo = self.leer_json()
+            valores = _lista_de(cuerpo, 'valores', str)
+            registros = _lista_de(cuerpo, 'registros', dict)
+            _validar_registros(registros)
+            return 200, servicio.buscar_lote(valores, registros), json_tipo
+
+        if ruta == '/recargar' and metodo == 'POST':
+            servicio.recargar()
+            return 200, servicio.salud(), json_tipo
+
+        if ruta == '/salud' and metodo == 'GET':
+            return 200, servicio.salud(), json_tipo
+
+        if ruta == '/metricas' and metodo == 'GET':
+            if parametros.get('formato') == 'prometheus':
+                return 200, metricas.prometheus(), 'text/plain; version=0.0.4; charset=utf-8'
+            return 200, rendimiento(), json_tipo
+
+        raise ErrorDePeticion(404, 'no hay {} {}'.format(metodo, ruta))
+
+    def do_GET(self):
+        self.atender('GET')
+
+    def do_POST(self):
+        self.atender('POST')
+
+
+class ServidorINALI(ThreadingHTTPServer):
+    # al cerrar esperamos a los hilos que todavía contestan una petición
+    daemon_threads = False
+    block_on_close = True
+
+
+def servir(servicio, host='127.0.0.1', puerto=puerto_por_defecto):
+    '''un servidor con un hilo por conexión para este servicio; hay que llamar serve_forever()'''
+    manejador = type('Manejador', (ManejadorINALI,), {'servicio': servicio})
+    return ServidorINALI((host, puerto), manejador)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='un servicio local que busca datos de INALI en valores y registros MARC')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=puerto_por_defecto)
+    parser.add_argument('--almacen', default=archivo_del_almacen, help='el almacén consolidado de INALI, si existe')
+    parser.add_argument('--carpeta', default='agrupaciones_de_INALI', help='los archivos de JSON, si no hay almacén')
+    parser.add_argument('--difuso', action='store_true',
+                        help='no fijarse en acentos ni apóstrofos, tolerar errores de ortografía y reportar un puntaje')
+    parser.add_argument('--umbral', type=float, default=0.7, help='el puntaje mínimo del emparejador difuso')
+    parser.add_argument('--campos', type=reglas_de_argumento, default=reglas_por_defecto,
+                        help='los campos y subcampos de los registros que revisamos, p.ej. "041,6XX$axz,546" o "todos"')
+    parser.add_argument('--sin-instantanea', action='store_true',
+                        help='construir el emparejador desde los datos en vez de usar su instantánea (ver instantanea_del_emparejador.py)')
+    parser.add_argument('--metricas', default=os.path.join('logs', 'metricas_servicio.json'),
+                        help='dónde escribir el resumen de métricas al terminar (JSON, o Prometheus si termina en .prom)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    logging.basicConfig(level='INFO', format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    servicio = ServicioINALI(args.almacen, args.carpeta, args.difuso, args.umbral, False if args.sin_instantanea else None,
+                             args.campos)
+    servidor = servir(servicio, args.host, args.puerto)
+
+    def recargar_en_el_fondo(*_):
+        # el hilo principal sigue aceptando conexiones mientras construimos el vocabulario nuevo
+        def recargar():
+            try:
+                servicio.recargar()
+            except Exception:
+                logger.exception('la recarga falló; seguimos con el vocabulario de antes')
+        threading.Thread(target=recargar, daemon=True).start()
+
+    def terminar(*_):
+        # shutdown() espera a serve_forever(), así que no se puede llamar desde su propio hilo
+        threading.Thread(target=servidor.shutdown).start()
+
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, recargar_en_el_fondo)
+    signal.signal(signal.SIGTERM, terminar)
+
+    logger.info('sirviendo en http://{}:{}/'.format(*servidor.server_address[:2]))
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        metricas.escribir(args.metricas)
+        logger.info('escribimos el resumen de métricas a {}'.format(args.metricas))